@@ -1,130 +1,193 @@
 # backend/analise_dados_gg.py
-
+# Agente Analista de Dados: relatório da comunidade calculado sobre uma cópia consistente do banco
+# (API de backup do SQLite, conexão só de leitura), nunca sobre o banco em produção. Cada tabela é
+# lida uma vez só (agregados agrupados, sem self-join de Like). Os contadores "desde a última execução"
+# ficam num arquivo SQLite separado, então o relatório não escreve nada no banco do app.
+#   python analise_dados_gg.py [--banco tinder_gamer.db] [--json relatorio.json] [--csv relatorio.csv]
+#                              [--estado analise_estado.db | --sem-estado] [--snapshot copia.db]
+
+import argparse
+import csv
+import json
 import os
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
-from flask_sqlalchemy import SQLAlchemy # Usaremos para os modelos
-from flask import Flask # Necessário para inicializar o contexto do SQLAlchemy fora do app principal
-
-
-temp_app = Flask(__name__)
-temp_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tinder_gamer.db' # Mesmo caminho do DB
-temp_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(temp_app) # Associa o SQLAlchemy a este app temporário
-
-
-class User(db.Model):
-    __tablename__ = 'user' # Garante que use a tabela existente
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(200), nullable=False)
-    # profile = db.relationship('UserProfile', backref='user', uselist=False) # Não precisamos do relationship aqui para contagens
-
-class UserProfile(db.Model):
-    __tablename__ = 'user_profile' # Garante que use a tabela existente
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
-    nome_display = db.Column(db.String(100), default="Jogador")
-    jogo_principal = db.Column(db.String(100))
-    nivel_de_habilidade = db.Column(db.String(50))
-    estilo_jogo = db.Column(db.String(100))
-    disponibilidade = db.Column(db.String(200))
-    gender = db.Column(db.String(50)) 
-    communication_style = db.Column(db.String(100)) 
-    profile_complete = db.Column(db.Boolean, default=False)
-
-class Like(db.Model):
-    __tablename__ = 'like'
-    id = db.Column(db.Integer, primary_key=True)
-    liker_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    liked_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    timestamp = db.Column(db.DateTime) # Não precisa do default aqui para análise
-
-class MatchRating(db.Model):
-    __tablename__ = 'match_rating'
-    id = db.Column(db.Integer, primary_key=True)
-    rater_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    rated_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    rating = db.Column(db.Integer, nullable=False) 
-    game_played = db.Column(db.String(100), nullable=True) 
-    timestamp = db.Column(db.DateTime)
-
-
-def gerar_relatorio_basico(session):
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.engine import make_url
+
+from banco import uri_do_banco
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+CAMINHO_BANCO_PADRAO = os.path.join(PASTA, 'tinder_gamer.db') # o mesmo do app.py
+CAMINHO_ESTADO_PADRAO = os.path.join(PASTA, 'analise_estado.db')
+JOGOS_IGNORADOS = (None, "Não especificado")
+
+
+def caminho_do_banco():
+    """Arquivo SQLite do app (DATABASE_URL ou backend/tinder_gamer.db), resolvido como no app.py."""
+    url = make_url(uri_do_banco(CAMINHO_BANCO_PADRAO))
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        raise SystemExit(f"A análise usa a API de backup do SQLite; DATABASE_URL aponta para '{url.get_backend_name()}'. Use --banco <arquivo.db>.")
+    return url.database
+
+def tirar_snapshot(caminho_banco, destino=':memory:'):
+    """Copia o banco com a API de backup numa única leitura (um snapshot consistente). A origem é aberta só
+    para leitura; em WAL (padrão do app) a leitura não bloqueia escritores. Devolve a conexão da cópia."""
+    if not os.path.exists(caminho_banco): raise SystemExit(f"Banco não encontrado: {caminho_banco}")
+    origem = sqlite3.connect(Path(caminho_banco).resolve().as_uri() + '?mode=ro', uri=True)
+    copia = sqlite3.connect(destino)
+    try: origem.backup(copia)
+    finally: origem.close()
+    return copia
+
+
+# --- Estado entre execuções (arquivo separado) ---
+def abrir_estado(caminho):
+    conn = sqlite3.connect(caminho, timeout=5.0)
+    conn.execute("""CREATE TABLE IF NOT EXISTS execucao_analise (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, banco TEXT NOT NULL, executado_em TEXT NOT NULL,
+        marca_usuarios INTEGER, marca_likes INTEGER, marca_matches INTEGER, marca_avaliacoes INTEGER,
+        total_usuarios INTEGER, perfis_completos INTEGER, total_likes INTEGER, total_matches INTEGER, total_avaliacoes INTEGER)""")
+    return conn
+
+def ultima_execucao(conn_estado, banco):
+    cursor = conn_estado.execute("SELECT * FROM execucao_analise WHERE banco = ? ORDER BY id DESC LIMIT 1", (banco,))
+    linha = cursor.fetchone()
+    return dict(zip([c[0] for c in cursor.description], linha)) if linha else None
+
+def registrar_execucao(conn_estado, banco, metricas):
+    marcas = metricas["marcas"]
+    with conn_estado:
+        conn_estado.execute("""INSERT INTO execucao_analise (banco, executado_em, marca_usuarios, marca_likes, marca_matches, marca_avaliacoes,
+            total_usuarios, perfis_completos, total_likes, total_matches, total_avaliacoes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (banco, metricas["gerado_em"], marcas["usuarios"], marcas["likes"], marcas["matches"], marcas["avaliacoes"], metricas["total_usuarios"],
+             metricas["perfis_completos"], metricas["total_likes"], metricas["matches_mutuos"], metricas["avaliacoes"]["total"]))
+
+
+# --- Coleta (uma passada por tabela) ---
+def _contar_com_marca(conn, tabela, marca_anterior):
+    """(total, maior rowid, linhas com rowid acima da marca anterior) numa só leitura da tabela.
+    Ids só crescem (o app não apaga essas linhas), então rowid acima da marca = linha nova."""
+    total, marca, novos = conn.execute(f'SELECT COUNT(*), COALESCE(MAX(rowid), 0), COALESCE(SUM(rowid > ?), 0) FROM "{tabela}"', (marca_anterior or 0,)).fetchone()
+    return total, marca, novos
+
+def coletar_metricas(conn, anterior=None):
+    anterior = anterior or {}
+    tabelas = {nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    total_usuarios, marca_usuarios, novos_usuarios = _contar_com_marca(conn, 'user', anterior.get('marca_usuarios'))
+    total_likes, marca_likes, novos_likes = _contar_com_marca(conn, 'like', anterior.get('marca_likes'))
+
+    # Perfis: completos e popularidade dos jogos no mesmo agrupamento
+    perfis_completos = 0; jogos = []
+    for jogo, jogadores, completos in conn.execute("SELECT jogo_principal, COUNT(jogo_principal), COALESCE(SUM(profile_complete), 0) FROM user_profile GROUP BY jogo_principal"):
+        perfis_completos += completos
+        if jogo not in JOGOS_IGNORADOS: jogos.append({"jogo": jogo, "jogadores": jogadores})
+    jogos.sort(key=lambda j: j["jogadores"], reverse=True)
+
+    if 'mutual_match' in tabelas: matches, marca_matches, novos_matches = _contar_com_marca(conn, 'mutual_match', anterior.get('marca_matches'))
+    else:
+        # Banco anterior à tabela mutual_match: pares recíprocos num agrupamento de Like (sem self-join)
+        matches = conn.execute('''SELECT COUNT(*) FROM (SELECT 1 FROM "like" GROUP BY MIN(liker_user_id, liked_user_id), MAX(liker_user_id, liked_user_id)
+                                  HAVING COUNT(DISTINCT liker_user_id) = 2)''').fetchone()[0]
+        marca_matches = novos_matches = None
+
+    # Avaliações: média por jogador avaliado, totais e novas desde a última execução no mesmo agrupamento
+    marca_avaliacoes_anterior = anterior.get('marca_avaliacoes') or 0
+    por_jogador = []; total_avaliacoes = soma_notas = novas_avaliacoes = marca_avaliacoes = 0
+    for uid, nome, quantidade, soma, novas, marca in conn.execute('''
+            SELECT r.rated_user_id, p.nome_display, COUNT(*), SUM(r.rating), SUM(r.rowid > ?), MAX(r.rowid)
+            FROM match_rating r LEFT JOIN user_profile p ON p.user_id = r.rated_user_id GROUP BY r.rated_user_id''', (marca_avaliacoes_anterior,)):
+        por_jogador.append({"user_id": uid, "nome": nome or f"Usuário #{uid}", "media": round(soma / quantidade, 2), "avaliacoes": quantidade})
+        total_avaliacoes += quantidade; soma_notas += soma; novas_avaliacoes += novas; marca_avaliacoes = max(marca_avaliacoes, marca)
+    por_jogador.sort(key=lambda j: (j["media"], j["avaliacoes"]), reverse=True)
+
+    primeira = not anterior
+    return {
+        "gerado_em": datetime.now().isoformat(timespec='seconds'),
+        "total_usuarios": total_usuarios, "perfis_completos": perfis_completos,
+        "percentual_completo": round(perfis_completos / total_usuarios * 100, 2) if total_usuarios else None,
+        "top_jogos": jogos[:3], "total_likes": total_likes, "matches_mutuos": matches,
+        "avaliacoes": {"total": total_avaliacoes, "media_geral": round(soma_notas / total_avaliacoes, 2) if total_avaliacoes else None, "por_jogador": por_jogador},
+        "desde_ultima_execucao": None if primeira else {
+            "ultima_execucao": anterior["executado_em"], "usuarios": novos_usuarios, "likes": novos_likes, "matches_mutuos": novos_matches,
+            "avaliacoes": novas_avaliacoes, "perfis_completos": perfis_completos - (anterior.get('perfis_completos') or 0)},
+        "marcas": {"usuarios": marca_usuarios, "likes": marca_likes, "matches": marca_matches, "avaliacoes": marca_avaliacoes},
+    }
+
+
+# --- Saídas ---
+def gerar_relatorio_basico(metricas):
     print("--- Relatório Básico da Comunidade GG ---")
+    print(f"\n1. Total de Usuários Cadastrados: {metricas['total_usuarios']}")
+    print(f"2. Usuários com Perfil Completo: {metricas['perfis_completos']}")
+    if metricas["percentual_completo"] is not None: print(f"   ({metricas['percentual_completo']:.2f}% dos usuários totais)")
 
-    # 1. Número total de usuários cadastrados
-    total_usuarios = session.query(User).count()
-    print(f"\n1. Total de Usuários Cadastrados: {total_usuarios}")
+    print("\n3. Top 3 Jogos Principais Mais Populares:")
+    if metricas["top_jogos"]:
+        for i, jogo in enumerate(metricas["top_jogos"]): print(f"   {i+1}. {jogo['jogo']}: {jogo['jogadores']} jogadores")
+    else: print("   Nenhum jogo principal preenchido ainda.")
 
-    # 2. Número de usuários com perfil completo
-    perfis_completos = session.query(UserProfile).filter_by(profile_complete=True).count()
-    print(f"2. Usuários com Perfil Completo: {perfis_completos}")
-    if total_usuarios > 0:
-        percent_completo = (perfis_completos / total_usuarios) * 100
-        print(f"   ({percent_completo:.2f}% dos usuários totais)")
+    print(f"\n4. Total de 'Likes' (Aceites) Registrados: {metricas['total_likes']}")
+    print(f"5. Número de Pares de Match Mútuo: {metricas['matches_mutuos']}")
 
-    # 3. Top 3 Jogos Principais mais populares
-    print("\n3. Top 3 Jogos Principais Mais Populares:")
-    top_jogos = session.query(
-        UserProfile.jogo_principal, 
-        func.count(UserProfile.jogo_principal).label('contagem')
-    ).filter(UserProfile.jogo_principal != None, UserProfile.jogo_principal != "Não especificado").group_by(UserProfile.jogo_principal).order_by(func.count(UserProfile.jogo_principal).desc()).limit(3).all()
-    
-    if top_jogos:
-        for i, (jogo, contagem) in enumerate(top_jogos):
-            print(f"   {i+1}. {jogo}: {contagem} jogadores")
-    else:
-        print("   Nenhum jogo principal preenchido ainda.")
-
-    # 4. Número total de "Likes" dados
-    total_likes = session.query(Like).count()
-    print(f"\n4. Total de 'Likes' (Aceites) Registrados: {total_likes}")
-
-    # 5. Número de Matches Mútuos
-    # Um match mútuo é quando A curte B E B curte A
-    # Esta query é um pouco mais complexa, vamos simplificar contando pares
-    subquery_likes = session.query(Like.liker_user_id, Like.liked_user_id).subquery()
-    mutual_matches_count = session.query(Like).join(
-        subquery_likes,
-        (Like.liker_user_id == subquery_likes.c.liked_user_id) & \
-        (Like.liked_user_id == subquery_likes.c.liker_user_id)
-    ).count()
-    # Cada match mútuo será contado duas vezes (A->B e B->A), então dividi por 2
-    print(f"5. Número Estimado de Pares de Match Mútuo: {mutual_matches_count // 2}")
-
-
-    # 6. Média de Avaliações (se houver avaliações)
     print("\n6. Avaliações de Jogadores:")
-    avg_ratings = session.query(
-        UserProfile.nome_display,
-        func.avg(MatchRating.rating).label('media_avaliacoes'),
-        func.count(MatchRating.id).label('numero_avaliacoes')
-    ).select_from(MatchRating).join(UserProfile, UserProfile.user_id == MatchRating.rated_user_id).group_by(UserProfile.nome_display).order_by(func.avg(MatchRating.rating).desc()).all()
-
-    if avg_ratings:
+    avaliacoes = metricas["avaliacoes"]
+    if avaliacoes["por_jogador"]:
+        print(f"   {avaliacoes['total']} avaliações, média geral {avaliacoes['media_geral']:.2f} estrelas")
         print("   Média de Avaliações por Jogador Avaliado:")
-        for nome, media, n_avaliacoes in avg_ratings:
-            print(f"   - {nome}: {media:.2f} estrelas ({n_avaliacoes} avaliações)")
+        for j in avaliacoes["por_jogador"]: print(f"   - {j['nome']}: {j['media']:.2f} estrelas ({j['avaliacoes']} avaliações)")
+    else: print("   Nenhuma avaliação registrada ainda.")
+
+    print("\n7. Desde a Última Execução:")
+    novos = metricas["desde_ultima_execucao"]
+    if novos is None: print("   Primeira execução registrada (os próximos relatórios mostram a variação).")
     else:
-        print("   Nenhuma avaliação registrada ainda.")
-    
+        print(f"   (última execução: {novos['ultima_execucao']})")
+        print(f"   Novos usuários: {novos['usuarios']} | Novos likes: {novos['likes']} | Novos matches mútuos: {novos['matches_mutuos'] if novos['matches_mutuos'] is not None else '-'}")
+        print(f"   Novas avaliações: {novos['avaliacoes']} | Variação de perfis completos: {novos['perfis_completos']:+d}")
+
     print("\n--- Fim do Relatório ---")
 
+def salvar_json(metricas, caminho):
+    with open(caminho, 'w', encoding='utf-8') as arquivo: json.dump(metricas, arquivo, ensure_ascii=False, indent=2)
+
+def salvar_csv(metricas, caminho):
+    """Formato longo (metrica, chave, valor): uma linha por número, fácil de carregar em planilha ou pandas."""
+    linhas = [("total_usuarios", "", metricas["total_usuarios"]), ("perfis_completos", "", metricas["perfis_completos"]),
+              ("percentual_completo", "", metricas["percentual_completo"]), ("total_likes", "", metricas["total_likes"]),
+              ("matches_mutuos", "", metricas["matches_mutuos"]), ("avaliacoes_total", "", metricas["avaliacoes"]["total"]),
+              ("avaliacoes_media_geral", "", metricas["avaliacoes"]["media_geral"])]
+    linhas += [("top_jogos", j["jogo"], j["jogadores"]) for j in metricas["top_jogos"]]
+    for j in metricas["avaliacoes"]["por_jogador"]: linhas += [("media_avaliacao", j["user_id"], j["media"]), ("numero_avaliacoes", j["user_id"], j["avaliacoes"])]
+    for chave, valor in (metricas["desde_ultima_execucao"] or {}).items(): linhas.append(("desde_ultima_execucao", chave, valor))
+    with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+        escritor = csv.writer(arquivo); escritor.writerow(("metrica", "chave", "valor"))
+        escritor.writerows(("" if v is None else v for v in linha) for linha in linhas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relatório da comunidade GG sobre um snapshot do banco.")
+    parser.add_argument('--banco', help="arquivo SQLite (padrão: o mesmo do app, via DATABASE_URL ou backend/tinder_gamer.db)")
+    parser.add_argument('--snapshot', default=':memory:', help="onde guardar a cópia (padrão: só em memória)")
+    parser.add_argument('--estado', default=os.getenv('ANALISE_ESTADO', CAMINHO_ESTADO_PADRAO), help="arquivo com as execuções anteriores")
+    parser.add_argument('--sem-estado', action='store_true', help="não lê nem registra execuções (sem a seção 'desde a última execução')")
+    parser.add_argument('--json', help="também grava as métricas em JSON neste arquivo")
+    parser.add_argument('--csv', help="também grava as métricas em CSV (metrica,chave,valor) neste arquivo")
+    args = parser.parse_args(argv)
+
+    banco = os.path.abspath(args.banco or caminho_do_banco())
+    conn_estado = None if args.sem_estado else abrir_estado(args.estado)
+    snapshot = tirar_snapshot(banco, args.snapshot)
+    try: metricas = coletar_metricas(snapshot, ultima_execucao(conn_estado, banco) if conn_estado else None)
+    finally: snapshot.close()
+    metricas["banco"] = banco
+    gerar_relatorio_basico(metricas)
+    if args.json: salvar_json(metricas, args.json)
+    if args.csv: salvar_csv(metricas, args.csv)
+    if conn_estado is not None: registrar_execucao(conn_estado, banco, metricas); conn_estado.close()
+    return 0
 
 if __name__ == '__main__':
-    # Cria uma sessão para interagir com o banco de dados
-    # Certifique-se que o arquivo tinder_gamer.db está no mesmo diretório ou forneça o caminho correto
-    engine = create_engine(temp_app.config['SQLALCHEMY_DATABASE_URI'])
-    Session = sessionmaker(bind=engine)
-    session = Session()
-
-    # Para garantir que as tabelas sejam criadas se não existirem (caso rode este script antes do app.py)
-    # No entanto, é melhor que o app.py seja o responsável primário pela criação.
-    # with temp_app.app_context():
-    #     db.create_all() # Pode comentar se o app.py já criou as tabelas
-
-    gerar_relatorio_basico(session)
-
-    session.close()
\ No newline at end of file
+    sys.exit(main())
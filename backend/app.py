@@ -1,34 +1,81 @@
 # backend/app.py
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import os
 import random
+import json
+import base64
+import click
+import hmac
+import threading
+import time
+import uuid
 import google.generativeai as genai
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func 
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, JWTManager
+from sqlalchemy import case, func, inspect, literal, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import validates
+from sqlalchemy.schema import CreateIndex
+from flask_jwt_extended import create_access_token, decode_token, jwt_required, get_jwt_identity, JWTManager
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
 from dotenv import load_dotenv
 from datetime import datetime
+from matchmaking import MAPA_COMUNICACAO, MAPA_NIVEIS, MAX_RATING_BOOST, ColunasPerfis, tokens_disponibilidade_para_coluna
+from classificador_local import ClassificadorLocal
+from cache_gemini import CacheRespostasGemini
+from sessoes_chatbot import ConflitoSessao, criar_armazem_sessoes, estado_inicial
+from pubsub import criar_pubsub, endereco_broker, servir_broker
+from recomendacoes import assinatura_comunidade, dividir_em_tarefas, ranquear_em_pool
+from banco import configurar_banco, instalar_pragmas
+from observabilidade import AmostradorPerfis, RegistroMetricas, configurar_logs, instalar_instrumentacao
+from cache_lru import CacheLRU
+from gemini_cliente import ClienteGemini, GeminiIndisponivel, ModeloGeminiFalso
+from senhas import METODO_PADRAO, SenhasOcupadas, ServicoSenhas
 
 # --- Configurações da Aplicação ---
 app = Flask(__name__)
 load_dotenv() 
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
+# --- Observabilidade ---
+# Logs do app vão para o logger 'gg' (LOG_LEVEL=DEBUG mostra cada requisição, OFF desliga; LOG_FORMATO=json).
+# Métricas em GET /metrics (Prometheus); PROFILE_AMOSTRAGEM>0 liga o cProfile por amostragem.
+logger = configurar_logs(os.getenv('LOG_LEVEL', 'INFO'), os.getenv('LOG_FORMATO', 'texto'))
+metricas = RegistroMetricas(); METRICAS_TOKEN = os.getenv('METRICAS_TOKEN') or None
+amostrador_perfis = AmostradorPerfis(float(os.getenv('PROFILE_AMOSTRAGEM', 0)), os.getenv('PROFILE_PASTA') or os.path.join(os.path.dirname(__file__), 'perfis'),
+                                     int(os.getenv('PROFILE_MANTER', 20)))
+metricas.histograma('gg_gemini_chamada_segundos', "Duração de cada chamada ao Gemini (upstream), por tipo e resultado")
+metricas.histograma('gg_matcher_fase_segundos', "Duração de cada fase da montagem do deck de matches")
+
 # --- Configurações do Banco de Dados ---
-# ATUALIZADO: Caminho explícito para o banco de dados na pasta 'backend'
+# DATABASE_URL no .env troca o banco (ex.: outro arquivo SQLite, Postgres); sem ela, tinder_gamer.db na pasta 'backend'
 db_path = os.path.join(os.path.dirname(__file__), 'tinder_gamer.db')
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+configurar_banco(app, db_path)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-super-secret-key-gg-v11') # Mude no .env
 
 # --- Configurações do Gemini ---
 model_gemini = None
+# Todas as chamadas passam pelo cliente: pool limitado, timeout por chamada e fallback
+cliente_gemini = ClienteGemini(max_concorrencia=int(os.getenv('GEMINI_MAX_CONCORRENCIA', 8)), timeout_segundos=float(os.getenv('GEMINI_TIMEOUT_SEGUNDOS', 8)),
+                               ao_medir=lambda tipo, segundos, resultado: metricas.observar('gg_gemini_chamada_segundos', segundos, tipo=tipo, resultado=resultado))
+cache_gemini = CacheRespostasGemini(max_itens=int(os.getenv('GEMINI_CACHE_MAX_ITENS', 5000)), caminho_sqlite=os.getenv('GEMINI_CACHE_SQLITE') or None)
+
+# --- Senhas ---
+# Hash e verificação num pool de processos limitado (senhas.py). SENHA_HASH_METODO muda os parâmetros do KDF;
+# hashes com os parâmetros antigos são refeitos no próximo login certo. Mantenha SENHAS_PROCESSOS + SENHAS_FILA_MAX
+# abaixo das threads do worker: numa rajada de logins, o excedente recebe 503 e as demais rotas seguem atendidas.
+servico_senhas = ServicoSenhas(os.getenv('SENHA_HASH_METODO', METODO_PADRAO), processos=int(os.getenv('SENHAS_PROCESSOS', os.cpu_count() or 1)),
+                               fila_max=int(os.getenv('SENHAS_FILA_MAX', 4)), timeout_segundos=float(os.getenv('SENHAS_TIMEOUT_SEGUNDOS', 10)))
 
 db = SQLAlchemy(app)
+instalar_pragmas(app, db) # WAL, busy_timeout etc. em cada conexão SQLite
 jwt = JWTManager(app)
+sock = Sock(app)
+with app.app_context(): instalar_instrumentacao(app, db.engine, metricas, amostrador_perfis)
 
 # --- Modelos de Dados (SQLAlchemy) ---
 # (User, UserProfile, Like, MatchRating - permanecem os mesmos da versão anterior)
@@ -43,8 +90,8 @@ class User(db.Model):
     ratings_given = db.relationship('MatchRating', foreign_keys='MatchRating.rater_user_id', backref='rater_user', lazy='dynamic', cascade="all, delete-orphan")
     ratings_received = db.relationship('MatchRating', foreign_keys='MatchRating.rated_user_id', backref='rated_user', lazy='dynamic', cascade="all, delete-orphan")
 
-    def set_password(self, password): self.password_hash = generate_password_hash(password)
-    def check_password(self, password): return check_password_hash(self.password_hash, password)
+    def set_password(self, password): self.password_hash = servico_senhas.gerar(password)
+    def check_password(self, password): return servico_senhas.verificar(self.password_hash, password)[0]
 
 class UserProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -57,13 +104,50 @@ class UserProfile(db.Model):
     gender = db.Column(db.String(50)) 
     communication_style = db.Column(db.String(100)) 
     profile_complete = db.Column(db.Boolean, default=False)
+    # Chave do jogo já normalizada (mesma regra do scorer) para buscar candidatos por índice
+    jogo_normalizado = db.Column(db.String(100))
+    # Tokens de disponibilidade já normalizados (separados por espaço), calculados ao salvar o perfil
+    disponibilidade_tokens = db.Column(db.String(400))
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # versão do perfil (carimbo do cache de matches)
+    __table_args__ = (db.Index('ix_user_profile_jogo_completo', 'jogo_normalizado', 'profile_complete'),
+                      db.Index('ix_user_profile_completo', 'profile_complete')) # contagens/listas sem jogo (analista)
+
+    @validates('jogo_principal')
+    def _sincronizar_jogo_normalizado(self, key, valor):
+        self.jogo_normalizado = normalizar_jogo(valor)
+        return valor
+
+    @validates('disponibilidade')
+    def _sincronizar_disponibilidade_tokens(self, key, valor):
+        self.disponibilidade_tokens = tokens_disponibilidade_para_coluna(valor)
+        return valor
 
 class Like(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     liker_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     liked_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    __table_args__ = (db.UniqueConstraint('liker_user_id', 'liked_user_id', name='_liker_liked_uc'),)
+    __table_args__ = (db.UniqueConstraint('liker_user_id', 'liked_user_id', name='_liker_liked_uc'),
+                      db.Index('ix_like_liked_liker', 'liked_user_id', 'liker_user_id')) # lado "recebido" do par
+
+class MutualMatch(db.Model):
+    # Um registro por par com like recíproco, sempre na ordem (menor id, maior id); criado junto com o segundo like
+    user_min_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    user_max_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    matched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_mutual_match_max_min', 'user_max_id', 'user_min_id'),) # a PK já cobre (min, max)
+
+class Message(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_min_id = db.Column(db.Integer, nullable=False) # conversa = par canônico, como em MutualMatch
+    user_max_id = db.Column(db.Integer, nullable=False)
+    sender_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    receiver_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    read_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (db.Index('ix_message_conversa_criada', 'user_min_id', 'user_max_id', 'created_at', 'id'), # histórico: busca + ordem no índice
+                      db.Index('ix_message_nao_lidas', 'receiver_user_id', 'read_at'),)
 
 class MatchRating(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -72,25 +156,183 @@ class MatchRating(db.Model):
     rating = db.Column(db.Integer, nullable=False) 
     game_played = db.Column(db.String(100), nullable=True) 
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    __table_args__ = (db.UniqueConstraint('rater_user_id', 'rated_user_id', 'game_played', name='_rater_rated_game_uc'),)
+    __table_args__ = (db.UniqueConstraint('rater_user_id', 'rated_user_id', 'game_played', name='_rater_rated_game_uc'),
+                      db.Index('ix_match_rating_avaliado_jogo', 'rated_user_id', 'game_played')) # avaliações recebidas (verificar-agregados)
+
+class RatingAgregado(db.Model):
+    # Soma/contagem das MatchRating por (avaliado, jogo), mantidas incrementalmente em rate_player_endpoint
+    rated_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    jogo_chave = db.Column(db.String(100), primary_key=True) # ver chave_jogo_avaliacao
+    soma = db.Column(db.Integer, nullable=False, default=0)
+    contagem = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_rating_agregado_jogo', 'jogo_chave'),)
+
+class Recommendation(db.Model):
+    # Top-K pré-calculado de cada viewer (flask --app app recomendar); /api/get_match lê pela PK, em ordem
+    viewer_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    posicao = db.Column(db.Integer, primary_key=True)
+    candidate_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    jogo_normalizado = db.Column(db.String(100), nullable=False) # jogo do viewer no cálculo
+    score = db.Column(db.Float, nullable=False)
+    nome = db.Column(db.String(100))
+    razoes = db.Column(db.String(300))
+    calculado_em = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (db.Index('ix_recommendation_jogo', 'jogo_normalizado'),)
+
+class VersaoComunidade(db.Model):
+    # Contador de mudanças por comunidade, parte do carimbo dos decks em cache (ver sinalizar_mudanca_comunidade)
+    jogo_normalizado = db.Column(db.String(100), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+class RecomendacaoComunidade(db.Model):
+    # Assinatura de cada comunidade na última rodada do pré-cálculo: se não mudou, não recalcula
+    jogo_normalizado = db.Column(db.String(100), primary_key=True)
+    assinatura = db.Column(db.String(200), nullable=False)
+    viewers = db.Column(db.Integer, nullable=False, default=0)
+    calculado_em = db.Column(db.DateTime, nullable=False)
+
+
+def normalizar_jogo(jogo):
+    """A única regra de comparação de jogos (perfis, comunidades, avaliações): str.lower() do Python, que converte
+    qualquer letra ('POKÉMON' -> 'pokémon'), e sem espaços nas pontas. Nunca lower() do SQL: o do SQLite só
+    converte ASCII ('POKÉMON' -> 'pokÉmon')."""
+    return str(jogo).lower().strip() if jogo is not None else None
+
+def chave_jogo_avaliacao(game_played):
+    """Chave do jogo em RatingAgregado: normalizar_jogo, a mesma do jogo_normalizado do viewer.
+    Avaliações sem jogo ficam em '' e só entram na média geral (viewer sem jogo)."""
+    return normalizar_jogo(game_played) or ''
+
+def registrar_avaliacao_no_agregado(rated_user_id, game_played, delta_soma, delta_contagem):
+    chave = chave_jogo_avaliacao(game_played); agora = datetime.utcnow()
+    # UPDATE relativo (soma = soma + delta) para não perder incrementos concorrentes
+    atualizados = RatingAgregado.query.filter_by(rated_user_id=rated_user_id, jogo_chave=chave).update(
+        {RatingAgregado.soma: RatingAgregado.soma + delta_soma, RatingAgregado.contagem: RatingAgregado.contagem + delta_contagem, RatingAgregado.atualizado_em: agora},
+        synchronize_session=False)
+    if not atualizados:
+        db.session.add(RatingAgregado(rated_user_id=rated_user_id, jogo_chave=chave, soma=delta_soma, contagem=delta_contagem, atualizado_em=agora))
+
+def carregar_medias_avaliacao(jogo_normalizado):
+    """{rated_user_id: média de estrelas} para o jogo, numa única consulta ao agregado.
+    Sem jogo, soma todos os jogos do avaliado (mesmo comportamento do AVG sem filtro)."""
+    if jogo_normalizado:
+        linhas = db.session.query(RatingAgregado.rated_user_id, RatingAgregado.soma, RatingAgregado.contagem).filter(RatingAgregado.jogo_chave == jogo_normalizado)
+    else:
+        linhas = db.session.query(RatingAgregado.rated_user_id, func.sum(RatingAgregado.soma), func.sum(RatingAgregado.contagem)).group_by(RatingAgregado.rated_user_id)
+    return {uid: soma / contagem for uid, soma, contagem in linhas if contagem}
 
+def consulta_avaliacoes_recebidas(rated_user_id):
+    return db.session.query(MatchRating.game_played, MatchRating.rating).filter(MatchRating.rated_user_id == rated_user_id)
+
+def media_avaliacao_por_consulta(rated_user_id, jogo_normalizado):
+    """Caminho antigo (uma média por candidato, direto de MatchRating). Mantido só como referência em
+    verificar-agregados; o jogo é comparado com chave_jogo_avaliacao em Python, pela mesma regra do agregado."""
+    notas = [nota for jogo, nota in consulta_avaliacoes_recebidas(rated_user_id) if not jogo_normalizado or chave_jogo_avaliacao(jogo) == jogo_normalizado]
+    return sum(notas) / len(notas) if notas else None
+
+# --- Migrações de Esquema ---
+# db.create_all() só cria tabelas que ainda não existem. Colunas novas em tabelas antigas
+# são adicionadas aqui, uma única vez por banco (registradas em schema_migracao).
+def _colunas_da_tabela(conn, tabela):
+    return {c['name'] for c in inspect(conn).get_columns(tabela)}
+
+def migracao_jogo_normalizado(conn):
+    if 'jogo_normalizado' not in _colunas_da_tabela(conn, 'user_profile'):
+        conn.execute(text("ALTER TABLE user_profile ADD COLUMN jogo_normalizado VARCHAR(100)"))
+    perfis = conn.execute(text("SELECT id, jogo_principal FROM user_profile WHERE jogo_normalizado IS NULL AND jogo_principal IS NOT NULL")).all()
+    for perfil_id, jogo in perfis:
+        conn.execute(text("UPDATE user_profile SET jogo_normalizado = :j WHERE id = :id"), {"j": normalizar_jogo(jogo), "id": perfil_id})
+
+def migracao_rating_agregado(conn):
+    # Reconstrói o agregado a partir das avaliações já existentes
+    conn.execute(text("DELETE FROM rating_agregado"))
+    agregados = {}
+    for rated_user_id, game_played, rating in conn.execute(text("SELECT rated_user_id, game_played, rating FROM match_rating")):
+        chave = (rated_user_id, chave_jogo_avaliacao(game_played))
+        soma, contagem = agregados.get(chave, (0, 0)); agregados[chave] = (soma + rating, contagem + 1)
+    agora = datetime.utcnow()
+    for (rated_user_id, jogo_chave), (soma, contagem) in agregados.items():
+        conn.execute(text("INSERT INTO rating_agregado (rated_user_id, jogo_chave, soma, contagem, atualizado_em) VALUES (:u, :j, :s, :c, :t)"),
+                     {"u": rated_user_id, "j": jogo_chave, "s": soma, "c": contagem, "t": agora})
+
+def migracao_disponibilidade_tokens(conn):
+    if 'disponibilidade_tokens' not in _colunas_da_tabela(conn, 'user_profile'):
+        conn.execute(text("ALTER TABLE user_profile ADD COLUMN disponibilidade_tokens VARCHAR(400)"))
+    perfis = conn.execute(text("SELECT id, disponibilidade FROM user_profile WHERE disponibilidade_tokens IS NULL AND disponibilidade IS NOT NULL")).all()
+    for perfil_id, disponibilidade in perfis:
+        conn.execute(text("UPDATE user_profile SET disponibilidade_tokens = :t WHERE id = :id"), {"t": tokens_disponibilidade_para_coluna(disponibilidade), "id": perfil_id})
+
+def preencher_matches_mutuos(conn):
+    """Cria os MutualMatch que faltam a partir dos pares de Like recíprocos. Idempotente; devolve quantos entraram."""
+    return conn.execute(text(
+        "INSERT INTO mutual_match (user_min_id, user_max_id, matched_at) "
+        "SELECT a.liker_user_id, a.liked_user_id, CASE WHEN a.timestamp > b.timestamp THEN a.timestamp ELSE b.timestamp END "
+        "FROM \"like\" a JOIN \"like\" b ON b.liker_user_id = a.liked_user_id AND b.liked_user_id = a.liker_user_id "
+        "WHERE a.liker_user_id < a.liked_user_id ON CONFLICT DO NOTHING")).rowcount
+
+def migracao_perfil_atualizado_em(conn):
+    if 'atualizado_em' not in _colunas_da_tabela(conn, 'user_profile'):
+        conn.execute(text("ALTER TABLE user_profile ADD COLUMN atualizado_em DATETIME"))
+    conn.execute(text("UPDATE user_profile SET atualizado_em = :t WHERE atualizado_em IS NULL"), {"t": datetime.utcnow()})
+
+def migracao_indice_avaliacoes_sem_expressao(conn):
+    # A versão da 006 indexava lower(game_played), de um filtro que não existe mais: vira (rated_user_id, game_played)
+    conn.execute(text("DROP INDEX IF EXISTS ix_match_rating_avaliado_jogo"))
+    conn.execute(CreateIndex(next(i for i in MatchRating.__table__.indexes if i.name == 'ix_match_rating_avaliado_jogo')))
+
+def migracao_indices_consultas_quentes(conn):
+    # Índices das buscas por chave estrangeira/filtro dos caminhos quentes (ver verificar-planos);
+    # ANALYZE em seguida para o planejador conhecer a seletividade de cada um
+    for tabela, nome in (('user_profile', 'ix_user_profile_completo'), ('match_rating', 'ix_match_rating_avaliado_jogo'), ('like', 'ix_like_liked_liker')):
+        conn.execute(CreateIndex(next(i for i in db.metadata.tables[tabela].indexes if i.name == nome), if_not_exists=True))
+    conn.execute(text("ANALYZE"))
+
+MIGRACOES = [
+    ('001_jogo_normalizado', migracao_jogo_normalizado),
+    ('002_rating_agregado', migracao_rating_agregado),
+    ('003_disponibilidade_tokens', migracao_disponibilidade_tokens),
+    ('004_perfil_atualizado_em', migracao_perfil_atualizado_em),
+    ('005_mutual_match', preencher_matches_mutuos),
+    ('006_indices_consultas_quentes', migracao_indices_consultas_quentes),
+    ('007_chave_jogo_unicode', migracao_rating_agregado), # chave do agregado passou a ser normalizar_jogo (lower Unicode + strip)
+    ('008_indice_avaliacoes_sem_expressao', migracao_indice_avaliacoes_sem_expressao),
+]
+
+def aplicar_migracoes():
+    db.create_all()
+    with db.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_migracao (nome VARCHAR(100) PRIMARY KEY, aplicada_em DATETIME)"))
+        aplicadas = {linha[0] for linha in conn.execute(text("SELECT nome FROM schema_migracao"))}
+        for nome, migracao in MIGRACOES:
+            if nome in aplicadas: continue
+            migracao(conn)
+            conn.execute(text("INSERT INTO schema_migracao (nome, aplicada_em) VALUES (:n, :t)"), {"n": nome, "t": datetime.utcnow()})
+            logger.info("migração aplicada", extra={"migracao": nome})
+        # Índices declarados nos modelos que ainda não existem em tabelas antigas (IF NOT EXISTS: idempotente)
+        for tabela in db.metadata.sorted_tables:
+            for indice in tabela.indexes: conn.execute(CreateIndex(indice, if_not_exists=True))
 
 # --- Lógica de Inicialização de Serviços ---
 def inicializar_servicos_google():
     global model_gemini
     try:
-        gemini_api_key = os.getenv('GEMINI_API_KEY')
-        if gemini_api_key:
+        gemini_api_key = os.getenv('GEMINI_API_KEY'); latencia_falsa = os.getenv('GEMINI_MODELO_FALSO_LATENCIA')
+        if latencia_falsa is not None:
+            model_gemini = ModeloGeminiFalso(float(latencia_falsa or 0))
+            logger.info("usando modelo Gemini FALSO local", extra={"latencia_segundos": model_gemini.latencia_segundos})
+        elif gemini_api_key:
             genai.configure(api_key=gemini_api_key)
             model_gemini = genai.GenerativeModel('gemini-1.5-flash-latest')
-            print("Modelo Gemini carregado com sucesso usando GEMINI_API_KEY.")
+            logger.info("modelo Gemini carregado com GEMINI_API_KEY")
         else:
-            print("ERRO CRÍTICO: GEMINI_API_KEY não configurada. Chatbot não funcionará com IA.")
-    except Exception as e:
-        print(f"Erro ao carregar o modelo Gemini: {e}")
+            logger.error("GEMINI_API_KEY não configurada: chatbot sem IA")
+    except Exception:
+        logger.exception("erro ao carregar o modelo Gemini")
+    cliente_gemini.modelo = model_gemini
 
 # --- Lógica do Chatbot de Perfil (Expandida e Corrigida) ---
-user_chatbot_state = {} 
+sessoes_chatbot = criar_armazem_sessoes(os.getenv('CHATBOT_SESSOES_SQLITE') or None, ttl_segundos=int(os.getenv('CHATBOT_SESSOES_TTL_SEGUNDOS', 3600)))
 PROFILE_QUESTIONS_ORDER = ['nome_display', 'jogo_principal', 'nivel_de_habilidade', 'estilo_jogo', 'disponibilidade', 'gender', 'communication_style']
 PROFILE_GEMINI_EXTRACTION_FIELDS = {
     'nome_display': "Nome de display ou apelido do jogador", 'jogo_principal': "Principal jogo de interesse do jogador",
@@ -104,6 +346,8 @@ PROFILE_GEMINI_CATEGORIES = {
     'gender': ['Mulher', 'Homem', 'Não-binário', 'Gênero fluido', 'Agênero', 'Prefiro não dizer', 'Outro'],
     'communication_style': ['No silêncio (foco total)', 'Só o necessário (calls estratégicas)', 'Conversa casual e social', 'Vale tudo (cantar, zoar, resenha!)', 'Depende do momento/jogo', 'Com música e zoeira']
 }
+classificador_local = ClassificadorLocal(PROFILE_GEMINI_CATEGORIES, {'nivel_de_habilidade': MAPA_NIVEIS, 'communication_style': MAPA_COMUNICACAO},
+                                         confianca_minima=float(os.getenv('CLASSIFICADOR_CONFIANCA_MINIMA', 0.85)))
 BASE_QUESTION_IDEAS = {
     'greeting': "E aí! Sou o GG, seu guia gente boa pra montar um perfil gamer daora e achar seu squad perfeito! Para começar,",
     'nome_display': "como a galera te chama nas partidas, ou qual seu nick preferido?",
@@ -117,12 +361,21 @@ BASE_QUESTION_IDEAS = {
 }
 BOT_PERSONALITY_PROMPT = "Você é GG, um mascote e assistente gamer gente boa, amigável, um pouco divertido, mas principalmente natural e prestativo. Use uma linguagem informal e clara, como se estivesse conversando com um amigo sobre jogos. Use emojis com moderação para dar um toque amigável (😊, 👍, 😉, 🎉, 🤔). Evite gírias muito específicas ou em excesso. Mantenha as perguntas e comentários curtos (uma ou duas frases) e diretos. NÃO repita saudações. Se o usuário der uma resposta, faça um breve comentário de reconhecimento (ex: 'Entendi!', 'Legal!') ANTES da próxima pergunta. Se não entender ou a extração for 'Não especificado', peça para repetir ou ofereça opções."
 
-def generate_bot_question(current_field_to_ask, previous_user_response, collected_data, is_first_interaction_of_session):
-    if not model_gemini: 
-        fallback_question_idea = BASE_QUESTION_IDEAS.get(current_field_to_ask, "Pode me falar mais sobre isso?")
-        if is_first_interaction_of_session: return f"{BASE_QUESTION_IDEAS['greeting']} {fallback_question_idea.format(**collected_data)}"
-        return fallback_question_idea.format(**collected_data)
-    prompt_parts = [BOT_PERSONALITY_PROMPT]
+def gerar_com_cache(tipo, campo, conteudo, prompt):
+    """cliente_gemini.gerar com cache pelo conteúdo; só respostas bem-sucedidas são guardadas."""
+    resposta = cache_gemini.obter(tipo, campo, conteudo)
+    if resposta is not None: return resposta
+    inicio = time.perf_counter(); resposta = cliente_gemini.gerar(prompt, rotulo=tipo)
+    cache_gemini.guardar(tipo, campo, conteudo, resposta, time.perf_counter() - inicio)
+    return resposta
+
+def pergunta_base(current_field_to_ask, collected_data, is_first_interaction_of_session):
+    fallback_question_idea = BASE_QUESTION_IDEAS.get(current_field_to_ask, "Pode me falar mais sobre isso?")
+    if is_first_interaction_of_session: return f"{BASE_QUESTION_IDEAS['greeting']} {fallback_question_idea.format(**collected_data)}"
+    return fallback_question_idea.format(**collected_data)
+
+def montar_prompt_pergunta(current_field_to_ask, previous_user_response, collected_data, is_first_interaction_of_session):
+    prompt_parts = []
     base_idea_for_question = BASE_QUESTION_IDEAS[current_field_to_ask].format(**collected_data)
     if is_first_interaction_of_session:
         prompt_parts.append(f"Esta é a primeira pergunta após a saudação. Formule a pergunta para: '{PROFILE_GEMINI_EXTRACTION_FIELDS[current_field_to_ask]}'. Ideia: \"{base_idea_for_question}\". Pergunta:")
@@ -132,66 +385,188 @@ def generate_bot_question(current_field_to_ask, previous_user_response, collecte
         if 'nome_display' in collected_data and collected_data['nome_display'] not in ["Não especificado", ""]: context_str += f" (nome: {collected_data['nome_display']})"
         if 'jogo_principal' in collected_data and collected_data['jogo_principal'] not in ["Não especificado", ""] and current_field_to_ask != 'jogo_principal': context_str += f" (joga: {collected_data['jogo_principal']})"
         prompt_parts.append(f"{context_str if len(context_str) > len('Considerando') else ''}, formule a pergunta para: '{PROFILE_GEMINI_EXTRACTION_FIELDS[current_field_to_ask]}'. Ideia: \"{base_idea_for_question}\". Pergunta Gerada:")
-    full_prompt = "\n".join(prompt_parts)
+    return "\n".join(prompt_parts), base_idea_for_question
+
+def limpar_pergunta_gerada(question, base_idea_for_question):
+    question = question.strip()
+    if question.lower().startswith("pergunta gerada:"): question = question.split(":",1)[-1].strip()
+    return question if question else base_idea_for_question
+
+def generate_bot_question(current_field_to_ask, previous_user_response, collected_data, is_first_interaction_of_session):
+    if not cliente_gemini.disponivel(): return pergunta_base(current_field_to_ask, collected_data, is_first_interaction_of_session)
+    prompt_pergunta, base_idea_for_question = montar_prompt_pergunta(current_field_to_ask, previous_user_response, collected_data, is_first_interaction_of_session)
+    full_prompt = "\n".join([BOT_PERSONALITY_PROMPT, prompt_pergunta])
+    try: return limpar_pergunta_gerada(gerar_com_cache('pergunta', current_field_to_ask, " ".join(full_prompt.split()), full_prompt), base_idea_for_question)
+    except GeminiIndisponivel as e: logger.warning("Gemini indisponível (pergunta)", extra={"campo": current_field_to_ask, "erro": str(e)}); return pergunta_base(current_field_to_ask, collected_data, is_first_interaction_of_session)
+
+PREFIXO_PERGUNTA_GERADA = "pergunta gerada:"
+
+def gerar_pergunta_em_partes(current_field_to_ask, previous_user_response, collected_data, is_first_interaction_of_session):
+    """Como generate_bot_question, mas entregando a pergunta em pedaços conforme o Gemini gera (para SSE)."""
+    if not cliente_gemini.disponivel(): yield pergunta_base(current_field_to_ask, collected_data, is_first_interaction_of_session); return
+    prompt_pergunta, base_idea_for_question = montar_prompt_pergunta(current_field_to_ask, previous_user_response, collected_data, is_first_interaction_of_session)
+    full_prompt = "\n".join([BOT_PERSONALITY_PROMPT, prompt_pergunta]); conteudo = " ".join(full_prompt.split())
+    em_cache = cache_gemini.obter('pergunta', current_field_to_ask, conteudo)
+    if em_cache is not None: yield limpar_pergunta_gerada(em_cache, base_idea_for_question); return
+    recebido = ""; enviado = 0; inicio = time.perf_counter()
     try:
-        response = model_gemini.generate_content(full_prompt); question = response.text.strip()
-        if question.lower().startswith("pergunta gerada:"): question = question.split(":",1)[-1].strip()
-        return question if question else base_idea_for_question
-    except Exception as e: print(f"Erro Gemini (gerar pergunta) '{current_field_to_ask}': {e}"); return base_idea_for_question
+        for pedaco in cliente_gemini.gerar_em_partes(full_prompt, rotulo='pergunta_em_partes'):
+            recebido += pedaco
+            if enviado == 0: # segura o começo até dar para tirar o "Pergunta Gerada:" que o modelo às vezes repete
+                inicio_texto = recebido.lstrip()
+                if len(inicio_texto) < len(PREFIXO_PERGUNTA_GERADA) and PREFIXO_PERGUNTA_GERADA.startswith(inicio_texto.lower()): continue
+                limpo = limpar_pergunta_gerada(recebido, "") if inicio_texto.lower().startswith(PREFIXO_PERGUNTA_GERADA) else inicio_texto
+                if not limpo: continue
+                enviado = len(recebido); yield limpo
+            else: enviado = len(recebido); yield pedaco
+    except GeminiIndisponivel as e:
+        logger.warning("Gemini indisponível (pergunta em partes)", extra={"campo": current_field_to_ask, "erro": str(e)})
+        if enviado == 0: yield pergunta_base(current_field_to_ask, collected_data, is_first_interaction_of_session)
+        return
+    if enviado == 0: yield limpar_pergunta_gerada(recebido, base_idea_for_question) # resposta curta/vazia que ficou toda segurada
+    cache_gemini.guardar('pergunta', current_field_to_ask, conteudo, recebido, time.perf_counter() - inicio)
 
-def extrair_info_chatbot_com_gemini(texto_usuario, campo_desejado):
-    if not model_gemini: print("AVISO: Modelo Gemini não carregado para extração."); return texto_usuario 
+def montar_prompt_extracao(texto_usuario, campo_desejado):
     categorias = PROFILE_GEMINI_CATEGORIES.get(campo_desejado); pfd = PROFILE_GEMINI_EXTRACTION_FIELDS.get(campo_desejado, campo_desejado)
     prompt = f"Do texto: \"{texto_usuario}\", extraia APENAS: '{pfd}'."
     if categorias: prompt += f"\nCategorias: {categorias}. Se não claro/encaixar, retorne 'Não especificado'."
     else: prompt += f"\nRetorne conciso. Se não claro, 'Não especificado'."
+    return prompt, pfd
+
+def limpar_extracao(info_extraida, pfd):
+    info_extraida = info_extraida.strip()
+    if ":" in info_extraida and info_extraida.lower().startswith(pfd.lower().split()[0].lower()): info_extraida = info_extraida.split(":", 1)[-1].strip()
+    if not info_extraida or "não especificado" in info_extraida.lower() or "não identificar" in info_extraida.lower() or len(info_extraida) > 100: return "Não especificado"
+    return info_extraida
+
+def classificar_localmente(texto_usuario, campo_desejado):
+    """Categoria do campo sem passar pelo Gemini, ou None se a resposta for ambígua (ou o campo for livre)."""
+    resultado = classificador_local.classificar(texto_usuario, campo_desejado)
+    return resultado[0] if resultado else None
+
+def extrair_info_chatbot_com_gemini(texto_usuario, campo_desejado):
+    if not cliente_gemini.disponivel(): logger.warning("modelo Gemini não carregado para extração"); return texto_usuario 
+    prompt, pfd = montar_prompt_extracao(texto_usuario, campo_desejado)
     prompt += f"\nRetorne APENAS o valor para '{pfd}':"
+    conteudo = " ".join(texto_usuario.split()) # "Valorant" e "valorant " são a mesma extração; o nick mantém maiúsculas
+    if campo_desejado != 'nome_display': conteudo = conteudo.lower()
+    try: return limpar_extracao(gerar_com_cache('extracao', campo_desejado, conteudo, prompt), pfd)
+    except GeminiIndisponivel as e: logger.warning("Gemini indisponível (extração)", extra={"campo": campo_desejado, "erro": str(e)}); return texto_usuario
+
+# --- Turno Combinado (extração + próxima pergunta numa única chamada) ---
+CHATBOT_MODO_COMBINADO = os.getenv('CHATBOT_MODO_COMBINADO', '1') == '1'
+
+def extrair_e_perguntar_com_gemini(texto_usuario, campo_anterior, campo_atual, previous_user_response, collected_data):
+    """(valor extraído, próxima pergunta) numa só chamada, pedindo JSON ao modelo.
+    Devolve None se a resposta não vier num JSON válido: quem chama refaz pelo caminho de duas chamadas."""
+    prompt_extracao, pfd = montar_prompt_extracao(texto_usuario, campo_anterior)
+    # A resposta ainda não foi extraída: a ideia da pergunta usa o texto cru, e o modelo troca pelo valor extraído
+    dados_provisorios = {**collected_data, campo_anterior: texto_usuario}
+    prompt_pergunta, base_idea_for_question = montar_prompt_pergunta(campo_atual, previous_user_response, dados_provisorios, False)
+    full_prompt = "\n".join([BOT_PERSONALITY_PROMPT,
+        "Faça as DUAS tarefas abaixo e responda APENAS com um JSON no formato {\"valor_extraido\": \"...\", \"proxima_pergunta\": \"...\"}.",
+        f"Tarefa 1 (valor_extraido): {prompt_extracao}",
+        f"Tarefa 2 (proxima_pergunta): {prompt_pergunta} Se citar a resposta do usuário, use o valor extraído na Tarefa 1."])
+    conteudo = " ".join(full_prompt.split())
+    try: resposta = gerar_com_cache('turno', campo_anterior, conteudo, full_prompt)
+    except GeminiIndisponivel as e:
+        logger.warning("Gemini indisponível (turno combinado)", extra={"campo_anterior": campo_anterior, "campo": campo_atual, "erro": str(e)})
+        return texto_usuario, pergunta_base(campo_atual, dados_provisorios, False)
     try:
-        response = model_gemini.generate_content(prompt); info_extraida = response.text.strip()
-        if ":" in info_extraida and info_extraida.lower().startswith(pfd.lower().split()[0].lower()): info_extraida = info_extraida.split(":", 1)[-1].strip()
-        if not info_extraida or "não especificado" in info_extraida.lower() or "não identificar" in info_extraida.lower() or len(info_extraida) > 100: return "Não especificado"
-        return info_extraida
-    except Exception as e: print(f"Erro API Gemini ao extrair ('{campo_desejado}'): {e}"); return texto_usuario
+        dados = json.loads(resposta[resposta.index("{"):resposta.rindex("}") + 1])
+        valor, pergunta = dados["valor_extraido"], dados["proxima_pergunta"]
+        if not isinstance(valor, str) or not isinstance(pergunta, str): raise ValueError("campos do JSON não são texto")
+    except (ValueError, KeyError, TypeError) as e:
+        cache_gemini.descartar('turno', campo_anterior, conteudo)
+        logger.warning("resposta combinada inválida; usando duas chamadas", extra={"erro": str(e)}); return None
+    return limpar_extracao(valor, pfd), limpar_pergunta_gerada(pergunta, base_idea_for_question)
+
+def avancar_conversa(current_user_id, state, user_message, combinado=None, gerar_pergunta=generate_bot_question):
+    """Um turno do chatbot: guarda a resposta do campo anterior e devolve a próxima pergunta (o que
+    `gerar_pergunta` devolver), ou None quando todas as perguntas já foram respondidas (hora de salvar o perfil)."""
+    if combinado is None: combinado = CHATBOT_MODO_COMBINADO
+    question_idx = state['current_question_idx']
+    is_first_call = (question_idx == 0 and not user_message and not state['collected_data'])
+    prev_field = PROFILE_QUESTIONS_ORDER[question_idx - 1] if not is_first_call and 0 < question_idx <= len(PROFILE_QUESTIONS_ORDER) else None
+    current_field = PROFILE_QUESTIONS_ORDER[question_idx] if question_idx < len(PROFILE_QUESTIONS_ORDER) else None
+    state['last_user_response'] = user_message if user_message else state['last_user_response']
+    prev_resp_for_comment = state['last_user_response'] if question_idx > 0 else None
+    def registrar(extracted):
+        state['collected_data'][prev_field] = extracted
+        # Resposta e valor extraído são dados do perfil: no log só tamanhos, nunca o conteúdo
+        logger.debug("campo do perfil extraído", extra={"usuario_id": current_user_id, "campo": prev_field, "turno": question_idx,
+                                                        "tamanho_resposta": len(user_message or ''), "tamanho_extraido": len(str(extracted or ''))})
+    bot_q = None
+    local = classificar_localmente(user_message, prev_field) if prev_field else None
+    if local: registrar(local) # categoria resolvida sem rede: só falta gerar a próxima pergunta
+    elif prev_field and current_field and combinado and cliente_gemini.disponivel():
+        combinado = extrair_e_perguntar_com_gemini(user_message, prev_field, current_field, prev_resp_for_comment, state['collected_data'])
+        if combinado: registrar(combinado[0]); bot_q = combinado[1]
+    if bot_q is None:
+        if prev_field and not local: registrar(extrair_info_chatbot_com_gemini(user_message, prev_field))
+        if current_field: bot_q = gerar_pergunta(current_field, prev_resp_for_comment, state['collected_data'], question_idx == 0)
+    if current_field: state['current_question_idx'] += 1
+    return bot_q
+
+RESPOSTA_CONFLITO_SESSAO = {"bot_response":"Opa, recebi duas mensagens ao mesmo tempo! Manda de novo?", "profile_complete":False, "error":"conflito_sessao"}
+
+def finalizar_perfil_chatbot(current_user_id, state):
+    """Grava as respostas coletadas no UserProfile. Devolve (corpo JSON, status HTTP)."""
+    up = UserProfile.query.filter_by(user_id=current_user_id).first()
+    if not up: up=UserProfile(user_id=current_user_id);db.session.add(up)
+    jogo_anterior = up.jogo_normalizado
+    for f in PROFILE_QUESTIONS_ORDER: 
+        val = state['collected_data'].get(f)
+        if val is not None and val.strip() != "": setattr(up, f, val)
+        elif getattr(up, f, None) is None : setattr(up, f, "Não especificado")
+    up.profile_complete=True
+    try: 
+        invalidar_matches_por_perfil(current_user_id, jogo_anterior, up.jogo_normalizado) # versões das comunidades vão no mesmo commit
+        db.session.commit();nf=state['collected_data'].get('nome_display','Jogador(a)')
+        if nf == "Não especificado" or not nf: nf = User.query.get(current_user_id).username
+        fm=BASE_QUESTION_IDEAS['final'].format(nome_display=nf)
+        sessoes_chatbot.remover(current_user_id)
+        return {"bot_response":fm,"profile_complete":True,"profile_data":state['collected_data']}, 200
+    except Exception as e: 
+        db.session.rollback(); logger.exception("erro ao salvar perfil", extra={"usuario_id": current_user_id})
+        return {"bot_response":"Ops! Erro ao salvar.","profile_complete":False,"error":str(e)}, 500
 
 @app.route('/chatbot/message', methods=['POST'])
 @jwt_required()
 def chatbot_message():
     current_user_id_str = get_jwt_identity(); current_user_id = int(current_user_id_str)
     data = request.json; user_message = data.get('message', '').strip()
-    if current_user_id not in user_chatbot_state: user_chatbot_state[current_user_id] = {'current_question_idx': 0, 'collected_data': {}, 'last_user_response': None}
-    state = user_chatbot_state[current_user_id]; question_idx = state['current_question_idx']
-    is_first_call = (question_idx == 0 and not user_message and not state['collected_data'])
-    if not is_first_call and question_idx > 0 : 
-        prev_idx = question_idx -1 
-        if prev_idx < len(PROFILE_QUESTIONS_ORDER):
-            prev_field = PROFILE_QUESTIONS_ORDER[prev_idx]
-            extracted = extrair_info_chatbot_com_gemini(user_message, prev_field)
-            state['collected_data'][prev_field] = extracted
-            print(f"U{current_user_id} C'{prev_field}':R'{user_message}',E'{extracted}'")
-    state['last_user_response'] = user_message if user_message else state['last_user_response']
-    if question_idx < len(PROFILE_QUESTIONS_ORDER): 
-        current_field = PROFILE_QUESTIONS_ORDER[question_idx]
-        prev_resp_for_comment = state['last_user_response'] if question_idx > 0 else None
-        bot_q = generate_bot_question(current_field, prev_resp_for_comment, state['collected_data'], question_idx == 0)
-        state['current_question_idx'] += 1
-        return jsonify({"bot_response":bot_q, "profile_complete":False})
-    else:
-        up = UserProfile.query.filter_by(user_id=current_user_id).first()
-        if not up: up=UserProfile(user_id=current_user_id);db.session.add(up)
-        for f in PROFILE_QUESTIONS_ORDER: 
-            val = state['collected_data'].get(f)
-            if val is not None and val.strip() != "": setattr(up, f, val)
-            elif getattr(up, f, None) is None : setattr(up, f, "Não especificado")
-        up.profile_complete=True
-        try: 
-            db.session.commit();nf=state['collected_data'].get('nome_display','Jogador(a)')
-            if nf == "Não especificado" or not nf: nf = User.query.get(current_user_id).username
-            fm=BASE_QUESTION_IDEAS['final'].format(nome_display=nf)
-            if current_user_id in user_chatbot_state:del user_chatbot_state[current_user_id]
-            return jsonify({"bot_response":fm,"profile_complete":True,"profile_data":state['collected_data']})
-        except Exception as e: 
-            db.session.rollback();print(f"Erro salvar perfil U{current_user_id}:{e}")
-            return jsonify({"bot_response":"Ops! Erro ao salvar.","profile_complete":False,"error":str(e)}),500
+    state, versao = sessoes_chatbot.obter(current_user_id)
+    if state is None: state = estado_inicial()
+    bot_q = avancar_conversa(current_user_id, state, user_message)
+    if bot_q is None: corpo, status = finalizar_perfil_chatbot(current_user_id, state); return jsonify(corpo), status
+    try: sessoes_chatbot.salvar(current_user_id, state, versao)
+    except ConflitoSessao: return jsonify(RESPOSTA_CONFLITO_SESSAO),409
+    return jsonify({"bot_response":bot_q, "profile_complete":False})
+
+def evento_sse(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+@app.route('/chatbot/message/stream', methods=['POST'])
+@jwt_required()
+def chatbot_message_stream():
+    """Mesmo turno de /chatbot/message, mas a pergunta chega em eventos SSE 'token' e termina com um 'fim'
+    (o mesmo corpo da versão JSON). Sem 'Accept: text/event-stream', no fim do perfil ou em conflito, responde JSON."""
+    if 'text/event-stream' not in request.headers.get('Accept', ''): return chatbot_message()
+    current_user_id = int(get_jwt_identity())
+    data = request.json; user_message = data.get('message', '').strip()
+    state, versao = sessoes_chatbot.obter(current_user_id)
+    if state is None: state = estado_inicial()
+    # A extração ainda é uma chamada inteira (classificador local/cache cobrem a maioria); só a pergunta é transmitida
+    partes = avancar_conversa(current_user_id, state, user_message, combinado=False, gerar_pergunta=gerar_pergunta_em_partes)
+    if partes is None: corpo, status = finalizar_perfil_chatbot(current_user_id, state); return jsonify(corpo), status
+    try: sessoes_chatbot.salvar(current_user_id, state, versao)
+    except ConflitoSessao: partes.close(); return jsonify(RESPOSTA_CONFLITO_SESSAO),409
+    def eventos():
+        pergunta = ""
+        for pedaco in partes: pergunta += pedaco; yield evento_sse('token', {"t": pedaco})
+        yield evento_sse('fim', {"bot_response": pergunta, "profile_complete": False})
+    return Response(stream_with_context(eventos()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # --- Endpoints de Autenticação (Expandidos para Clareza) ---
 @app.route('/auth/register', methods=['POST'])
@@ -199,26 +574,51 @@ def register():
     data = request.json; username = data.get('username'); email = data.get('email'); password = data.get('password')
     if not username or not email or not password: return jsonify({"msg": "Faltam dados"}), 400
     if User.query.filter((User.username == username) | (User.email == email)).first(): return jsonify({"msg": "Usuário ou email já existe"}), 409
-    new_user = User(username=username, email=email); new_user.set_password(password)
+    new_user = User(username=username, email=email)
+    try: new_user.set_password(password)
+    except SenhasOcupadas: return RESPOSTA_SENHAS_OCUPADAS
     db.session.add(new_user); db.session.commit(); return jsonify({"msg": "Usuário cadastrado!"}), 201
 
+RESPOSTA_SENHAS_OCUPADAS = ({"msg": "Servidor ocupado, tente novamente em instantes."}, 503, {"Retry-After": "1"})
+# Nomes/emails que não existem (ataque de dicionário, erro de digitação repetido). O valor é o maior id de
+# usuário no momento da consulta: qualquer cadastro, em qualquer worker, muda esse carimbo e invalida o item.
+cache_login_inexistente = CacheLRU(int(os.getenv('CACHE_LOGIN_INEXISTENTE_MAX', 10000)), int(os.getenv('CACHE_LOGIN_INEXISTENTE_TTL_SEGUNDOS', 60)))
+
+def maior_id_usuario():
+    # SQL direto: é a consulta que substitui a busca num acerto do cache, então precisa custar menos que ela
+    return db.session.execute(text('SELECT max(id) FROM "user"')).scalar() or 0
+
+def buscar_usuario_login(identificador):
+    """Usuário pelo nome ou pelo email em duas consultas pontuais (um índice único cada), começando pela mais
+    provável; um OR das duas colunas não usa um índice só em todos os bancos."""
+    carimbo = cache_login_inexistente.get(identificador)
+    if carimbo is not None:
+        if carimbo == maior_id_usuario(): return None
+        cache_login_inexistente.invalidar(identificador) # alguém se cadastrou desde então: consulta de novo
+    for coluna in ((User.email, User.username) if '@' in identificador else (User.username, User.email)):
+        user = User.query.filter(coluna == identificador).first()
+        if user is not None: return user
+    cache_login_inexistente.set(identificador, maior_id_usuario()); return None
+
 @app.route('/auth/login', methods=['POST'])
 def login():
-    print("DEBUG: Rota /auth/login acessada.") 
-    data = request.json; print(f"DEBUG: Dados recebidos: {data}") 
-    if not data: print("DEBUG: Nenhum dado JSON."); return jsonify({"msg": "Corpo JSON ausente"}), 400
+    data = request.json # nunca logar o corpo (senha) nem o token
+    if not data: return jsonify({"msg": "Corpo JSON ausente"}), 400
     username = data.get('username'); password = data.get('password')
-    print(f"DEBUG: Tentando login: '{username}'") 
-    if not username or not password: print("DEBUG: Username/password ausentes."); return jsonify({"msg": "Usuário/senha obrigatórios"}), 400
-    user = User.query.filter((User.username == username) | (User.email == username)).first() 
+    if not username or not password: return jsonify({"msg": "Usuário/senha obrigatórios"}), 400
+    user = buscar_usuario_login(str(username))
     if user:
-        print(f"DEBUG: Usuário encontrado: {user.username}")
-        if user.check_password(password):
+        try: ok, novo_hash = servico_senhas.verificar(user.password_hash, password)
+        except SenhasOcupadas: logger.info("login adiado: fila de hashes cheia", extra={"usuario_id": user.id}); return RESPOSTA_SENHAS_OCUPADAS
+        if ok:
+            if novo_hash is not None: # parâmetros do hash mudaram (SENHA_HASH_METODO): grava o hash novo
+                try: user.password_hash = novo_hash; db.session.commit(); logger.info("hash de senha atualizado", extra={"usuario_id": user.id})
+                except Exception: db.session.rollback(); logger.exception("erro ao atualizar o hash da senha", extra={"usuario_id": user.id})
             access_token = create_access_token(identity=str(user.id)) 
-            print(f"DEBUG: Login OK ID:{user.id}. Token:{access_token}")
+            logger.debug("login ok", extra={"usuario_id": user.id})
             return jsonify(access_token=access_token)
-        else: print(f"DEBUG: Senha incorreta para: '{username}'")
-    else: print(f"DEBUG: Usuário não encontrado: '{username}'")
+        else: logger.info("login recusado: senha incorreta", extra={"usuario_id": user.id})
+    else: logger.info("login recusado: usuário não encontrado")
     return jsonify({"msg": "Usuário ou senha inválidos"}), 401
 
 @app.route('/auth/me', methods=['GET'])
@@ -236,39 +636,84 @@ def protected():
     return jsonify(logged_in_as=user.username,email=user.email,id=user.id,profile=profile_data),200
 
 # --- Lógica de Matchmaking ---
-PESO_JOGO_PRINCIPAL_IGUAL = 10; PESO_NIVEL_HABILIDADE_COMPATIVEL = 3; PESO_ESTILO_JOGO_IGUAL = 3
-PESO_DISPONIBILIDADE_SIMILAR = 2; PESO_GENERO_COMPATIVEL = 1; PESO_COMUNICACAO_COMPATIVEL = 2
-PESO_AVALIACAO_MEDIA = 4; MAX_RATING_BOOST = PESO_AVALIACAO_MEDIA
-MAPA_NIVEIS = { "iniciante": 1, "casual": 2, "intermediário": 3, "avançado": 4, "competitivo/pro": 5, "novo": 1, "sou novo": 1, "ainda aprendendo": 1, "jogo por diversão": 2, "mediano":3, "comecei agora":1, "explorar": 0, "focado em diversão/casual": 0, "competitivo/subir de ranking": 0, "completar missões/história": 0, "socializar": 0, "não especificado": 0, "n/a": 0 }
-MAPA_COMUNICACAO = { 'no silêncio (foco total)': 1, 'só o necessário (calls estratégicas)': 2, 'conversa casual e social': 3, 'vale tudo (cantar, zoar, resenha!)': 4, 'depende do momento/jogo': 3, 'com música e zoeira':4, 'não especificado': 0, "n/a": 0 }
-def calcular_score_nivel(n1,n2):n1n=str(n1).lower().strip();n2n=str(n2).lower().strip();v1=MAPA_NIVEIS.get(n1n,0);v2=MAPA_NIVEIS.get(n2n,0);d=abs(v1-v2);return PESO_NIVEL_HABILIDADE_COMPATIVEL if d==0 else(PESO_NIVEL_HABILIDADE_COMPATIVEL*0.6 if d==1 else 0)if v1!=0 and v2!=0 else 0
-def calcular_score_disponibilidade(d1,d2):d1l=str(d1).lower().strip();d2l=str(d2).lower().strip();ign={'de','a','o','e','para','com','em','no','na','durante','só','bem','as','os','todas','todos'};k1={w[:-1]if w.endswith('s')and len(w)>1 else w for w in set(d1l.replace(","," ").replace("/"," ").split())-ign};k2={w[:-1]if w.endswith('s')and len(w)>1 else w for w in set(d2l.replace(","," ").replace("/"," ").split())-ign};return PESO_DISPONIBILIDADE_SIMILAR if k1.intersection(k2)or d1l==d2l else 0 if d1l and d2l and d1l not in["n/e","n/a","não especificado"]and d2l not in["n/e","n/a","não especificado"]else 0
-def calcular_score_genero(g1_s,g2_s):g1=str(g1_s).lower().strip();g2=str(g2_s).lower().strip();return PESO_GENERO_COMPATIVEL*0.2 if g1 in["n/e","prefiro não dizer","n/a","não especificado"]or g2 in["n/e","prefiro não dizer","n/a","não especificado"]else(PESO_GENERO_COMPATIVEL if g1==g2 else 0)
-def calcular_score_estilo_comunicacao(c1_s,c2_s):c1n=str(c1_s).lower().strip();c2n=str(c2_s).lower().strip();v1=MAPA_COMUNICACAO.get(c1n,0);v2=MAPA_COMUNICACAO.get(c2n,0);d=abs(v1-v2);return PESO_COMUNICACAO_COMPATIVEL if d==0 else(PESO_COMUNICACAO_COMPATIVEL*0.5 if(v1>=3 and v2>=3)or(v1<=2 and v2<=2)else 0)if v1!=0 and v2!=0 else 0
-def encontrar_matches_para_um_viewer(vp_dict, outros_list):
+# Pesos, mapas e o motor de score ficam em matchmaking.py; aqui só o acesso ao banco.
+def encontrar_matches_para_um_viewer(vp_dict, outros_list, medias_avaliacao=None, top_k=None):
     if not vp_dict or not outros_list: return []
-    kn,kg,kl,ke,kd,ki,kgen,kcom = 'nome_display','jogo_principal','nivel_de_habilidade','estilo_jogo','disponibilidade','user_id','gender','communication_style'
-    matches = []; nv = vp_dict.get(kn, "Viewer"); v_jg = str(vp_dict.get(kg, '')).lower().strip()
-    for pmp in outros_list:
-        if vp_dict.get(ki) == pmp.get(ki): continue
-        npm = pmp.get(kn, "Match"); p_uid = pmp.get(ki); st = 0.0; dr = [] # Score como float
-        p_jg = str(pmp.get(kg, '')).lower().strip()
-        if v_jg and p_jg and v_jg == p_jg: st += PESO_JOGO_PRINCIPAL_IGUAL; dr.append(f"Mesmo jogo ({p_jg})")
-        else: continue
-        sn=calcular_score_nivel(vp_dict.get(kl),pmp.get(kl));_=(st:=st+sn,dr.append("Nível compatível"))if sn>0 else 0
-        ev=str(vp_dict.get(ke,'')).lower().strip();ep=str(pmp.get(ke,'')).lower().strip();_=(st:=st+PESO_ESTILO_JOGO_IGUAL,dr.append("Mesmo estilo"))if ev and ep and ev==ep else 0
-        sd=calcular_score_disponibilidade(vp_dict.get(kd),pmp.get(kd));_=(st:=st+sd,dr.append("Disponibilidade similar"))if sd>0 else 0
-        sgen=calcular_score_genero(vp_dict.get(kgen,""),pmp.get(kgen,""));_=(st:=st+sgen,dr.append("Gênero"))if sgen>0 else 0 # Adicionado "" como default
-        scom=calcular_score_estilo_comunicacao(vp_dict.get(kcom,""),pmp.get(kcom,""));_=(st:=st+scom,dr.append("Comunicação compatível"))if scom>0 else 0
-        if p_uid:
-            avg_r_q = db.session.query(func.avg(MatchRating.rating)).filter_by(rated_user_id=p_uid)
-            if v_jg: avg_r_q = avg_r_q.filter(func.lower(MatchRating.game_played) == v_jg)
-            avg_r = avg_r_q.scalar()
-            if avg_r is not None and avg_r > 0: r_b = (float(avg_r)/5.0)*MAX_RATING_BOOST; st+=r_b; dr.append(f"Bem avaliado(⭐{avg_r:.1f},+{r_b:.1f})")
-        if st>0: matches.append({"user_id":p_uid,"nome":npm,"jogo":p_jg,"score":round(st,1),"razoes":", ".join(dr)if dr else "Compatibilidade!","initial":npm[0].upper()if npm and len(npm)>0 else "?"})
-    matches.sort(key=lambda x:x["score"],reverse=True); return matches
+    if medias_avaliacao is None:
+        with metricas.cronometrar('gg_matcher_fase_segundos', fase='medias_avaliacao'):
+            medias_avaliacao = carregar_medias_avaliacao(str(vp_dict.get('jogo_principal', '')).lower().strip()) # uma consulta para todos os candidatos
+    # Instância de uso único: montar os baldes da poda custaria mais que pontuar todos os candidatos
+    with metricas.cronometrar('gg_matcher_fase_segundos', fase='vetorizar'): colunas = ColunasPerfis(outros_list, poda_minimo=None)
+    with metricas.cronometrar('gg_matcher_fase_segundos', fase='pontuar'): return colunas.pontuar(vp_dict, medias_avaliacao, top_k=top_k)
 
 # --- Endpoints de Ação de Match, Matches Mútuos, Rate Player, Send Message ---
+# --- Tempo Real: eventos por usuário (pub/sub) ---
+# Sem PUBSUB_BROKER, os eventos ficam no próprio processo (um worker só). Com vários workers, todos apontam
+# para o mesmo broker (flask --app app broker-pubsub) e a mesma PUBSUB_AUTHKEY. A authkey é obrigatória e só
+# dela: o broker desserializa (pickle) o que os clientes autenticados mandam, então quem a tiver executa código ali.
+PUBSUB_BROKER = os.getenv('PUBSUB_BROKER') or None
+PUBSUB_AUTHKEY = (os.getenv('PUBSUB_AUTHKEY') or '').encode()
+if PUBSUB_BROKER and not PUBSUB_AUTHKEY: raise RuntimeError("PUBSUB_BROKER exige PUBSUB_AUTHKEY (segredo próprio, compartilhado só pelos workers e o broker).")
+WS_ESPERA_SEGUNDOS = 1.0; WS_TIMEOUT_AUTENTICACAO = 10
+metricas.contador('gg_pubsub_falhas_total', "Eventos que não chegaram ao pub/sub (broker fora do ar etc.), por tipo")
+_pubsub_eventos = None; _pubsub_lock = threading.Lock()
+
+def obter_pubsub():
+    # Criado no primeiro uso: importar o app (ex.: para rodar o próprio broker) não tenta conectar ao broker
+    global _pubsub_eventos
+    with _pubsub_lock:
+        if _pubsub_eventos is None: _pubsub_eventos = criar_pubsub(PUBSUB_BROKER, PUBSUB_AUTHKEY)
+        return _pubsub_eventos
+
+def canal_usuario(uid):
+    return f"usuario:{uid}"
+
+def publicar_para_usuarios(evento, *uids):
+    """Melhor esforço: se o broker cair, o cliente ainda vê tudo no próximo GET."""
+    try:
+        pubsub_eventos = obter_pubsub()
+        for uid in uids: pubsub_eventos.publicar(canal_usuario(uid), evento)
+    except Exception as e: # o que disparou o evento já foi gravado: a requisição não pode falhar por causa dele
+        metricas.incrementar('gg_pubsub_falhas_total', evento=evento.get('tipo'))
+        logger.warning("falha ao publicar evento", extra={"evento": evento.get('tipo'), "erro": f"{type(e).__name__}: {e}"})
+
+def notificar_match(match):
+    """Chamado depois do commit do match; erros aqui são só registrados."""
+    try: perfis = {p.user_id: p.nome_display for p in UserProfile.query.filter(UserProfile.user_id.in_((match.user_min_id, match.user_max_id)))}
+    except Exception: logger.warning("falha ao buscar perfis do match para notificar", exc_info=True); perfis = {}
+    for uid, outro in ((match.user_min_id, match.user_max_id), (match.user_max_id, match.user_min_id)):
+        publicar_para_usuarios({"tipo":"match","matched_at":match.matched_at.isoformat(),
+                                "com":{"user_id":outro,"nome_display":perfis.get(outro) or "Jogador"}}, uid)
+
+# --- Likes e Matches Mútuos ---
+def par_canonico(user_a, user_b):
+    return (user_a, user_b) if user_a < user_b else (user_b, user_a)
+
+def travar_pares(user_id, outros_ids):
+    """Serializa, até o fim da transação, os likes entre `user_id` e cada um de `outros_ids`. No SQLite as escritas já
+    são serializadas; no Postgres (READ COMMITTED) dois likes recíprocos simultâneos não veriam o like um do outro, e
+    o MutualMatch não seria criado. Com o lock do par, o segundo espera o commit do primeiro e então o enxerga.
+    Os pares são travados em ordem, para dois lotes com pares em comum não se bloquearem mutuamente."""
+    if db.engine.dialect.name != 'postgresql': return
+    for user_min_id, user_max_id in sorted({par_canonico(user_id, outro) for outro in outros_ids}):
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:a, :b)"), {"a": user_min_id, "b": user_max_id})
+
+def registrar_like(liker_user_id, liked_user_id):
+    """Adiciona o Like e, se o recíproco já existe, o MutualMatch do par, na mesma transação (quem chama faz o commit).
+    Os dois INSERTs ignoram duplicados: o mesmo like repetido (duplo clique, retry do cliente) ou os dois lados do par
+    ao mesmo tempo não esbarram na unicidade, e só um deles cria o match. Devolve (curtiu agora?, MutualMatch criado ou None)."""
+    agora = datetime.utcnow(); travar_pares(liker_user_id, (liked_user_id,))
+    curtiu = db.session.execute(insert_ignorando_duplicados(Like).values(liker_user_id=liker_user_id, liked_user_id=liked_user_id, timestamp=agora)
+                                .returning(Like.id)).first() is not None
+    if not curtiu or Like.query.filter_by(liker_user_id=liked_user_id, liked_user_id=liker_user_id).first() is None: return curtiu, None
+    user_min_id, user_max_id = par_canonico(liker_user_id, liked_user_id)
+    criado = db.session.execute(insert_ignorando_duplicados(MutualMatch).values(user_min_id=user_min_id, user_max_id=user_max_id, matched_at=agora)
+                                .returning(MutualMatch.user_min_id)).first() is not None
+    return curtiu, MutualMatch(user_min_id=user_min_id, user_max_id=user_max_id, matched_at=agora) if criado else None
+
+def eh_match_mutuo(user_a, user_b):
+    return db.session.get(MutualMatch, par_canonico(user_a, user_b)) is not None
+
 @app.route('/api/action/match', methods=['POST'])
 @jwt_required()
 def action_match(): # ... (Expandido para clareza) ...
@@ -277,25 +722,85 @@ def action_match(): # ... (Expandido para clareza) ...
     try: liked_user_id = int(liked_user_id_from_req)
     except ValueError: return jsonify({"msg": "ID do usuário curtido inválido."}), 400
     if current_user_id == liked_user_id: return jsonify({"msg": "Não pode dar match consigo mesmo."}), 400
-    existing_like = Like.query.filter_by(liker_user_id=current_user_id, liked_user_id=liked_user_id).first()
-    if not existing_like: new_like = Like(liker_user_id=current_user_id, liked_user_id=liked_user_id); db.session.add(new_like); db.session.commit(); print(f"DEBUG: User {current_user_id} curtiu user {liked_user_id}")
-    else: print(f"DEBUG: User {current_user_id} já curtiu user {liked_user_id}")
-    mutual_match = Like.query.filter_by(liker_user_id=liked_user_id, liked_user_id=current_user_id).first()
-    if mutual_match: print(f"DEBUG: MATCH MÚTUO! {current_user_id} e {liked_user_id}!"); lup = UserProfile.query.filter_by(user_id=liked_user_id).first(); return jsonify({"msg": "É um Match Mútuo!", "mutual_match": True, "matched_with": {"user_id": liked_user_id, "nome_display": lup.nome_display if lup else "Jogador"}}), 200
+    try: curtiu, novo_match = registrar_like(current_user_id, liked_user_id); db.session.commit()
+    except IntegrityError: # ex.: usuário curtido removido no meio do caminho (FK no Postgres)
+        db.session.rollback(); logger.info("like em conflito", extra={"usuario_id": current_user_id, "curtido_id": liked_user_id}); return jsonify({"msg": "Não foi possível registrar o like; tente de novo."}), 409
+    except Exception: db.session.rollback(); logger.exception("erro ao registrar like", extra={"usuario_id": current_user_id}); return jsonify({"msg": "Erro ao registrar o like."}), 500
+    logger.debug("like", extra={"usuario_id": current_user_id, "curtido_id": liked_user_id, "repetido": not curtiu})
+    registrar_like_no_deck(current_user_id, liked_user_id)
+    if novo_match is not None: notificar_match(novo_match)
+    if novo_match is not None or eh_match_mutuo(current_user_id, liked_user_id): lup = UserProfile.query.filter_by(user_id=liked_user_id).first(); return jsonify({"msg": "É um Match Mútuo!", "mutual_match": True, "matched_with": {"user_id": liked_user_id, "nome_display": lup.nome_display if lup else "Jogador"}}), 200
     return jsonify({"msg": "Like registrado!", "mutual_match": False}), 200
 
+LIKES_LOTE_MAX = int(os.getenv('LIKES_LOTE_MAX', 100))
+
+def insert_ignorando_duplicados(modelo):
+    """INSERT ... ON CONFLICT DO NOTHING no dialeto do banco (SQLite ou Postgres)."""
+    return (sqlite if db.engine.dialect.name == 'sqlite' else postgresql).insert(modelo).on_conflict_do_nothing()
+
+def registrar_likes_em_lote(liker_user_id, liked_user_ids):
+    """Versão em lote de registrar_like: um INSERT para os likes e um INSERT ... SELECT para os matches que eles
+    completam, na mesma transação (quem chama faz o commit). Devolve ({ids curtidos agora}, [MutualMatch novos])."""
+    agora = datetime.utcnow(); travar_pares(liker_user_id, liked_user_ids)
+    novos = {linha[0] for linha in db.session.execute(insert_ignorando_duplicados(Like).returning(Like.liked_user_id),
+                                                       [{"liker_user_id": liker_user_id, "liked_user_id": uid, "timestamp": agora} for uid in liked_user_ids])}
+    if not novos: return novos, []
+    outro = Like.liker_user_id # quem já tinha curtido o liker: o par vira match agora
+    reciprocos = select(case((outro < liker_user_id, outro), else_=liker_user_id), case((outro > liker_user_id, outro), else_=liker_user_id), literal(agora, MutualMatch.matched_at.type))\
+        .where(Like.liked_user_id == liker_user_id, outro.in_(novos))
+    criados = db.session.execute(insert_ignorando_duplicados(MutualMatch).from_select(['user_min_id', 'user_max_id', 'matched_at'], reciprocos)
+                                 .returning(MutualMatch.user_min_id, MutualMatch.user_max_id)).all()
+    return novos, [MutualMatch(user_min_id=a, user_max_id=b, matched_at=agora) for a, b in criados]
+
+@app.route('/api/action/match/batch', methods=['POST'])
+@jwt_required()
+def action_match_batch():
+    """Vários likes numa transação só: {"liked_user_ids": [...]} -> resultado por id, na ordem recebida."""
+    current_user_id = int(get_jwt_identity()); ids_recebidos = (request.json or {}).get('liked_user_ids')
+    if not isinstance(ids_recebidos, list) or not ids_recebidos: return jsonify({"msg": "liked_user_ids deve ser uma lista não vazia."}), 400
+    if len(ids_recebidos) > LIKES_LOTE_MAX: return jsonify({"msg": f"No máximo {LIKES_LOTE_MAX} likes por lote."}), 400
+    try: ids = list(dict.fromkeys(int(uid) for uid in ids_recebidos)) # sem repetidos, na ordem recebida
+    except (TypeError, ValueError): return jsonify({"msg": "IDs de usuário inválidos."}), 400
+    existentes = {uid for (uid,) in db.session.query(User.id).filter(User.id.in_(ids))}
+    validos = [uid for uid in ids if uid in existentes and uid != current_user_id]
+    try:
+        novos, matches_novos = registrar_likes_em_lote(current_user_id, validos) if validos else (set(), [])
+        db.session.commit()
+    except Exception: db.session.rollback(); logger.exception("erro ao registrar likes em lote", extra={"usuario_id": current_user_id}); return jsonify({"msg": "Erro ao registrar os likes."}), 500
+    outro = case((MutualMatch.user_min_id == current_user_id, MutualMatch.user_max_id), else_=MutualMatch.user_min_id)
+    mutuos = {uid for (uid,) in db.session.query(outro).filter(((MutualMatch.user_min_id == current_user_id) & MutualMatch.user_max_id.in_(validos)) |
+                                                                ((MutualMatch.user_max_id == current_user_id) & MutualMatch.user_min_id.in_(validos)))} if validos else set()
+    for uid in validos: registrar_like_no_deck(current_user_id, uid)
+    for match in matches_novos: notificar_match(match)
+    com_match_novo = {m.user_min_id if m.user_max_id == current_user_id else m.user_max_id for m in matches_novos}
+    resultados = [{"liked_user_id": uid, "status": "invalido" if uid == current_user_id else "nao_encontrado" if uid not in existentes else "curtido" if uid in novos else "ja_curtido",
+                   "mutual_match": uid in mutuos, "new_match": uid in com_match_novo} for uid in ids]
+    return jsonify({"results": resultados, "liked": len(novos), "new_matches": len(matches_novos)}), 200
+
+MUTUOS_LIMITE_PADRAO = 100; MUTUOS_LIMITE_MAX = 500
+
+def consultar_matches_mutuos(uid, limite, offset=0, desde=None):
+    """Matches mútuos de `uid` (com perfil), do mais recente para o mais antigo, direto de MutualMatch."""
+    outro = case((MutualMatch.user_min_id == uid, MutualMatch.user_max_id), else_=MutualMatch.user_min_id)
+    q = (db.session.query(UserProfile.user_id, UserProfile.nome_display, UserProfile.jogo_principal, MutualMatch.matched_at.label('momento'))
+         .select_from(MutualMatch).join(UserProfile, UserProfile.user_id == outro)
+         .filter((MutualMatch.user_min_id == uid) | (MutualMatch.user_max_id == uid)))
+    if desde is not None: q = q.filter(MutualMatch.matched_at > desde)
+    return q.order_by(MutualMatch.matched_at.desc(), UserProfile.user_id.desc()).limit(limite).offset(offset).all()
+
 @app.route('/api/get_mutual_matches', methods=['GET'])
 @jwt_required()
-def get_mutual_matches(): # ... (Expandido para clareza) ...
+def get_mutual_matches(): # ?limit=&offset= para paginar, ?since=<ISO> para buscar só os novos
     current_user_id_str = get_jwt_identity(); current_user_id = int(current_user_id_str)
-    likes_given = Like.query.filter_by(liker_user_id=current_user_id).all(); liked_ids = {like.liked_user_id for like in likes_given}
-    mutual_matches_profiles = []
-    if liked_ids:
-        likes_received = Like.query.filter(Like.liked_user_id == current_user_id, Like.liker_user_id.in_(liked_ids)).all()
-        for like_obj in likes_received: 
-            mup = UserProfile.query.filter_by(user_id=like_obj.liker_user_id).first()
-            if mup: mutual_matches_profiles.append({"user_id":mup.user_id,"nome_display":mup.nome_display,"jogo_principal":mup.jogo_principal})
-    return jsonify({"mutual_matches":mutual_matches_profiles}),200
+    try:
+        limite = min(max(int(request.args.get('limit', MUTUOS_LIMITE_PADRAO)), 1), MUTUOS_LIMITE_MAX)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        desde = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+    except ValueError: return jsonify({"msg":"Parâmetros de paginação inválidos."}),400
+    linhas = consultar_matches_mutuos(current_user_id, limite + 1, offset, desde) # 1 a mais para saber se há próxima página
+    mutual_matches_profiles = [{"user_id":l.user_id,"nome_display":l.nome_display,"jogo_principal":l.jogo_principal,
+                                "matched_at":l.momento.isoformat() if l.momento else None} for l in linhas[:limite]]
+    return jsonify({"mutual_matches":mutual_matches_profiles,"next_offset":offset + limite if len(linhas) > limite else None}),200
 
 @app.route('/api/rate_player', methods=['POST'])
 @jwt_required()
@@ -308,10 +813,33 @@ def rate_player_endpoint(): # ... (Expandido para clareza) ...
     if rater_id == rated_user_id: return jsonify({"msg": "Não pode se auto-avaliar."}), 400
     if not User.query.get(rated_user_id): return jsonify({"msg": "Usuário avaliado não encontrado."}), 404
     existing_rating = MatchRating.query.filter_by(rater_user_id=rater_id, rated_user_id=rated_user_id, game_played=game_played).first()
-    if existing_rating: existing_rating.rating = rating_value; existing_rating.timestamp = datetime.utcnow(); msg = "Avaliação atualizada!"
-    else: new_rating = MatchRating(rater_user_id=rater_id,rated_user_id=rated_user_id,rating=rating_value,game_played=game_played); db.session.add(new_rating); msg = "Avaliação registrada!"
-    try: db.session.commit(); return jsonify({"msg": msg}), 200
-    except Exception as e: db.session.rollback(); print(f"Erro salvar avaliação: {e}"); return jsonify({"msg": "Erro ao salvar avaliação."}), 500
+    if existing_rating: registrar_avaliacao_no_agregado(rated_user_id, game_played, rating_value - existing_rating.rating, 0); existing_rating.rating = rating_value; existing_rating.timestamp = datetime.utcnow(); msg = "Avaliação atualizada!"
+    else: new_rating = MatchRating(rater_user_id=rater_id,rated_user_id=rated_user_id,rating=rating_value,game_played=game_played); db.session.add(new_rating); registrar_avaliacao_no_agregado(rated_user_id, game_played, rating_value, 1); msg = "Avaliação registrada!"
+    try: sinalizar_mudanca_comunidade(normalizar_jogo(game_played)); db.session.commit(); return jsonify({"msg": msg}), 200
+    except Exception: db.session.rollback(); logger.exception("erro ao salvar avaliação", extra={"usuario_id": rater_id}); return jsonify({"msg": "Erro ao salvar avaliação."}), 500
+
+# --- Mensagens ---
+MENSAGENS_LIMITE_PADRAO = 50; MENSAGENS_LIMITE_MAX = 200; MENSAGEM_TAMANHO_MAX = 2000
+# Pares já confirmados como match mútuo. Só entram positivos: um match não é desfeito, e um "ainda não"
+# pode virar match a qualquer like.
+cache_pares_autorizados = CacheLRU(int(os.getenv('CACHE_PARES_MAX', 50000)), int(os.getenv('CACHE_PARES_TTL_SEGUNDOS', 3600)))
+
+def pode_conversar(user_a, user_b):
+    par = par_canonico(user_a, user_b)
+    if cache_pares_autorizados.get(par): return True
+    if not eh_match_mutuo(user_a, user_b): return False
+    cache_pares_autorizados.set(par, True); return True
+
+def mensagem_para_dict(m):
+    return {"id":m.id,"sender_user_id":m.sender_user_id,"receiver_user_id":m.receiver_user_id,"content":m.content,
+            "created_at":m.created_at.isoformat(),"read_at":m.read_at.isoformat() if m.read_at else None}
+
+def codificar_cursor_mensagens(mensagem):
+    return _json_para_cursor({"t": mensagem.created_at.isoformat(), "i": mensagem.id})
+
+def decodificar_cursor_mensagens(cursor):
+    dados = _cursor_para_json(cursor)
+    return datetime.fromisoformat(dados["t"]), int(dados["i"])
 
 @app.route('/api/send_message', methods=['POST'])
 @jwt_required()
@@ -322,11 +850,227 @@ def send_message_endpoint(): # ... (Expandido para clareza) ...
     try: receiver_id = int(receiver_id_req)
     except ValueError: return jsonify({"msg":"ID do destinatário inválido."}), 400
     if sender_id==receiver_id: return jsonify({"msg":"Não pode enviar msg para si"}),400
-    l1=Like.query.filter_by(liker_user_id=sender_id,liked_user_id=receiver_id).first()
-    l2=Like.query.filter_by(liker_user_id=receiver_id,liked_user_id=sender_id).first()
-    if not(l1 and l2): return jsonify({"msg":"Apenas matches mútuos podem trocar msgs."}),403
-    print(f"DEBUG: Msg de {sender_id} para {receiver_id}: '{content}'")
-    return jsonify({"msg":"Msg enviada (simulado)!","sent_message":content}),200
+    content = str(content).strip()
+    if not content or len(content) > MENSAGEM_TAMANHO_MAX: return jsonify({"msg":f"Mensagem vazia ou com mais de {MENSAGEM_TAMANHO_MAX} caracteres."}),400
+    if not pode_conversar(sender_id, receiver_id): return jsonify({"msg":"Apenas matches mútuos podem trocar msgs."}),403
+    user_min_id, user_max_id = par_canonico(sender_id, receiver_id)
+    mensagem = Message(user_min_id=user_min_id, user_max_id=user_max_id, sender_user_id=sender_id, receiver_user_id=receiver_id, content=content)
+    db.session.add(mensagem); db.session.commit()
+    publicar_para_usuarios({"tipo":"mensagem","mensagem":mensagem_para_dict(mensagem)}, receiver_id, sender_id) # sender: outras abas abertas
+    return jsonify({"msg":"Msg enviada!","sent_message":content,"message":mensagem_para_dict(mensagem)}),201
+
+@app.route('/api/messages/<int:other_user_id>', methods=['GET'])
+@jwt_required()
+def historico_mensagens(other_user_id): # ?limit= (padrão 50) e ?cursor= para páginas mais antigas
+    uid = int(get_jwt_identity())
+    if uid == other_user_id or not pode_conversar(uid, other_user_id): return jsonify({"msg":"Apenas matches mútuos podem trocar msgs."}),403
+    try:
+        limite = min(max(int(request.args.get('limit', MENSAGENS_LIMITE_PADRAO)), 1), MENSAGENS_LIMITE_MAX)
+        cursor = request.args.get('cursor'); antes_de = decodificar_cursor_mensagens(cursor) if cursor else None
+    except (ValueError, KeyError, TypeError): return jsonify({"msg":"Parâmetros de paginação inválidos."}),400
+    user_min_id, user_max_id = par_canonico(uid, other_user_id)
+    q = Message.query.filter(Message.user_min_id == user_min_id, Message.user_max_id == user_max_id)
+    if antes_de: # keyset: (created_at, id) estritamente anterior ao último item da página anterior
+        q = q.filter(tuple_(Message.created_at, Message.id) < tuple_(*antes_de))
+    mensagens = q.order_by(Message.created_at.desc(), Message.id.desc()).limit(limite + 1).all()
+    tem_mais = len(mensagens) > limite; mensagens = mensagens[:limite]
+    if not cursor: # abriu a conversa: o que chegou para mim conta como lido
+        agora = datetime.utcnow()
+        Message.query.filter(Message.receiver_user_id == uid, Message.read_at.is_(None), Message.user_min_id == user_min_id,
+                             Message.user_max_id == user_max_id).update({Message.read_at: agora}, synchronize_session=False)
+        db.session.commit()
+    return jsonify({"messages":[mensagem_para_dict(m) for m in mensagens],
+                    "next_cursor":codificar_cursor_mensagens(mensagens[-1]) if tem_mais else None}),200
+
+@app.route('/api/messages/unread_counts', methods=['GET'])
+@jwt_required()
+def contagem_nao_lidas():
+    """Não lidas por conversa, numa só consulta agrupada (índice receiver_user_id, read_at)."""
+    uid = int(get_jwt_identity())
+    linhas = (db.session.query(Message.sender_user_id, func.count(Message.id))
+              .filter(Message.receiver_user_id == uid, Message.read_at.is_(None)).group_by(Message.sender_user_id).all())
+    return jsonify({"unread":{str(sender_id): total for sender_id, total in linhas},"total":sum(total for _, total in linhas)}),200
+
+@sock.route('/ws')
+def tempo_real(ws):
+    """Canal de eventos do usuário (match novo, mensagem nova). Autentica com o mesmo JWT da API, enviado
+    na primeira mensagem ({"token": "..."}) para não aparecer em logs de URL; ?token= também é aceito."""
+    token = request.args.get('token')
+    try:
+        if not token: token = json.loads(ws.receive(timeout=WS_TIMEOUT_AUTENTICACAO) or '{}').get('token')
+        uid = int(decode_token(token)['sub'])
+    except ConnectionClosed: return
+    except Exception: ws.close(reason=1008, message='token inválido'); return
+    assinatura = obter_pubsub().assinar(canal_usuario(uid))
+    try:
+        ws.send(json.dumps({"tipo":"conectado","user_id":uid}))
+        while ws.connected:
+            evento = assinatura.obter(timeout=WS_ESPERA_SEGUNDOS)
+            if evento is not None: ws.send(json.dumps(evento, ensure_ascii=False))
+            else: ws.receive(timeout=0) # ocioso: descarta o que o cliente mandou e percebe se ele fechou
+    except ConnectionClosed: pass
+    finally: assinatura.cancelar()
+
+# --- Recuperação de Candidatos ---
+CAMPOS_PERFIL_MATCH = ('user_id', 'nome_display', 'jogo_principal', 'nivel_de_habilidade', 'estilo_jogo', 'disponibilidade', 'gender', 'communication_style', 'disponibilidade_tokens')
+
+def perfil_para_dict_match(perfil):
+    return {campo: getattr(perfil, campo) for campo in CAMPOS_PERFIL_MATCH}
+
+def consulta_candidatos_mesmo_jogo(jogo_normalizado, excluir_user_id):
+    colunas = [getattr(UserProfile, campo) for campo in CAMPOS_PERFIL_MATCH]
+    return db.session.query(*colunas).filter(UserProfile.jogo_normalizado == jogo_normalizado, UserProfile.profile_complete == True, UserProfile.user_id != excluir_user_id)
+
+def buscar_candidatos_mesmo_jogo(jogo_normalizado, excluir_user_id):
+    """Perfis completos do mesmo jogo, via ix_user_profile_jogo_completo.
+    Seleciona só as colunas usadas no score (sem hidratar objetos ORM), então o custo
+    acompanha o tamanho da comunidade do jogo e não o da tabela inteira."""
+    if not jogo_normalizado: return []
+    return [dict(zip(CAMPOS_PERFIL_MATCH, linha)) for linha in consulta_candidatos_mesmo_jogo(jogo_normalizado, excluir_user_id)]
+
+# --- Deck de Matches (paginação por cursor) ---
+# Cada viewer tem um deck ranqueado (top DECK_TAMANHO) calculado uma vez; as próximas páginas
+# saem dele via cursor, sem repontuar a comunidade a cada swipe.
+DECK_TAMANHO = int(os.getenv('DECK_TAMANHO', 200)); DECK_TTL_SEGUNDOS = int(os.getenv('DECK_TTL_SEGUNDOS', 600))
+DECK_MAX_VIEWERS = int(os.getenv('DECK_MAX_VIEWERS', 10000)); DECK_LIMITE_PADRAO = 3; DECK_LIMITE_MAX = 50
+cache_matches = CacheLRU(DECK_MAX_VIEWERS, DECK_TTL_SEGUNDOS)
+# Quem já apareceu ou foi curtido na sessão de cada viewer (só ids), guardado à parte e por mais tempo que o deck:
+# se o deck do cursor expirar ou sair do LRU, o deck remontado continua a sessão sem repetir cartas.
+DECK_SESSAO_TTL_SEGUNDOS = int(os.getenv('DECK_SESSAO_TTL_SEGUNDOS', 3600))
+sessoes_deck = CacheLRU(DECK_MAX_VIEWERS, DECK_SESSAO_TTL_SEGUNDOS)
+
+# Versão de cada comunidade (jogo normalizado), incrementada pelos eventos que mudam o ranking
+# de quem joga aquele jogo: perfil salvo no jogo ou nova avaliação recebida nele. Fica no banco
+# (VersaoComunidade), então a mudança feita num worker invalida os decks em cache de todos.
+# É uma invalidação grossa de propósito: qualquer perfil salvo ou avaliação recebida derruba os decks de
+# todos os viewers do jogo, mesmo os que não teriam o candidato no top. Saber quais decks seriam afetados
+# custaria repontuar o candidato contra cada viewer em cada escrita; numa comunidade muito ativa, o deck
+# volta a ser montado a cada mudança (e o pré-cálculo, quando existe, continua servindo a primeira página).
+def versao_comunidade(jogo):
+    if not jogo: return 0
+    return db.session.query(VersaoComunidade.versao).filter(VersaoComunidade.jogo_normalizado == jogo).scalar() or 0
+
+def sinalizar_mudanca_comunidade(jogo):
+    """Incrementa a versão na transação de quem chama (que faz o commit): some junto com um rollback."""
+    if not jogo: return
+    tabela = VersaoComunidade.__table__
+    upsert = (sqlite if db.engine.dialect.name == 'sqlite' else postgresql).insert(tabela).values(jogo_normalizado=jogo, versao=1)
+    db.session.execute(upsert.on_conflict_do_update(index_elements=[tabela.c.jogo_normalizado], set_={"versao": tabela.c.versao + 1}))
+
+def invalidar_matches_por_perfil(uid, *jogos):
+    cache_matches.invalidar(uid)
+    for jogo in set(jogos): sinalizar_mudanca_comunidade(jogo)
+
+def carimbo_deck(vp_db):
+    jogo = vp_db.jogo_normalizado or normalizar_jogo(vp_db.jogo_principal)
+    return (vp_db.atualizado_em, jogo, versao_comunidade(jogo))
+
+def _json_para_cursor(dados):
+    return base64.urlsafe_b64encode(json.dumps(dados, separators=(',', ':')).encode()).decode().rstrip("=")
+
+def _cursor_para_json(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+def codificar_cursor(deck_id, offset):
+    return _json_para_cursor({"d": deck_id, "o": offset})
+
+def decodificar_cursor(cursor):
+    dados = _cursor_para_json(cursor)
+    return str(dados["d"]), int(dados["o"])
+
+def construir_deck(uid, vp_db, ja_vistos=()):
+    vpd = perfil_para_dict_match(vp_db)
+    with metricas.cronometrar('gg_matcher_fase_segundos', fase='curtidos'):
+        curtidos = {liked for (liked,) in db.session.query(Like.liked_user_id).filter_by(liker_user_id=uid)}
+    pre_calculado = None if ja_vistos else carregar_recomendacoes(uid, vp_db) # continuação de deck esgotado: ranqueia ao vivo
+    if pre_calculado is not None:
+        ranqueados, truncado = pre_calculado; metricas.incrementar('gg_deck_origem_total', origem='pre_calculado')
+        deck = {"id": uuid.uuid4().hex[:12], "matches": [m for m in ranqueados if m["user_id"] not in curtidos], "truncado": truncado,
+                "curtidos": set(), "vistos": set(), "parcial": False}
+        cache_matches.set(uid, deck, carimbo=carimbo_deck(vp_db)); guardar_sessao_deck(uid, deck)
+        return deck
+    metricas.incrementar('gg_deck_origem_total', origem='ao_vivo')
+    excluidos = curtidos | set(ja_vistos)
+    with metricas.cronometrar('gg_matcher_fase_segundos', fase='candidatos'):
+        candidatos = [c for c in buscar_candidatos_mesmo_jogo(vp_db.jogo_normalizado or normalizar_jogo(vp_db.jogo_principal), uid) if c['user_id'] not in excluidos]
+    ranqueados = encontrar_matches_para_um_viewer(vpd, candidatos, top_k=DECK_TAMANHO) # seleção parcial, não ordena a comunidade toda
+    deck = {"id": uuid.uuid4().hex[:12], "matches": ranqueados, "truncado": len(candidatos) > len(ranqueados),
+            "curtidos": set(), "vistos": set(ja_vistos), "parcial": bool(ja_vistos)}
+    cache_matches.set(uid, deck, carimbo=carimbo_deck(vp_db)); guardar_sessao_deck(uid, deck)
+    return deck
+
+def guardar_sessao_deck(uid, deck):
+    # Os mesmos sets do deck: o que a paginação e os likes marcam no deck vale para a sessão
+    sessoes_deck.set(uid, {"deck": deck["id"], "vistos": deck["vistos"], "curtidos": deck["curtidos"]})
+
+def registrar_like_no_deck(uid, liked_user_id):
+    # Like do próprio viewer: o deck continua válido, só deixa de mostrar quem foi curtido. peek: não é uma
+    # consulta ao cache de decks, não entra nos hits/misses do /api/stats/caches
+    deck = cache_matches.peek(uid)
+    if deck is not None: deck["curtidos"].add(liked_user_id)
+    sessao = sessoes_deck.peek(uid)
+    if sessao is not None: sessao["curtidos"].add(liked_user_id)
+
+# --- Recomendações Pré-calculadas ---
+# flask --app app recomendar ranqueia cada comunidade num pool de processos e grava o top-K de cada viewer.
+# O /api/get_match usa esse deck enquanto o perfil do viewer não mudar depois do cálculo; mudanças na
+# comunidade entram na próxima rodada (incremental: só comunidades com assinatura diferente).
+RECOMENDACOES_TOP_K = int(os.getenv('RECOMENDACOES_TOP_K', DECK_TAMANHO))
+RECOMENDACOES_VIEWERS_POR_TAREFA = int(os.getenv('RECOMENDACOES_VIEWERS_POR_TAREFA', 2000))
+metricas.contador('gg_deck_origem_total', "Decks montados a partir do pré-cálculo ou ranqueados na requisição")
+
+def carregar_recomendacoes(uid, vp_db):
+    """(matches, truncado) do pré-cálculo, ou None se não há ou se o perfil do viewer mudou depois dele."""
+    with metricas.cronometrar('gg_matcher_fase_segundos', fase='recomendacoes'):
+        linhas = Recommendation.query.filter_by(viewer_user_id=uid).order_by(Recommendation.posicao).all()
+    if not linhas: return None
+    jogo = vp_db.jogo_normalizado or normalizar_jogo(vp_db.jogo_principal)
+    if linhas[0].jogo_normalizado != jogo or (vp_db.atualizado_em and vp_db.atualizado_em > linhas[0].calculado_em): return None
+    matches = [{"user_id": l.candidate_user_id, "nome": l.nome, "jogo": l.jogo_normalizado, "score": l.score, "razoes": l.razoes,
+                "initial": l.nome[0].upper() if l.nome else "?"} for l in linhas if l.candidate_user_id is not None]
+    return matches, len(linhas) >= RECOMENDACOES_TOP_K # top-K cheio: pode haver mais candidatos além dele
+
+def assinaturas_comunidades():
+    """{jogo: assinatura} de todas as comunidades com perfis completos, em duas consultas agregadas."""
+    perfis = {jogo: (n, soma_ids, ultima) for jogo, n, soma_ids, ultima in db.session.query(
+        UserProfile.jogo_normalizado, func.count(UserProfile.id), func.sum(UserProfile.user_id), func.max(UserProfile.atualizado_em))
+        .filter(UserProfile.profile_complete == True, UserProfile.jogo_normalizado.isnot(None), UserProfile.jogo_normalizado != '').group_by(UserProfile.jogo_normalizado)}
+    avaliacoes = {jogo: (n, soma, ultima) for jogo, n, soma, ultima in db.session.query(
+        RatingAgregado.jogo_chave, func.sum(RatingAgregado.contagem), func.sum(RatingAgregado.soma), func.max(RatingAgregado.atualizado_em))
+        .filter(RatingAgregado.jogo_chave.in_(list(perfis))).group_by(RatingAgregado.jogo_chave)}
+    return {jogo: assinatura_comunidade(perfis[jogo], avaliacoes.get(jogo)) for jogo in perfis}
+
+def atualizar_recomendacoes(completo=False, processos=1, top_k=None):
+    """Recalcula as comunidades que mudaram (todas, com completo=True) e apaga as que deixaram de existir."""
+    inicio = time.perf_counter(); top_k = top_k or RECOMENDACOES_TOP_K
+    atuais = assinaturas_comunidades(); anteriores = {c.jogo_normalizado: c.assinatura for c in RecomendacaoComunidade.query}
+    mudaram = [jogo for jogo, assinatura in atuais.items() if completo or anteriores.get(jogo) != assinatura]
+    sumiram = [jogo for jogo in anteriores if jogo not in atuais]
+    if sumiram:
+        Recommendation.query.filter(Recommendation.jogo_normalizado.in_(sumiram)).delete(synchronize_session=False)
+        RecomendacaoComunidade.query.filter(RecomendacaoComunidade.jogo_normalizado.in_(sumiram)).delete(synchronize_session=False)
+        db.session.commit()
+    comunidades = [(jogo, [dict(zip(CAMPOS_PERFIL_MATCH, linha)) for linha in consulta_candidatos_mesmo_jogo(jogo, None)], carregar_medias_avaliacao(jogo)) for jogo in mudaram]
+    tarefas, tarefas_por_jogo = dividir_em_tarefas(comunidades, top_k, RECOMENDACOES_VIEWERS_POR_TAREFA)
+    ids_por_jogo = {jogo: [p['user_id'] for p in perfis] for jogo, perfis, _ in comunidades}
+    viewers = linhas_gravadas = 0; pendentes = {}
+    for jogo, rankings in ranquear_em_pool(tarefas, processos):
+        agora = datetime.utcnow()
+        if jogo not in pendentes: # primeira fatia do jogo: tira as linhas antigas da comunidade e as de quem entrou nela vindo de outro jogo
+            ids_comunidade = ids_por_jogo[jogo]
+            Recommendation.query.filter(Recommendation.jogo_normalizado == jogo).delete(synchronize_session=False)
+            for i in range(0, len(ids_comunidade), 500):
+                Recommendation.query.filter(Recommendation.viewer_user_id.in_(ids_comunidade[i:i + 500])).delete(synchronize_session=False)
+            pendentes[jogo] = tarefas_por_jogo[jogo]
+        linhas = [{"viewer_user_id": viewer_id, "posicao": posicao, "candidate_user_id": m["user_id"], "jogo_normalizado": jogo, "score": m["score"],
+                   "nome": m["nome"], "razoes": m["razoes"], "calculado_em": agora} for viewer_id, matches in rankings for posicao, m in enumerate(matches)]
+        if linhas: db.session.execute(Recommendation.__table__.insert(), linhas)
+        viewers += len(rankings); linhas_gravadas += len(linhas); pendentes[jogo] -= 1
+        if pendentes[jogo] == 0: # comunidade completa numa transação só: o get_match nunca vê metade dela
+            db.session.merge(RecomendacaoComunidade(jogo_normalizado=jogo, assinatura=atuais[jogo], viewers=len(ids_por_jogo[jogo]), calculado_em=agora))
+            db.session.commit()
+    return {"comunidades": len(atuais), "recalculadas": len(mudaram), "removidas": len(sumiram), "viewers": viewers,
+            "linhas": linhas_gravadas, "segundos": round(time.perf_counter() - inicio, 3)}
 
 # --- Endpoint da API de Matchmaking ---
 @app.route('/api/get_match', methods=['GET'])
@@ -335,19 +1079,151 @@ def get_match_endpoint_authenticated():
     current_user_id_str = get_jwt_identity(); uid=int(current_user_id_str)
     vp_db=UserProfile.query.filter_by(user_id=uid).first()
     if not vp_db or not vp_db.profile_complete:return jsonify({"mensagem":"Complete seu perfil gamer no chatbot!"}),403
-    vpd={"user_id":vp_db.user_id,"nome_display":vp_db.nome_display,"jogo_principal":vp_db.jogo_principal, "nivel_de_habilidade":vp_db.nivel_de_habilidade,"estilo_jogo":vp_db.estilo_jogo, "disponibilidade":vp_db.disponibilidade, "gender": vp_db.gender, "communication_style": vp_db.communication_style}
-    op_db=UserProfile.query.filter(UserProfile.user_id!=uid,UserProfile.profile_complete==True).all()
-    ojl=[{"user_id":p.user_id,"nome_display":p.nome_display,"jogo_principal":p.jogo_principal, "nivel_de_habilidade":p.nivel_de_habilidade,"estilo_jogo":p.estilo_jogo, "disponibilidade":p.disponibilidade, "gender": p.gender, "communication_style": p.communication_style} for p in op_db]
-    if not ojl:return jsonify({"matches":[],"mensagem":"END_OF_MATCHES: Não há outros jogadores."}),200
-    mpv=encontrar_matches_para_um_viewer(vpd,ojl)
-    if not mpv:return jsonify({"matches":[],"mensagem":f"END_OF_MATCHES: Nenhum match para {vpd.get('nome_display')}."}),200
-    return jsonify({"matches":mpv[:3],"mensagem":"Matches encontrados!"})
+    try:
+        limite = min(max(int(request.args.get('limit', DECK_LIMITE_PADRAO)), 1), DECK_LIMITE_MAX)
+        cursor = request.args.get('cursor'); deck_id, offset = decodificar_cursor(cursor) if cursor else (None, 0)
+    except (ValueError, KeyError, TypeError): return jsonify({"mensagem":"Parâmetros de paginação inválidos."}),400
+    if cursor:
+        # Continuação da sessão: vale o deck do cursor enquanto não expirar (TTL). peek: a página seguinte do
+        # mesmo deck não é um acerto do cache (o get da primeira página já contou)
+        deck = cache_matches.peek(uid)
+        if deck is None or deck["id"] != deck_id:
+            # Deck do cursor expirou ou saiu do LRU: remonta sem quem já apareceu ou foi curtido nesta sessão
+            sessao = sessoes_deck.peek(uid)
+            vistos = sessao["vistos"] | sessao["curtidos"] if sessao is not None and sessao["deck"] == deck_id else ()
+            deck = construir_deck(uid, vp_db, vistos); offset = 0
+    else:
+        # Primeira página: o deck em cache só serve se nada relevante mudou desde que foi ranqueado
+        deck = cache_matches.get(uid, carimbo=carimbo_deck(vp_db))
+        if deck is None or deck["parcial"]: deck = construir_deck(uid, vp_db)
+        else: deck["vistos"].clear(); guardar_sessao_deck(uid, deck) # sessão nova sobre o mesmo deck
+    pagina = []
+    while True:
+        matches = deck["matches"]
+        while offset < len(matches) and len(pagina) < limite:
+            m = matches[offset]; offset += 1
+            if m["user_id"] in deck["curtidos"]: continue
+            pagina.append(m); deck["vistos"].add(m["user_id"])
+        if len(pagina) >= limite or not deck["truncado"] or offset < len(matches): break
+        deck = construir_deck(uid, vp_db, deck["vistos"] | deck["curtidos"]); offset = 0 # deck esgotado, mas há mais candidatos
+        if not deck["matches"]: break
+    tem_mais = offset < len(deck["matches"]) or deck["truncado"]
+    if not pagina:return jsonify({"matches":[],"next_cursor":None,"mensagem":f"END_OF_MATCHES: Nenhum match para {vp_db.nome_display}."}),200
+    return jsonify({"matches":pagina,"next_cursor":codificar_cursor(deck["id"], offset) if tem_mais else None,"mensagem":"Matches encontrados!"})
+
+@app.route('/api/stats/caches', methods=['GET'])
+@jwt_required()
+def estatisticas_caches():
+    return jsonify({"matches": cache_matches.estatisticas()}), 200
+
+@app.route('/api/stats/chatbot', methods=['GET'])
+@jwt_required()
+def estatisticas_chatbot():
+    return jsonify({"classificador_local": classificador_local.estatisticas(), "gemini": cliente_gemini.estatisticas(), "cache_gemini": cache_gemini.estatisticas(),
+                    "sessoes": sessoes_chatbot.estatisticas()}), 200
+
+@app.route('/api/stats/tempo_real', methods=['GET'])
+@jwt_required()
+def estatisticas_tempo_real():
+    return jsonify({"pubsub": obter_pubsub().estatisticas()}), 200
+
+def _coletar_contadores_gemini():
+    return [('gg_gemini_eventos_total', 'counter', "Chamadas, timeouts, rejeições e erros do cliente Gemini",
+             [({"evento": evento}, valor) for evento, valor in cliente_gemini.estatisticas().items()]),
+            ('gg_cache_gemini_erros_disco_total', 'counter', "Erros do SQLite do cache do Gemini (a operação seguiu só com a memória)",
+             [({}, cache_gemini.erros_disco)])]
+metricas.registrar_coletor(_coletar_contadores_gemini)
+
+def _coletar_contadores_senhas():
+    return [('gg_senhas_eventos_total', 'counter', "Hashes, verificações, rehashes, rejeições (fila cheia) e timeouts do pool de senhas",
+             [({"evento": evento}, valor) for evento, valor in servico_senhas.estatisticas().items()])]
+metricas.registrar_coletor(_coletar_contadores_senhas)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métricas deste processo no formato texto do Prometheus. Com METRICAS_TOKEN, exige 'Authorization: Bearer <token>'."""
+    if METRICAS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICAS_TOKEN}"): return jsonify({"msg": "Não autorizado."}), 401
+    return Response(metricas.texto_prometheus(), mimetype='text/plain; version=0.0.4')
+
+# --- Comandos de Manutenção (flask --app app <comando>) ---
+@app.cli.command('verificar-agregados')
+def verificar_agregados_command():
+    """Compara o boost vindo de RatingAgregado com a média direto de MatchRating, par a par."""
+    pares = {(uid, chave_jogo_avaliacao(jogo)) for uid, jogo in db.session.query(MatchRating.rated_user_id, MatchRating.game_played).distinct()}
+    pares |= {(uid, '') for uid, _ in pares} # média geral (viewer sem jogo)
+    medias_por_jogo = {}; divergencias = 0
+    for uid, jogo in sorted(pares):
+        if jogo not in medias_por_jogo: medias_por_jogo[jogo] = carregar_medias_avaliacao(jogo)
+        antigo = media_avaliacao_por_consulta(uid, jogo); novo = medias_por_jogo[jogo].get(uid)
+        boost_antigo = (float(antigo)/5.0)*MAX_RATING_BOOST if antigo else None; boost_novo = (float(novo)/5.0)*MAX_RATING_BOOST if novo else None
+        if boost_antigo != boost_novo: divergencias += 1; print(f"DIVERGÊNCIA U{uid} jogo '{jogo}': consulta={boost_antigo} agregado={boost_novo}")
+    print(f"{len(pares)} pares verificados, {divergencias} divergências.")
+    if divergencias: raise SystemExit(1)
+
+# Consultas dos caminhos quentes e o índice que cada uma precisa usar (SQLite: nome no EXPLAIN QUERY PLAN)
+def consultas_quentes():
+    return [
+        ("candidatos do mesmo jogo", consulta_candidatos_mesmo_jogo('valorant', 1), 'ix_user_profile_jogo_completo'),
+        ("login por nome de usuário", User.query.filter(User.username == 'gamer'), 'sqlite_autoindex_user_1'),
+        ("login por email", User.query.filter(User.email == 'gamer@gg.com'), 'sqlite_autoindex_user_2'),
+        ("like recíproco", Like.query.filter_by(liker_user_id=2, liked_user_id=1), 'sqlite_autoindex_like_1'),
+        ("likes recebidos", db.session.query(Like.liker_user_id).filter(Like.liked_user_id == 1), 'ix_like_liked_liker'),
+        ("avaliações recebidas", consulta_avaliacoes_recebidas(1), 'ix_match_rating_avaliado_jogo'),
+        ("avaliação existente", MatchRating.query.filter_by(rater_user_id=1, rated_user_id=2, game_played='Valorant'), 'sqlite_autoindex_match_rating_1'),
+        ("agregado do jogo", db.session.query(RatingAgregado.rated_user_id).filter(RatingAgregado.jogo_chave == 'valorant'), 'ix_rating_agregado_jogo'),
+        ("perfis completos", db.session.query(func.count(UserProfile.id)).filter(UserProfile.profile_complete == True), 'ix_user_profile_completo'),
+        ("recomendações do viewer", Recommendation.query.filter_by(viewer_user_id=1).order_by(Recommendation.posicao), 'sqlite_autoindex_recommendation_1'),
+        ("mensagens não lidas", db.session.query(Message.id).filter(Message.receiver_user_id == 1, Message.read_at.is_(None)), 'ix_message_nao_lidas'),
+    ]
+
+def plano_da_consulta(consulta):
+    sql = str(consulta.statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    return [linha[-1] for linha in db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+@app.cli.command('verificar-planos')
+def verificar_planos_command():
+    """Confere no EXPLAIN QUERY PLAN (SQLite) que cada consulta quente usa o índice esperado."""
+    if db.engine.dialect.name != 'sqlite': print("verificar-planos só se aplica ao SQLite."); return
+    consultas = consultas_quentes(); falhas = 0
+    for nome, consulta, indice in consultas:
+        plano = plano_da_consulta(consulta); ok = any(indice in passo for passo in plano)
+        if not ok: falhas += 1
+        print(f"{'OK   ' if ok else 'FALHA'} {nome}: {' | '.join(plano)}")
+    print(f"{len(consultas)} consultas verificadas, {falhas} sem o índice esperado.")
+    if falhas: raise SystemExit(1)
+
+@app.cli.command('recomendar')
+@click.option('--completo', is_flag=True, help="Recalcula todas as comunidades, não só as que mudaram.")
+@click.option('--processos', type=int, default=os.cpu_count() or 1, show_default=True, help="Processos no pool de ranqueamento.")
+def recomendar_command(completo, processos):
+    """Pré-calcula o deck (top-K) de cada perfil completo para o /api/get_match."""
+    r = atualizar_recomendacoes(completo=completo, processos=processos)
+    print(f"{r['recalculadas']}/{r['comunidades']} comunidades recalculadas ({r['removidas']} removidas): "
+          f"{r['viewers']} viewers, {r['linhas']} recomendações em {r['segundos']}s.")
+
+@app.cli.command('limpar-sessoes-chatbot')
+def limpar_sessoes_chatbot_command():
+    """Apaga sessões do chatbot abandonadas (TTL vencido)."""
+    print(f"{sessoes_chatbot.limpar_expiradas()} sessões expiradas removidas.")
+
+@app.cli.command('backfill-matches-mutuos')
+def backfill_matches_mutuos_command():
+    """Cria os MutualMatch que faltam para pares de Like recíprocos (ex.: likes inseridos por fora do app)."""
+    with db.engine.begin() as conn: print(f"{preencher_matches_mutuos(conn)} matches mútuos criados.")
+
+@app.cli.command('broker-pubsub')
+def broker_pubsub_command():
+    """Broker local que repassa eventos entre workers (usa PUBSUB_BROKER=host:porta e PUBSUB_AUTHKEY)."""
+    if not PUBSUB_AUTHKEY: raise click.ClickException("defina PUBSUB_AUTHKEY: o broker não sobe sem authkey.")
+    endereco = endereco_broker(PUBSUB_BROKER or '127.0.0.1:6390')
+    print(f"Broker pub/sub escutando em {endereco[0]}:{endereco[1]}")
+    servir_broker(endereco, PUBSUB_AUTHKEY)
 
 # --- Inicialização ---
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all() 
+        aplicar_migracoes()
     inicializar_servicos_google()
-    if model_gemini is None: print("*"*50 + "\nAVISO: Modelo Gemini não carregado.\n" + "*"*50)
-    print("Servidor Flask iniciado. Acesse o front-end (index.html) no seu navegador.")
+    if model_gemini is None: logger.warning("modelo Gemini não carregado")
+    logger.info("servidor Flask iniciado; acesse o front-end (index.html) no navegador")
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,66 @@
+# backend/banco.py
+# Configuração do banco sobre o Flask-SQLAlchemy: URI vinda do ambiente (DATABASE_URL; SQLite por padrão,
+# Postgres também serve), opções de pool e PRAGMAs aplicados a cada conexão SQLite nova.
+# Com WAL, leitores não esperam escritores e escritas concorrentes esperam a vez (busy_timeout)
+# em vez de falhar na hora com "database is locked".
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PRAGMAS_SQLITE_PADRAO = {
+    'journal_mode': 'WAL',       # leitores e um escritor ao mesmo tempo
+    'synchronous': 'NORMAL',     # seguro com WAL; fsync só no checkpoint
+    'busy_timeout': 5000,        # ms esperando o lock de escrita antes de desistir
+    'cache_size': -65536,        # negativo = KiB (64 MiB por conexão)
+    'mmap_size': 268435456,      # 256 MiB lidos via mmap
+    'temp_store': 'MEMORY',
+}
+
+
+def uri_do_banco(caminho_sqlite_padrao):
+    """DATABASE_URL do ambiente, ou o arquivo SQLite padrão. Aceita o 'postgres://' antigo do Heroku."""
+    uri = os.getenv('DATABASE_URL') or f'sqlite:///{caminho_sqlite_padrao}'
+    if uri.startswith('postgres://'): uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def pragmas_sqlite_do_ambiente():
+    """PRAGMAs a aplicar; SQLITE_PRAGMAS=0 desliga todos (comportamento antigo, usado no benchmark)."""
+    if os.getenv('SQLITE_PRAGMAS', '1') == '0': return {}
+    pragmas = dict(PRAGMAS_SQLITE_PADRAO)
+    for nome in pragmas: # SQLITE_JOURNAL_MODE, SQLITE_BUSY_TIMEOUT, SQLITE_CACHE_SIZE...
+        valor = os.getenv(f'SQLITE_{nome.upper()}')
+        if valor: pragmas[nome] = valor
+    return pragmas
+
+def opcoes_engine(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS para a URI. SQLite em memória fica no pool padrão (uma conexão por thread)."""
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'): return {}
+        # O timeout do driver cobre o tempo até o busy_timeout ser aplicado na conexão
+        return {'pool_size': int(os.getenv('DB_POOL_SIZE', 10)), 'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+                'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)), 'connect_args': {'timeout': 30}}
+    return {'pool_size': int(os.getenv('DB_POOL_SIZE', 10)), 'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)), 'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+            'pool_pre_ping': True}
+
+def registrar_pragmas_sqlite(engine, pragmas):
+    """Executa os PRAGMAs em toda conexão nova do engine (evento 'connect'). Ignora engines que não são SQLite."""
+    if engine.dialect.name != 'sqlite' or not pragmas: return
+    @event.listens_for(engine, 'connect')
+    def _aplicar(dbapi_connection, _registro):
+        cursor = dbapi_connection.cursor()
+        try:
+            for nome, valor in pragmas.items(): cursor.execute(f"PRAGMA {nome}={valor}")
+        finally: cursor.close()
+
+def configurar_banco(app, caminho_sqlite_padrao):
+    """Preenche SQLALCHEMY_DATABASE_URI e SQLALCHEMY_ENGINE_OPTIONS; chamar antes de SQLAlchemy(app)."""
+    uri = uri_do_banco(caminho_sqlite_padrao)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(uri)
+
+def instalar_pragmas(app, db):
+    with app.app_context(): registrar_pragmas_sqlite(db.engine, pragmas_sqlite_do_ambiente())
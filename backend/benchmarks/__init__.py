@@ -0,0 +1,2 @@
+# backend/benchmarks/
+# Scripts de medição. Rode a partir da pasta backend, ex.: python -m benchmarks.bench_score_vetorizado
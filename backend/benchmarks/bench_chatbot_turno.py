@@ -0,0 +1,44 @@
+# backend/benchmarks/bench_chatbot_turno.py
+# Tempo por turno do chatbot com um modelo falso de latência fixa: duas chamadas
+# (extração + pergunta) vs. o turno combinado numa única chamada com resposta em JSON.
+# Cada modo roda com um cache de respostas do Gemini vazio e só dele (senão o segundo modo aproveitaria as
+# perguntas guardadas pelo primeiro) e, por padrão, sem o classificador local, para comparar só as chamadas.
+#   python -m benchmarks.bench_chatbot_turno [--latencia 0.3] [--com-classificador]
+
+import argparse
+import time
+
+import app as gg
+from cache_gemini import CacheRespostasGemini
+from gemini_cliente import ModeloGeminiFalso
+
+RESPOSTAS = ['me chama de Zé', 'Valorant', 'sou iniciante', 'competitivo/subir de ranking', 'à noite', 'homem', 'conversa casual e social']
+
+def conversar(combinado, latencia, com_classificador=False):
+    originais = (gg.CHATBOT_MODO_COMBINADO, gg.cliente_gemini.modelo, gg.cache_gemini, gg.classificar_localmente)
+    modelo = ModeloGeminiFalso(latencia)
+    gg.CHATBOT_MODO_COMBINADO = combinado; gg.cliente_gemini.modelo = modelo; gg.cache_gemini = CacheRespostasGemini()
+    if not com_classificador: gg.classificar_localmente = lambda texto, campo: None
+    try:
+        state = {'current_question_idx': 0, 'collected_data': {}, 'last_user_response': None}
+        gg.avancar_conversa(0, state, "")
+        tempos = []
+        for resposta in RESPOSTAS[:-1]: # turnos com extração + próxima pergunta
+            inicio = time.perf_counter(); gg.avancar_conversa(0, state, resposta); tempos.append(time.perf_counter() - inicio)
+        return sum(tempos) / len(tempos), modelo.chamadas, state['collected_data']
+    finally: gg.CHATBOT_MODO_COMBINADO, gg.cliente_gemini.modelo, gg.cache_gemini, gg.classificar_localmente = originais
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latencia', type=float, default=0.3, help="latência fixa do modelo falso, em segundos")
+    parser.add_argument('--com-classificador', action='store_true', help="respostas com categoria clara resolvidas localmente, sem o Gemini")
+    args = parser.parse_args()
+    t_duas, chamadas_duas, dados_duas = conversar(False, args.latencia, args.com_classificador)
+    t_uma, chamadas_uma, dados_uma = conversar(True, args.latencia, args.com_classificador)
+    assert dados_uma == dados_duas, "o turno combinado extraiu valores diferentes"
+    print(f"Modelo falso com {args.latencia*1000:.0f}ms por chamada, {len(RESPOSTAS) - 1} turnos:")
+    print(f"  duas chamadas: {t_duas*1000:7.1f}ms/turno ({chamadas_duas} chamadas na conversa)")
+    print(f"  combinado:     {t_uma*1000:7.1f}ms/turno ({chamadas_uma} chamadas na conversa)")
+
+if __name__ == '__main__':
+    main()
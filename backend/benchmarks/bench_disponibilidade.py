@@ -0,0 +1,45 @@
+# backend/benchmarks/bench_disponibilidade.py
+# CPU gasta por requisição de /api/get_match só com a disponibilidade, antes e depois
+# dos tokens pré-calculados (coluna disponibilidade_tokens + cache do tokenizador).
+#   python -m benchmarks.bench_disponibilidade [--candidatos 10000] [--requisicoes 20]
+
+import argparse
+import random
+import time
+
+from benchmarks.paridade_matchmaking import gerar_perfis
+from matchmaking import (PESO_DISPONIBILIDADE_SIMILAR, calcular_score_disponibilidade, tokenizar_disponibilidade,
+                         tokens_disponibilidade_do_perfil, tokens_disponibilidade_para_coluna)
+
+def calcular_score_disponibilidade_sem_cache(d1,d2):d1l=str(d1).lower().strip();d2l=str(d2).lower().strip();ign={'de','a','o','e','para','com','em','no','na','durante','só','bem','as','os','todas','todos'};k1={w[:-1]if w.endswith('s')and len(w)>1 else w for w in set(d1l.replace(","," ").replace("/"," ").split())-ign};k2={w[:-1]if w.endswith('s')and len(w)>1 else w for w in set(d2l.replace(","," ").replace("/"," ").split())-ign};return PESO_DISPONIBILIDADE_SIMILAR if k1.intersection(k2)or d1l==d2l else 0 if d1l and d2l and d1l not in["n/e","n/a","não especificado"]and d2l not in["n/e","n/a","não especificado"]else 0
+
+def cpu_por_requisicao(funcao, requisicoes):
+    inicio = time.process_time()
+    for _ in range(requisicoes): funcao()
+    return (time.process_time() - inicio) / requisicoes
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--candidatos', type=int, default=10_000)
+    parser.add_argument('--requisicoes', type=int, default=20)
+    args = parser.parse_args()
+    perfis = gerar_perfis(args.candidatos, random.Random(1)); viewer = perfis[0]
+    salvos = [dict(p, disponibilidade_tokens=tokens_disponibilidade_para_coluna(p['disponibilidade'])) for p in perfis]
+    for p in perfis: # o caminho com cache não pode mudar o resultado
+        assert calcular_score_disponibilidade(viewer['disponibilidade'], p['disponibilidade']) == calcular_score_disponibilidade_sem_cache(viewer['disponibilidade'], p['disponibilidade'])
+
+    antes = cpu_por_requisicao(lambda: [calcular_score_disponibilidade_sem_cache(viewer['disponibilidade'], p['disponibilidade']) for p in perfis], args.requisicoes)
+    depois = cpu_por_requisicao(lambda: [calcular_score_disponibilidade(viewer['disponibilidade'], p['disponibilidade']) for p in perfis], args.requisicoes)
+    nunca_vistos = [dict(p, disponibilidade=f"{p['disponibilidade']} {i}") for i, p in enumerate(perfis)]
+    tokenizar_disponibilidade.cache_clear()
+    texto = cpu_por_requisicao(lambda: [tokens_disponibilidade_do_perfil(p) for p in nunca_vistos], 1)
+    coluna = cpu_por_requisicao(lambda: [tokens_disponibilidade_do_perfil(p) for p in salvos], args.requisicoes)
+
+    print(f"{args.candidatos} candidatos, CPU por requisição:")
+    print(f"  score escalar, re-tokenizando os dois lados: {antes*1000:8.2f}ms")
+    print(f"  score escalar, tokens em cache:             {depois*1000:8.2f}ms  (economia {(antes - depois)*1000:.2f}ms, {antes/depois:.1f}x)")
+    print(f"  tokens p/ o motor, textos nunca vistos:     {texto*1000:8.2f}ms")
+    print(f"  tokens p/ o motor, lidos da coluna:         {coluna*1000:8.2f}ms  (economia {(texto - coluna)*1000:.2f}ms)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# backend/benchmarks/bench_escrita_concorrente.py
+# Escritas concorrentes (likes e avaliações) de vários processos no mesmo arquivo SQLite,
+# sem os PRAGMAs (SQLITE_PRAGMAS=0, journal em modo rollback) e com eles (WAL + busy_timeout).
+#   python -m benchmarks.bench_escrita_concorrente [--processos 8] [--requisicoes 200] [--usuarios 500]
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+def _carregar_app(caminho_banco, pragmas):
+    os.environ['DATABASE_URL'] = f'sqlite:///{caminho_banco}'; os.environ['SQLITE_PRAGMAS'] = pragmas
+    os.environ.pop('GEMINI_API_KEY', None)
+    import app as gg
+    return gg
+
+def preparar_banco(caminho_banco, pragmas, usuarios):
+    gg = _carregar_app(caminho_banco, pragmas)
+    with gg.app.app_context():
+        gg.aplicar_migracoes()
+        for i in range(usuarios): gg.db.session.add(gg.User(username=f'bench{i}', email=f'bench{i}@x.com', password_hash='x'))
+        gg.db.session.commit()
+        modo = gg.db.session.execute(gg.text("PRAGMA journal_mode")).scalar()
+    return modo
+
+def trabalhador(caminho_banco, pragmas, usuarios, requisicoes, semente, largada):
+    gg = _carregar_app(caminho_banco, pragmas)
+    from flask_jwt_extended import create_access_token
+    rnd = random.Random(semente); cliente = gg.app.test_client()
+    with gg.app.app_context(): tokens = {uid: create_access_token(identity=str(uid)) for uid in range(1, usuarios + 1)}
+    largada.wait() # todos os processos começam juntos
+    latencias = []; erros = 0
+    for _ in range(requisicoes):
+        autor, alvo = rnd.sample(range(1, usuarios + 1), 2); cabecalho = {'Authorization': 'Bearer ' + tokens[autor]}
+        inicio = time.perf_counter()
+        if rnd.random() < 0.5: r = cliente.post('/api/action/match', json={'liked_user_id': alvo}, headers=cabecalho)
+        else: r = cliente.post('/api/rate_player', json={'rated_user_id': alvo, 'rating': rnd.randint(1, 5), 'game_played': rnd.choice(['Valorant', 'LoL'])}, headers=cabecalho)
+        latencias.append(time.perf_counter() - inicio)
+        if r.status_code >= 500: erros += 1
+    return latencias, erros
+
+def rodar(pragmas, processos, requisicoes, usuarios):
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'bench.db')
+        ctx = multiprocessing.get_context('spawn') # cada processo importa o app do zero, com o próprio ambiente
+        with ctx.Pool(1) as pool: modo = pool.apply(preparar_banco, (caminho, pragmas, usuarios))
+        with ctx.Manager() as gerente, ctx.Pool(processos) as pool:
+            largada = gerente.Event()
+            tarefas = [pool.apply_async(trabalhador, (caminho, pragmas, usuarios, requisicoes, semente, largada)) for semente in range(processos)]
+            time.sleep(1.0 + 0.2 * processos) # deixa os processos importarem o app antes da largada
+            inicio = time.perf_counter(); largada.set()
+            resultados = [t.get() for t in tarefas]; total = time.perf_counter() - inicio
+    latencias = sorted(l for lat, _ in resultados for l in lat); erros = sum(e for _, e in resultados)
+    return {"journal_mode": modo, "req_s": len(latencias) / total, "p50": statistics.median(latencias),
+            "p95": latencias[int(len(latencias) * 0.95) - 1], "erros": erros, "total": len(latencias)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processos', type=int, default=8)
+    parser.add_argument('--requisicoes', type=int, default=200, help="requisições de escrita por processo")
+    parser.add_argument('--usuarios', type=int, default=500)
+    args = parser.parse_args()
+    print(f"{args.processos} processos x {args.requisicoes} escritas (like ou avaliação), {args.usuarios} usuários:")
+    for rotulo, pragmas in (("sem PRAGMAs", '0'), ("WAL + PRAGMAs", '1')):
+        r = rodar(pragmas, args.processos, args.requisicoes, args.usuarios)
+        print(f"  {rotulo:14s} journal={r['journal_mode']:8s} {r['req_s']:8.1f} req/s  p50 {r['p50']*1000:7.2f}ms  "
+              f"p95 {r['p95']*1000:7.2f}ms  erros 5xx {r['erros']}/{r['total']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# backend/benchmarks/bench_likes_lote.py
+# Os mesmos likes enviados um a um (/api/action/match) e em lotes (/api/action/match/batch):
+# transações de escrita, comandos SQL e tempo total.
+#   python -m benchmarks.bench_likes_lote [--usuarios 300] [--likes 40] [--lote 10]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--usuarios', type=int, default=300)
+    parser.add_argument('--likes', type=int, default=40, help="likes por usuário")
+    parser.add_argument('--lote', type=int, default=10, help="likes por requisição no modo em lote")
+    args = parser.parse_args()
+    pasta = tempfile.mkdtemp(); os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+    os.environ.pop('GEMINI_API_KEY', None)
+    import app as gg
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event
+
+    contagem = {"commits": 0, "sql": 0}
+    with gg.app.app_context():
+        gg.aplicar_migracoes()
+        for i in range(args.usuarios): gg.db.session.add(gg.User(username=f'bench{i}', email=f'bench{i}@x.com', password_hash='x'))
+        gg.db.session.commit()
+        tokens = {uid: {'Authorization': 'Bearer ' + create_access_token(identity=str(uid))} for uid in range(1, args.usuarios + 1)}
+        event.listen(gg.db.engine, 'commit', lambda _conn: contagem.__setitem__("commits", contagem["commits"] + 1))
+        event.listen(gg.db.engine, 'before_cursor_execute', lambda *_: contagem.__setitem__("sql", contagem["sql"] + 1))
+    cliente = gg.app.test_client(); rnd = random.Random(1)
+    # Metade dos usuários curte no modo antigo, a outra metade em lote: mesma quantidade de likes
+    usuarios = list(range(1, args.usuarios + 1)); metade = len(usuarios) // 2
+    curtidas = {uid: rnd.sample([u for u in usuarios if u != uid], args.likes) for uid in usuarios}
+
+    def medir(uids, enviar):
+        contagem.update(commits=0, sql=0); inicio = time.perf_counter()
+        for uid in uids: enviar(uid)
+        return time.perf_counter() - inicio, dict(contagem)
+
+    def um_a_um(uid):
+        for liked in curtidas[uid]: assert cliente.post('/api/action/match', json={'liked_user_id': liked}, headers=tokens[uid]).status_code == 200
+    def em_lote(uid):
+        for i in range(0, args.likes, args.lote):
+            assert cliente.post('/api/action/match/batch', json={'liked_user_ids': curtidas[uid][i:i + args.lote]}, headers=tokens[uid]).status_code == 200
+
+    t_um, c_um = medir(usuarios[:metade], um_a_um)
+    t_lote, c_lote = medir(usuarios[metade:], em_lote)
+    with gg.app.app_context(): matches = gg.MutualMatch.query.count(); reciprocos = gg.db.session.execute(gg.text(
+        'SELECT COUNT(*) FROM "like" a JOIN "like" b ON b.liker_user_id = a.liked_user_id AND b.liked_user_id = a.liker_user_id WHERE a.liker_user_id < a.liked_user_id')).scalar()
+    assert matches == reciprocos, "matches mútuos divergem dos likes recíprocos"
+    likes = metade * args.likes
+    print(f"{likes} likes por modo ({metade} usuários x {args.likes}), {matches} matches mútuos no total:")
+    print(f"  um a um:          {c_um['commits']:6d} commits  {c_um['sql']:7d} comandos SQL  {t_um:6.2f}s")
+    print(f"  lotes de {args.lote:3d}:    {c_lote['commits']:6d} commits  {c_lote['sql']:7d} comandos SQL  {t_lote:6.2f}s  "
+          f"({c_um['commits']/max(c_lote['commits'], 1):.1f}x menos transações)")
+
+if __name__ == '__main__':
+    main()
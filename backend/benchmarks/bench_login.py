@@ -0,0 +1,123 @@
+# backend/benchmarks/bench_login.py
+# Login sob rajada (muitos clientes reconectando ao mesmo tempo): hash verificado na thread da requisição,
+# sem limite (como era), vs. no pool de processos com fila limitada (503 + Retry-After e o cliente tenta de novo).
+# Mede a latência de cada tentativa, o tempo até cada cliente conseguir o token e a de quem só navega enquanto
+# isso (as threads do worker continuam livres?). Depois, o custo da busca do usuário (OR de nome/email vs.
+# consultas pontuais vs. cache negativo) e o rehash quando o método muda.
+#   python -m benchmarks.bench_login [--usuarios 20000] [--rajada 32] [--threads 8] [--processos 2] [--fila 4] [--metodo scrypt:32768:8:1]
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.gerador import SENHA_PADRAO, gerar_comunidade
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores); return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+def rajada(gg, usernames, threads_worker, espera_retry, token_outras):
+    """Todos os clientes disparam o login juntos; quem recebe 503 espera e tenta de novo. As requisições passam
+    por um pool de `threads_worker` threads, como um worker gthread do gunicorn: a latência inclui a espera por
+    uma thread livre. Enquanto a rajada dura, outra requisição (/auth/me) chega a cada 20ms."""
+    worker = ThreadPoolExecutor(max_workers=threads_worker)
+    def requisicao(metodo, *args, **kwargs):
+        inicio = time.perf_counter(); r = worker.submit(lambda: getattr(gg.app.test_client(), metodo)(*args, **kwargs)).result()
+        return r, time.perf_counter() - inicio
+    tentativas = []; ate_token = []; outras = []; recusas = [0]; lock = threading.Lock(); largada = threading.Barrier(len(usernames) + 1); fim = threading.Event()
+    def cliente(username):
+        rnd = random.Random(username); largada.wait(); inicio = time.perf_counter()
+        while True:
+            r, duracao = requisicao('post', '/auth/login', json={"username": username, "password": SENHA_PADRAO})
+            with lock: tentativas.append(duracao)
+            if r.status_code == 200: break
+            assert r.status_code == 503, r.status_code
+            with lock: recusas[0] += 1
+            time.sleep(espera_retry * (0.5 + rnd.random())) # com jitter, para a segunda onda não chegar toda junta
+        with lock: ate_token.append(time.perf_counter() - inicio)
+    def outro_usuario():
+        largada.wait()
+        while not fim.wait(0.02):
+            r, duracao = requisicao('get', '/auth/me', headers=token_outras); assert r.status_code == 200; outras.append(duracao)
+    clientes = [threading.Thread(target=cliente, args=(u,)) for u in usernames]; navegando = threading.Thread(target=outro_usuario)
+    for t in clientes + [navegando]: t.start()
+    inicio = time.perf_counter()
+    for t in clientes: t.join()
+    segundos = time.perf_counter() - inicio; fim.set(); navegando.join(); worker.shutdown()
+    return {"segundos": segundos, "tentativas": tentativas, "ate_token": ate_token, "recusas": recusas[0], "outras": outras}
+
+def medir_busca(funcao, identificadores, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for identificador in identificadores: funcao(identificador)
+    return (time.perf_counter() - inicio) / (repeticoes * len(identificadores))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--usuarios', type=int, default=20_000)
+    parser.add_argument('--rajada', type=int, default=32, help="clientes fazendo login ao mesmo tempo")
+    parser.add_argument('--threads', type=int, default=8, help="threads do worker que atende as requisições")
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--fila', type=int, default=4, help="hashes esperando além dos que estão rodando")
+    parser.add_argument('--metodo', default=None, help="SENHA_HASH_METODO (padrão: o do app)")
+    parser.add_argument('--espera-retry', type=float, default=0.2, help="segundos (médios) até o cliente repetir depois de um 503")
+    args = parser.parse_args()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"; os.environ.pop('GEMINI_API_KEY', None)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if args.metodo: os.environ['SENHA_HASH_METODO'] = args.metodo
+    import app as gg
+    from flask_jwt_extended import create_access_token
+    from senhas import ServicoSenhas
+
+    with gg.app.app_context():
+        gg.aplicar_migracoes(); gerar_comunidade(gg, args.usuarios, likes_medios=1)
+        token_outras = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+    usernames = [f"bench{uid}" for uid in random.Random(1).sample(range(2, args.usuarios + 1), args.rajada)]
+    metodo = gg.servico_senhas.metodo
+
+    # --- Rajada de logins ---
+    modos = [("na thread da requisição, sem limite (antes)", ServicoSenhas(metodo, processos=0, fila_max=10**6)),
+             (f"pool de {args.processos} processo(s), fila {args.fila}", ServicoSenhas(metodo, processos=args.processos, fila_max=args.fila))]
+    print(f"{args.rajada} logins simultâneos num worker de {args.threads} threads, {metodo}:")
+    for nome, servico in modos:
+        gg.servico_senhas = servico
+        servico.verificar(*(servico.gerar('aquecimento'), 'aquecimento')) # sobe o pool fora da medição
+        r = rajada(gg, usernames, args.threads, args.espera_retry, token_outras); servico.encerrar()
+        aceitas = len(r["tentativas"]) - r["recusas"]
+        print(f"  {nome}:")
+        print(f"    tentativa (p50 / p99):       {statistics.median(r['tentativas'])*1000:8.1f}ms / {percentil(r['tentativas'], 0.99)*1000:8.1f}ms"
+              f"  ({aceitas} aceitas, {r['recusas']} recusadas com 503)")
+        print(f"    até o token (p50 / p99):     {statistics.median(r['ate_token'])*1000:8.1f}ms / {percentil(r['ate_token'], 0.99)*1000:8.1f}ms"
+              f"  (rajada inteira em {r['segundos']:.2f}s)")
+        print(f"    /auth/me durante a rajada:   {statistics.median(r['outras'])*1000:8.1f}ms / {percentil(r['outras'], 0.99)*1000:8.1f}ms")
+
+    # --- Busca do usuário ---
+    with gg.app.app_context():
+        User = gg.User
+        por_or = lambda identificador: User.query.filter((User.username == identificador) | (User.email == identificador)).first()
+        amostra = random.Random(2).sample(range(1, args.usuarios + 1), 200)
+        casos = [("nome de usuário", [f"bench{uid}" for uid in amostra]), ("email", [f"bench{uid}@gg.local" for uid in amostra]),
+                 ("inexistente", [f"ninguem{i}" for i in range(200)])]
+        print(f"\nbusca do usuário ({args.usuarios} usuários), µs por login:")
+        for nome, identificadores in casos:
+            antes = medir_busca(por_or, identificadores, 5)
+            gg.cache_login_inexistente.limpar(); depois = medir_busca(gg.buscar_usuario_login, identificadores, 5)
+            print(f"  {nome:16s} OR: {antes*1e6:7.1f}   consultas pontuais{' + cache negativo' if nome == 'inexistente' else ''}: {depois*1e6:7.1f}")
+
+    # --- Rehash no login quando o método muda ---
+    gg.servico_senhas = ServicoSenhas('scrypt:16384:8:1', processos=0)
+    metodo_salvo = lambda: gg.User.query.filter_by(username=usernames[0]).one().password_hash.split('$')[0]
+    with gg.app.app_context(): antes = metodo_salvo()
+    cliente = gg.app.test_client()
+    for _ in range(2): assert cliente.post('/auth/login', json={"username": usernames[0], "password": SENHA_PADRAO}).status_code == 200
+    with gg.app.app_context(): depois = metodo_salvo()
+    print(f"\nrehash no login: {antes} -> {depois} ({gg.servico_senhas.rehashes} rehash em 2 logins)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# backend/benchmarks/bench_recomendacoes.py
+# Custo do pré-cálculo (flask --app app recomendar) com 1 e N processos, e latência da primeira página
+# do /api/get_match ranqueando na requisição vs. lendo o deck pré-calculado.
+#   python -m benchmarks.bench_recomendacoes [--perfis 20000] [--processos 4] [--requisicoes 100]
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.paridade_matchmaking import gerar_perfis
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--perfis', type=int, default=20_000)
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--requisicoes', type=int, default=100)
+    args = parser.parse_args()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"; os.environ.pop('GEMINI_API_KEY', None)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import app as gg
+    from flask_jwt_extended import create_access_token
+
+    rnd = random.Random(1)
+    with gg.app.app_context():
+        gg.aplicar_migracoes()
+        for p in gerar_perfis(args.perfis, rnd):
+            gg.db.session.add(gg.User(id=p['user_id'], username=f"bench{p['user_id']}", email=f"bench{p['user_id']}@x.com", password_hash='x'))
+            gg.db.session.add(gg.UserProfile(**{k: v for k, v in p.items()}, profile_complete=True))
+        gg.db.session.commit()
+        viewers = rnd.sample(range(1, args.perfis + 1), args.requisicoes)
+        tokens = {uid: {'Authorization': 'Bearer ' + create_access_token(identity=str(uid))} for uid in viewers}
+
+        tempos = {}
+        for processos in (1, args.processos):
+            r = gg.atualizar_recomendacoes(completo=True, processos=processos); tempos[processos] = r
+        incremental = gg.atualizar_recomendacoes()
+
+    cliente = gg.app.test_client()
+    def primeira_pagina(pre_calculado):
+        latencias = []
+        for uid in viewers:
+            gg.cache_matches.invalidar(uid) # sem o deck em memória: mede a montagem
+            if not pre_calculado:
+                with gg.app.app_context(): gg.Recommendation.query.filter_by(viewer_user_id=uid).delete(); gg.db.session.commit()
+            inicio = time.perf_counter(); r = cliente.get('/api/get_match?limit=10', headers=tokens[uid]); latencias.append(time.perf_counter() - inicio)
+            assert r.status_code == 200
+        return statistics.median(latencias), sorted(latencias)[int(len(latencias) * 0.95) - 1]
+
+    pre = primeira_pagina(True); ao_vivo = primeira_pagina(False)
+    print(f"{args.perfis} perfis completos, {tempos[1]['comunidades']} comunidades, top-{gg.RECOMENDACOES_TOP_K}:")
+    for processos, r in tempos.items():
+        print(f"  pré-cálculo completo, {processos:2d} processo(s): {r['segundos']:7.2f}s  ({r['viewers']} viewers, {r['linhas']} linhas)")
+    print(f"  rodada incremental sem mudanças:       {incremental['segundos']:7.3f}s  ({incremental['recalculadas']} comunidades recalculadas)")
+    print(f"  /api/get_match, 1ª página (p50 / p95):")
+    print(f"    ranqueando na requisição: {ao_vivo[0]*1000:8.2f}ms / {ao_vivo[1]*1000:8.2f}ms")
+    print(f"    deck pré-calculado:       {pre[0]*1000:8.2f}ms / {pre[1]*1000:8.2f}ms")
+
+if __name__ == '__main__':
+    main()
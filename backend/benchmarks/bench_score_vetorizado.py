@@ -0,0 +1,49 @@
+# backend/benchmarks/bench_score_vetorizado.py
+# Confere a paridade do motor vetorizado (com e sem a poda por baldes) com o loop de referência em perfis
+# aleatórios (as conferências de benchmarks/paridade_matchmaking.py, as mesmas dos testes) e mede o tempo
+# de pontuar um viewer contra 10k, 100k e 1M candidatos.
+#   python -m benchmarks.bench_score_vetorizado [--tamanhos 10000 100000 1000000] [--sem-referencia]
+
+import argparse
+import random
+import time
+
+from benchmarks.paridade_matchmaking import (gerar_medias, gerar_perfis, verificar_paridade, verificar_paridade_empates, verificar_paridade_poda,
+                                             verificar_poda_em_empates)
+from matchmaking import ColunasPerfis, pontuar_candidatos_referencia
+
+
+def medir(funcao, repeticoes):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter(); funcao(); melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--sem-referencia', action='store_true', help="não mede o loop Python (lento em 1M)")
+    args = parser.parse_args()
+    print(f"Paridade OK em {verificar_paridade()} comunidades aleatórias e {verificar_paridade_empates()} com empates.")
+    print(f"Poda por baldes idêntica à varredura completa em {verificar_paridade_poda()} comunidades grandes"
+          f" e em {verificar_poda_em_empates()} cortes no meio de empates.")
+    rnd = random.Random(42)
+    print(f"{'candidatos':>11} | {'referência':>11} | {'codificação':>11} | {'vetorizado':>10} | {'top 3':>8} | {'baldes':>8} | {'top 3 poda':>10} | {'top 200':>8} | {'top 200 poda':>12} | speedup")
+    for n in args.tamanhos:
+        perfis = gerar_perfis(n, rnd)
+        for p in perfis: p["jogo_principal"] = "Valorant" # pior caso: todos na mesma comunidade
+        viewer = dict(perfis[0], user_id=0); medias = {k: v for k, v in gerar_medias(perfis, rnd).items() if v <= 5}
+        inicio = time.perf_counter(); colunas = ColunasPerfis(perfis); t_codificacao = time.perf_counter() - inicio
+        t_vetorizado = medir(lambda: colunas.pontuar(viewer, medias), 3)
+        colunas.poda_minimo = None
+        t_top3 = medir(lambda: colunas.pontuar(viewer, medias, top_k=3), 3); t_top200 = medir(lambda: colunas.pontuar(viewer, medias, top_k=200), 3)
+        colunas.poda_minimo = 0
+        t_baldes = medir(lambda: colunas.pontuar(viewer, medias, top_k=3), 1) # 1ª chamada monta os baldes (uma vez por instância)
+        t_poda = medir(lambda: colunas.pontuar(viewer, medias, top_k=3), 3); t_poda200 = medir(lambda: colunas.pontuar(viewer, medias, top_k=200), 3)
+        t_referencia = None if args.sem_referencia else medir(lambda: pontuar_candidatos_referencia(viewer, perfis, medias), 1)
+        ref = f"{t_referencia*1000:9.1f}ms" if t_referencia else f"{'-':>11}"
+        speedup = f"{t_referencia / t_top3:6.1f}x" if t_referencia else "-"
+        print(f"{n:>11} | {ref} | {t_codificacao*1000:9.1f}ms | {t_vetorizado*1000:8.1f}ms | {t_top3*1000:6.1f}ms | {t_baldes*1000:6.1f}ms | {t_poda*1000:8.2f}ms | {t_top200*1000:6.1f}ms | {t_poda200*1000:10.2f}ms | {speedup}")
+
+if __name__ == '__main__':
+    main()
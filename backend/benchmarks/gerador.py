@@ -0,0 +1,118 @@
+# backend/benchmarks/gerador.py
+# Comunidade sintética e reproduzível (mesma semente, mesmos dados) nos modelos do app: jogos com
+# popularidade Zipf (com variações de grafia, como no cadastro real), respostas do perfil tiradas de
+# PROFILE_GEMINI_CATEGORIES, likes com popularidade e atividade em lei de potência (poucos muito curtidos,
+# poucos que curtem muito), matches mútuos dos likes recíprocos e avaliações entre quem deu match.
+#   python -m benchmarks.gerador --usuarios 10000 --banco /tmp/gg_10k.db [--semente 1]
+
+import argparse
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from senhas import gerar_hash
+
+# Do mais popular para o menos: o peso do i-ésimo é 1 / i^expoente
+JOGOS = ['Valorant', 'League of Legends', 'Counter-Strike 2', 'Fortnite', 'Minecraft', 'Free Fire', 'Apex Legends', 'Dota 2',
+         'Rocket League', 'Overwatch 2', 'GTA V', 'Rainbow Six Siege', 'Call of Duty: Warzone', 'EA FC 25', 'Roblox',
+         'Genshin Impact', 'PUBG', 'Dead by Daylight', 'Brawl Stars', 'Stardew Valley', 'Terraria', 'Among Us', 'Hades', 'Elden Ring']
+VARIACOES_GRAFIA = {'Valorant': ['valorant', 'VALORANT', 'Valorant '], 'League of Legends': ['LoL', 'lol', 'league of legends'],
+                    'Counter-Strike 2': ['CS2', 'cs2'], 'Minecraft': ['minecraft', 'Mine']}
+DISPONIBILIDADES = ['à noite', 'Noites', 'fins de semana', 'finais de semana e feriados', 'tarde/noite', 'manhã, tarde', 'de madrugada',
+                    'noites e fins de semana', 'todo dia depois das 20h', 'Não especificado']
+APELIDOS = ['Shadow', 'Ninja', 'Pixel', 'Lobo', 'Fênix', 'Zé', 'Ana', 'Tiger', 'Kira', 'Bolt', 'Nox', 'Duda', 'Rex', 'Luna', 'Vex']
+SENHA_PADRAO = 'senha-bench-123' # todos os usuários gerados usam esta senha (hash calculado uma vez só)
+DIAS_HISTORICO = 90
+LOTE_INSERCAO = 5000
+
+
+def _acumulados(pesos):
+    return list(itertools.accumulate(pesos))
+
+def _inserir(gg, modelo, linhas):
+    for i in range(0, len(linhas), LOTE_INSERCAO): gg.db.session.execute(modelo.__table__.insert(), linhas[i:i + LOTE_INSERCAO])
+
+def gerar_comunidade(gg, usuarios, semente=1, likes_medios=20, expoente_zipf=1.1, alfa=1.6, fracao_completos=0.9, reciprocidade=0.25, fracao_avaliam=0.5):
+    """Preenche o banco do app (contexto de app ativo, tabelas criadas e vazias). Devolve um resumo do que foi gerado."""
+    inicio = time.perf_counter(); rnd = random.Random(semente); agora = datetime.utcnow()
+    momento = lambda: agora - timedelta(seconds=rnd.randrange(DIAS_HISTORICO * 86400))
+    categorias = gg.PROFILE_GEMINI_CATEGORIES
+    hash_senha = gerar_hash(SENHA_PADRAO, gg.servico_senhas.metodo) # na própria thread: um hash só, sem subir o pool
+    pesos_jogos = _acumulados(1 / (i + 1) ** expoente_zipf for i in range(len(JOGOS)))
+
+    # --- Usuários e perfis ---
+    ids = list(range(1, usuarios + 1)); jogo_de = {}; completos = []
+    linhas_usuarios = []; linhas_perfis = []
+    for uid in ids:
+        linhas_usuarios.append({"id": uid, "username": f"bench{uid}", "email": f"bench{uid}@gg.local", "password_hash": hash_senha})
+        jogo = rnd.choices(JOGOS, cum_weights=pesos_jogos)[0]
+        grafia = rnd.choice(VARIACOES_GRAFIA[jogo]) if jogo in VARIACOES_GRAFIA and rnd.random() < 0.3 else jogo
+        completo = rnd.random() < fracao_completos
+        disponibilidade = rnd.choice(DISPONIBILIDADES)
+        linhas_perfis.append({"user_id": uid, "nome_display": f"{rnd.choice(APELIDOS)}{rnd.randrange(1000)}", "jogo_principal": grafia,
+                              "nivel_de_habilidade": rnd.choice(categorias['nivel_de_habilidade']), "estilo_jogo": rnd.choice(categorias['estilo_jogo']),
+                              "disponibilidade": disponibilidade, "gender": rnd.choice(categorias['gender'] + ['Não especificado']),
+                              "communication_style": rnd.choice(categorias['communication_style']), "profile_complete": completo,
+                              # colunas derivadas que os validadores do modelo preencheriam (o insert em lote não passa por eles)
+                              "jogo_normalizado": gg.normalizar_jogo(grafia), "disponibilidade_tokens": gg.tokens_disponibilidade_para_coluna(disponibilidade),
+                              "atualizado_em": agora})
+        jogo_de[uid] = jogo
+        if completo: completos.append(uid)
+    _inserir(gg, gg.User, linhas_usuarios); _inserir(gg, gg.UserProfile, linhas_perfis)
+
+    # --- Likes: popularidade (quem recebe) e atividade (quem dá) com cauda longa ---
+    popularidade = {uid: rnd.paretovariate(alfa) for uid in ids}
+    por_jogo = {}
+    for uid in ids: por_jogo.setdefault(jogo_de[uid], []).append(uid)
+    alvos = {jogo: (membros, _acumulados(popularidade[u] for u in membros)) for jogo, membros in por_jogo.items()}
+    pesos_todos = _acumulados(popularidade[u] for u in ids)
+    escala = likes_medios * (alfa - 1) / alfa # média da Pareto(alfa) é alfa/(alfa-1)
+    pares = set()
+    for uid in ids:
+        quantidade = min(int(rnd.paretovariate(alfa) * escala), usuarios - 1, 2000)
+        mesmo_jogo = sum(rnd.random() < 0.8 for _ in range(quantidade)) # a maioria curte gente do próprio jogo
+        membros, pesos = alvos[jogo_de[uid]]
+        for outro in rnd.choices(membros, cum_weights=pesos, k=mesmo_jogo) + rnd.choices(ids, cum_weights=pesos_todos, k=quantidade - mesmo_jogo):
+            if outro != uid: pares.add((uid, outro))
+    for liker, liked in sorted(pares):
+        if rnd.random() < reciprocidade: pares.add((liked, liker))
+    pares = sorted(pares)
+    momento_like = {par: momento() for par in pares}
+    _inserir(gg, gg.Like, [{"liker_user_id": a, "liked_user_id": b, "timestamp": momento_like[(a, b)]} for a, b in pares])
+
+    # --- Matches mútuos (par canônico, no momento do segundo like) e avaliações entre eles ---
+    mutuos = [(a, b) for a, b in pares if a < b and (b, a) in momento_like]
+    _inserir(gg, gg.MutualMatch, [{"user_min_id": a, "user_max_id": b, "matched_at": max(momento_like[(a, b)], momento_like[(b, a)])} for a, b in mutuos])
+    avaliacoes = []
+    for a, b in mutuos:
+        for rater, rated in ((a, b), (b, a)):
+            if rnd.random() < fracao_avaliam:
+                nota = rnd.choices((1, 2, 3, 4, 5), weights=(1, 2, 4, 6, 5 + min(popularidade[rated], 10)))[0] # populares tendem a ser bem avaliados
+                avaliacoes.append({"rater_user_id": rater, "rated_user_id": rated, "rating": nota, "game_played": jogo_de[rater], "timestamp": momento()})
+    _inserir(gg, gg.MatchRating, avaliacoes)
+    gg.db.session.commit()
+    with gg.db.engine.begin() as conn: gg.migracao_rating_agregado(conn)
+
+    jogadores_por_jogo = sorted(((len(m), j) for j, m in por_jogo.items()), reverse=True)
+    return {"usuarios": usuarios, "semente": semente, "perfis_completos": len(completos), "likes": len(pares), "matches_mutuos": len(mutuos),
+            "avaliacoes": len(avaliacoes), "maiores_jogos": {j: n for n, j in jogadores_por_jogo[:5]}, "segundos": round(time.perf_counter() - inicio, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--usuarios', type=int, default=10_000)
+    parser.add_argument('--banco', required=True, help="arquivo SQLite a criar (não pode existir)")
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--likes-medios', type=int, default=20)
+    args = parser.parse_args()
+    if os.path.exists(args.banco): raise SystemExit(f"{args.banco} já existe")
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(args.banco)}"; os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import app as gg
+    with gg.app.app_context():
+        gg.aplicar_migracoes()
+        print(gerar_comunidade(gg, args.usuarios, semente=args.semente, likes_medios=args.likes_medios))
+
+if __name__ == '__main__':
+    main()
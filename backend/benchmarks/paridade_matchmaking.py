@@ -0,0 +1,87 @@
+# backend/benchmarks/paridade_matchmaking.py
+# Perfis aleatórios com semente (grafias variadas, campos None, scores empatados) e as conferências de paridade
+# do motor vetorizado (ColunasPerfis, com e sem a poda por baldes) com o loop de referência. Usado por
+# tests/test_matchmaking.py e pelos benchmarks, sem depender do pytest: divergência levanta AssertionError
+# explícito, que um python -O não remove.
+
+import random
+
+from matchmaking import MAPA_COMUNICACAO, MAPA_NIVEIS, ColunasPerfis, pontuar_candidatos_referencia
+
+NIVEIS = list(MAPA_NIVEIS) + ['Iniciante', ' AVANÇADO ', 'Sou tryhard', None, '']
+ESTILOS = ['Focado em Diversão/Casual', 'Competitivo/Subir de Ranking', 'competitivo/subir de ranking ', 'Tryhard', 'Não especificado', None, '']
+DISPONIBILIDADES = ['à noite', 'Noites', 'fins de semana', 'finais de semana e feriados', 'tarde/noite', 'manhã, tarde', 'Não especificado', 'só de madrugada', None, '']
+GENEROS = ['Mulher', 'Homem', 'homem ', 'Não-binário', 'Prefiro não dizer', 'Não especificado', 'Outro', None, '']
+COMUNICACOES = list(MAPA_COMUNICACAO) + ['Conversa casual e social', 'sei lá', None, '']
+JOGOS = ['Valorant', 'valorant ', 'VALORANT', 'LoL', 'Minecraft']
+CAMPOS = ('nivel_de_habilidade', 'estilo_jogo', 'disponibilidade', 'gender', 'communication_style')
+
+def gerar_perfis(n, rnd):
+    return [{"user_id": i + 1, "nome_display": rnd.choice(['Ana', 'bob', 'Zé', None, '']), "jogo_principal": rnd.choice(JOGOS),
+             "nivel_de_habilidade": rnd.choice(NIVEIS), "estilo_jogo": rnd.choice(ESTILOS), "disponibilidade": rnd.choice(DISPONIBILIDADES),
+             "gender": rnd.choice(GENEROS), "communication_style": rnd.choice(COMUNICACOES)} for i in range(n)]
+
+def gerar_medias(perfis, rnd, fracao=0.3):
+    return {p["user_id"]: rnd.randint(1, 5 * rnd.randint(1, 7)) / rnd.randint(1, 7) for p in perfis if rnd.random() < fracao}
+
+def gerar_empatados(rnd, modelos=6, copias=4):
+    """Poucos perfis-modelo repetidos com ids diferentes (scores empatados), um deles com todos os campos None."""
+    base = gerar_perfis(modelos, rnd); base[0].update(dict.fromkeys(CAMPOS + ('nome_display',)))
+    perfis = [dict(modelo, user_id=len(base) * c + i + 1) for c in range(copias) for i, modelo in enumerate(base)]
+    rnd.shuffle(perfis)
+    nota = {i: rnd.choice([None, 3.0, 5.0]) for i in range(len(base))} # mesma média para as cópias do mesmo modelo
+    medias = {p["user_id"]: nota[(p["user_id"] - 1) % len(base)] for p in perfis if nota[(p["user_id"] - 1) % len(base)] is not None}
+    return perfis, medias
+
+def conferir(perfis, medias, viewer, ks):
+    esperado = pontuar_candidatos_referencia(viewer, perfis, medias); colunas = ColunasPerfis(perfis)
+    if colunas.pontuar(viewer, medias) != esperado: raise AssertionError("motor vetorizado divergiu da referência")
+    for k in ks:
+        if colunas.pontuar(viewer, medias, top_k=k) != esperado[:k]: raise AssertionError(f"top_k={k} divergiu da referência")
+    com_poda = ColunasPerfis(perfis, poda_minimo=0) # força os baldes mesmo em comunidades pequenas
+    for k in ks:
+        if k and com_poda.pontuar(viewer, medias, top_k=k) != esperado[:k]: raise AssertionError(f"poda por baldes (top_k={k}) divergiu da referência")
+
+def verificar_paridade(rodadas=200, seed=7):
+    rnd = random.Random(seed)
+    for _ in range(rodadas):
+        perfis = gerar_perfis(rnd.randint(1, 300), rnd); medias = {k: v for k, v in gerar_medias(perfis, rnd).items() if v <= 5}
+        viewer = rnd.choice(perfis) if rnd.random() < 0.8 else gerar_perfis(1, rnd)[0]
+        conferir(perfis, medias, viewer, (rnd.randint(0, 10), 1, rnd.randint(1, len(perfis) + 2)))
+    return rodadas
+
+def verificar_paridade_empates(rodadas=50, seed=3):
+    rnd = random.Random(seed)
+    for _ in range(rodadas):
+        perfis, medias = gerar_empatados(rnd)
+        viewer = rnd.choice(perfis) if rnd.random() < 0.5 else dict(perfis[0], user_id=0, **dict.fromkeys(CAMPOS))
+        conferir(perfis, medias, viewer, range(len(perfis) + 2)) # todo corte possível, inclusive no meio de um empate
+    return rodadas
+
+def verificar_paridade_poda(rodadas=30, seed=11, tamanho=(2_000, 20_000)):
+    """Poda por baldes (poda_minimo=0) igual à varredura completa (poda_minimo=None) em comunidades grandes,
+    com um dict de médias reaproveitado entre viewers, como no pré-cálculo."""
+    rnd = random.Random(seed)
+    for _ in range(rodadas):
+        perfis = gerar_perfis(rnd.randint(*tamanho), rnd); medias = gerar_medias(perfis, rnd, fracao=rnd.choice([0.0, 0.05, 0.5]))
+        completo, com_poda = ColunasPerfis(perfis, poda_minimo=None), ColunasPerfis(perfis, poda_minimo=0)
+        for viewer in rnd.sample(perfis, 5):
+            k = rnd.choice([1, 3, 10, 200])
+            if com_poda.pontuar(viewer, medias, top_k=k) != completo.pontuar(viewer, medias, top_k=k): raise AssertionError("poda por baldes divergiu da varredura completa")
+    return rodadas
+
+def cortes_em_empate(ranking):
+    """Valores de k em que o k-ésimo e o (k+1)-ésimo têm o mesmo score: o corte cai dentro de um empate."""
+    return [k for k in range(1, len(ranking)) if ranking[k - 1]["score"] == ranking[k]["score"]]
+
+def verificar_poda_em_empates(rodadas=20, seed=13):
+    rnd = random.Random(seed); cortes = 0
+    for _ in range(rodadas):
+        perfis, medias = gerar_empatados(rnd, modelos=rnd.randint(20, 60), copias=rnd.randint(5, 30))
+        completo, com_poda = ColunasPerfis(perfis, poda_minimo=None), ColunasPerfis(perfis, poda_minimo=0)
+        for viewer in rnd.sample(perfis, 3):
+            ranking = completo.pontuar(viewer, medias); empates = cortes_em_empate(ranking); cortes += len(empates)
+            for k in empates[:20] + [1, len(ranking), len(ranking) + 1]:
+                if not com_poda.pontuar(viewer, medias, top_k=k) == completo.pontuar(viewer, medias, top_k=k) == ranking[:k]: raise AssertionError(f"poda divergiu em top_k={k}")
+    return cortes
+
@@ -0,0 +1,218 @@
+# backend/benchmarks/suite.py
+# Suíte de benchmarks sobre comunidades sintéticas (benchmarks.gerador) de vários tamanhos: as rotas
+# principais pelo test client do Flask e o relatório do analista, com o Gemini falso (determinístico, sem rede).
+# Cada tamanho roda num processo próprio (o app lê DATABASE_URL na importação); os bancos gerados ficam em
+# cache em --dados e cada rodada trabalha numa cópia, então duas execuções medem os mesmos dados.
+# O resultado vai para um JSON (formato parecido com o do pytest-benchmark) que serve de base para comparar commits.
+#   python -m benchmarks.suite [--tamanhos 1000 10000 100000] [--rodadas 50] [--casos get_match rate_player]
+#                              [--saida benchmarks/resultados] [--comparar resultados/anterior.json] [--limite-regressao 0.10]
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- Casos ---
+# Cada caso faz uma rodada: prepara o que precisar fora da medição e passa a operação medida para medir(fn),
+# que devolve o resultado de fn.
+CASOS = {}
+
+def caso(rodadas_max=None):
+    def registrar(funcao):
+        CASOS[funcao.__name__] = (funcao, rodadas_max); return funcao
+    return registrar
+
+def _esperar_status(resposta, status=200):
+    if resposta.status_code != status: raise RuntimeError(f"status {resposta.status_code}: {resposta.get_data(as_text=True)[:200]}")
+    return resposta
+
+@caso()
+def get_match(ctx, medir):
+    """Primeira página sem deck em memória: ranqueia a comunidade do viewer."""
+    uid = ctx.rnd.choice(ctx.completos); ctx.gg.cache_matches.invalidar(uid)
+    _esperar_status(medir(lambda: ctx.cliente.get('/api/get_match?limit=10', headers=ctx.cabecalho(uid))))
+
+@caso()
+def get_mutual_matches(ctx, medir):
+    uid = ctx.rnd.choice(ctx.com_matches)
+    _esperar_status(medir(lambda: ctx.cliente.get('/api/get_mutual_matches?limit=100', headers=ctx.cabecalho(uid))))
+
+@caso()
+def action_match(ctx, medir):
+    """Like novo (o par é sorteado até achar um que ainda não existe)."""
+    while True:
+        liker, liked = ctx.rnd.sample(ctx.completos, 2)
+        with ctx.gg.app.app_context():
+            if ctx.gg.Like.query.filter_by(liker_user_id=liker, liked_user_id=liked).first() is None: break
+    _esperar_status(medir(lambda: ctx.cliente.post('/api/action/match', json={"liked_user_id": liked}, headers=ctx.cabecalho(liker))))
+
+@caso()
+def rate_player(ctx, medir):
+    """Avaliação entre um par com match (nova ou atualizando a anterior, como acontece no app)."""
+    rater, rated = ctx.rnd.choice(ctx.mutuos)
+    if ctx.rnd.random() < 0.5: rater, rated = rated, rater
+    dados = {"rated_user_id": rated, "rating": ctx.rnd.randint(1, 5), "game_played": ctx.jogo_de.get(rater)}
+    _esperar_status(medir(lambda: ctx.cliente.post('/api/rate_player', json=dados, headers=ctx.cabecalho(rater))))
+
+@caso(rodadas_max=5)
+def gerar_relatorio_basico(ctx, medir):
+    """Relatório completo do analista: snapshot do banco, métricas e texto."""
+    import analise_dados_gg as analise
+    def relatorio():
+        conn = analise.tirar_snapshot(ctx.caminho_banco)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()): analise.gerar_relatorio_basico(analise.coletar_metricas(conn))
+        finally: conn.close()
+    medir(relatorio)
+
+
+class Contexto:
+    """O que os casos usam: app, test client, tokens JWT (criados sob demanda) e amostras da comunidade."""
+
+    def __init__(self, gg, caminho_banco, semente):
+        from flask_jwt_extended import create_access_token
+        self.gg = gg; self.caminho_banco = caminho_banco; self.rnd = random.Random(semente)
+        self.cliente = gg.app.test_client(); self._criar_token = create_access_token; self._cabecalhos = {}
+        with gg.app.app_context():
+            perfis = gg.db.session.query(gg.UserProfile.user_id, gg.UserProfile.jogo_principal, gg.UserProfile.profile_complete).order_by(gg.UserProfile.user_id).all()
+            self.mutuos = gg.db.session.query(gg.MutualMatch.user_min_id, gg.MutualMatch.user_max_id).order_by(gg.MutualMatch.user_min_id, gg.MutualMatch.user_max_id).all()
+        self.completos = [uid for uid, _, completo in perfis if completo]
+        self.jogo_de = {uid: jogo for uid, jogo, _ in perfis}
+        self.com_matches = sorted({uid for par in self.mutuos for uid in par})
+
+    def cabecalho(self, uid):
+        if uid not in self._cabecalhos:
+            with self.gg.app.app_context(): self._cabecalhos[uid] = {'Authorization': 'Bearer ' + self._criar_token(identity=str(uid))}
+        return self._cabecalhos[uid]
+
+
+# --- Estatísticas ---
+def estatisticas(tempos):
+    ordenados = sorted(tempos); media = statistics.fmean(tempos)
+    return {"min": ordenados[0], "max": ordenados[-1], "mean": media, "median": statistics.median(ordenados),
+            "stddev": statistics.stdev(tempos) if len(tempos) > 1 else 0.0,
+            "p95": ordenados[max(math.ceil(len(ordenados) * 0.95) - 1, 0)], "rounds": len(tempos), "ops": 1 / media if media else None}
+
+def rodar_caso(nome, ctx, rodadas, aquecimento):
+    funcao, rodadas_max = CASOS[nome]
+    tempos = []
+    def medir(fn):
+        inicio = time.perf_counter(); resultado = fn(); tempos.append(time.perf_counter() - inicio)
+        return resultado
+    for _ in range(aquecimento): funcao(ctx, medir)
+    del tempos[:]
+    for _ in range(min(rodadas, rodadas_max or rodadas)): funcao(ctx, medir)
+    return estatisticas(tempos)
+
+
+# --- Um tamanho de comunidade (roda em processo separado) ---
+def _copiar_banco(origem, destino):
+    with contextlib.closing(sqlite3.connect(origem)) as a, contextlib.closing(sqlite3.connect(destino)) as b: a.backup(b)
+
+def medir_comunidade(tamanho, semente, likes_medios, casos, rodadas, aquecimento, pasta_dados):
+    pasta_trabalho = tempfile.mkdtemp(prefix='gg_bench_'); caminho_banco = os.path.join(pasta_trabalho, 'bench.db')
+    cache = os.path.join(pasta_dados, f"comunidade_{tamanho}_s{semente}_l{likes_medios}.db") if pasta_dados else None
+    comunidade = None
+    if cache and os.path.exists(cache) and os.path.exists(cache + '.json'):
+        _copiar_banco(cache, caminho_banco)
+        with open(cache + '.json', encoding='utf-8') as f: comunidade = json.load(f) # resumo de quando foi gerado
+    os.environ['DATABASE_URL'] = f"sqlite:///{caminho_banco}"; os.environ['GEMINI_MODELO_FALSO_LATENCIA'] = '0'
+    os.environ.pop('GEMINI_API_KEY', None); os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    sys.path.insert(0, PASTA_BACKEND)
+    import app as gg
+    from benchmarks.gerador import gerar_comunidade
+    gg.inicializar_servicos_google() # com GEMINI_MODELO_FALSO_LATENCIA: modelo falso local
+    with gg.app.app_context():
+        gg.aplicar_migracoes()
+        if comunidade is None:
+            comunidade = gerar_comunidade(gg, tamanho, semente=semente, likes_medios=likes_medios)
+            if cache:
+                os.makedirs(pasta_dados, exist_ok=True); _copiar_banco(caminho_banco, cache)
+                with open(cache + '.json', 'w', encoding='utf-8') as f: json.dump(comunidade, f, ensure_ascii=False)
+    print(f"[{tamanho}] comunidade: {comunidade}", flush=True)
+    ctx = Contexto(gg, caminho_banco, semente)
+    resultados = []
+    for nome in casos:
+        stats = rodar_caso(nome, ctx, rodadas, aquecimento)
+        print(f"[{tamanho}] {nome:24s} mediana {stats['median'] * 1000:9.2f}ms  p95 {stats['p95'] * 1000:9.2f}ms  ({stats['rounds']} rodadas)", flush=True)
+        resultados.append({"name": f"{nome}[{tamanho}]", "group": nome, "params": {"usuarios": tamanho}, "stats": stats})
+    return comunidade, resultados
+
+
+# --- Resultado e comparação ---
+def _git(*argumentos):
+    try: return subprocess.run(['git', *argumentos], cwd=PASTA_BACKEND, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+def informacoes_ambiente():
+    maquina = {"node": platform.node(), "machine": platform.machine(), "processor": platform.processor(), "system": platform.system(),
+               "release": platform.release(), "python_version": platform.python_version(), "cpu_count": os.cpu_count()}
+    status = _git('status', '--porcelain')
+    commit = {"id": _git('rev-parse', 'HEAD'), "branch": _git('rev-parse', '--abbrev-ref', 'HEAD'), "dirty": bool(status) if status is not None else None}
+    return maquina, commit
+
+def comparar(atual, anterior, limite):
+    """Tabela de medianas (atual vs. anterior) por benchmark; devolve os nomes que pioraram mais que `limite`."""
+    antes = {b["name"]: b["stats"] for b in anterior["benchmarks"]}
+    regressoes = []
+    print(f"\ncomparando com {(anterior.get('commit_info') or {}).get('id') or '?'} ({anterior.get('datetime')}):")
+    for b in atual["benchmarks"]:
+        if b["name"] not in antes: print(f"  {b['name']:32s} (novo)"); continue
+        agora, base = b["stats"]["median"], antes[b["name"]]["median"]
+        variacao = agora / base - 1 if base else 0.0
+        marca = "  <-- REGRESSÃO" if variacao > limite else ""
+        if marca: regressoes.append(b["name"])
+        print(f"  {b['name']:32s} {base * 1000:9.2f}ms -> {agora * 1000:9.2f}ms  {variacao:+7.1%}{marca}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--casos', nargs='+', choices=sorted(CASOS), default=list(CASOS))
+    parser.add_argument('--rodadas', type=int, default=50)
+    parser.add_argument('--aquecimento', type=int, default=2, help="rodadas descartadas antes de medir")
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--likes-medios', type=int, default=20)
+    parser.add_argument('--dados', default=os.path.join('benchmarks', 'dados'), help="cache dos bancos gerados ('' desliga); apague se o gerador mudar")
+    parser.add_argument('--saida', default=os.path.join('benchmarks', 'resultados'))
+    parser.add_argument('--comparar', help="JSON de uma execução anterior")
+    parser.add_argument('--limite-regressao', type=float, default=0.10, help="piora máxima da mediana antes de sair com erro (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    maquina, commit = informacoes_ambiente()
+    resultado = {"machine_info": maquina, "commit_info": commit, "datetime": datetime.now().isoformat(timespec='seconds'),
+                 "parametros": {"semente": args.semente, "likes_medios": args.likes_medios, "rodadas": args.rodadas, "aquecimento": args.aquecimento},
+                 "comunidades": {}, "benchmarks": []}
+    contexto = multiprocessing.get_context('spawn')
+    for tamanho in args.tamanhos:
+        with contexto.Pool(1) as pool: # processo novo por tamanho: app importado com o banco daquele tamanho
+            comunidade, benchmarks = pool.apply(medir_comunidade, (tamanho, args.semente, args.likes_medios, args.casos, args.rodadas, args.aquecimento,
+                                                                    os.path.abspath(args.dados) if args.dados else None))
+        resultado["comunidades"][str(tamanho)] = comunidade; resultado["benchmarks"] += benchmarks
+
+    os.makedirs(args.saida, exist_ok=True)
+    caminho = os.path.join(args.saida, f"{datetime.now():%Y%m%d-%H%M%S}_{(commit['id'] or 'sem-git')[:8]}{'-dirty' if commit['dirty'] else ''}.json")
+    with open(caminho, 'w', encoding='utf-8') as f: json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nresultado salvo em {caminho}")
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f: anterior = json.load(f)
+        regressoes = comparar(resultado, anterior, args.limite_regressao)
+        if regressoes: print(f"{len(regressoes)} benchmark(s) pioraram mais de {args.limite_regressao:.0%}"); sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# backend/cache_gemini.py
+# Cache das respostas do Gemini endereçado pelo conteúdo: (tipo, campo, texto normalizado/prompt).
+# Respostas como "Valorant" ou "à noite" se repetem entre milhares de usuários; a partir da
+# segunda vez saem da memória (LRU) ou do SQLite opcional, que sobrevive a reinícios.
+# Erro no SQLite (disco cheio, arquivo travado ou corrompido) nunca sobe para a requisição: é registrado,
+# contado em erros_disco e a operação segue só com a memória (no pior caso, um miss).
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+from cache_lru import CacheLRU
+from observabilidade import logger
+
+
+class CacheRespostasGemini:
+    def __init__(self, max_itens=5000, caminho_sqlite=None, max_itens_disco=100000):
+        self._memoria = CacheLRU(max_itens)
+        self._lock = threading.Lock()
+        self._por_campo = {} # "tipo:campo" -> {"hits", "misses", "segundos_economizados"}
+        self._disco = None; self.max_itens_disco = max_itens_disco; self._gravacoes = 0; self.erros_disco = 0
+        if caminho_sqlite:
+            self._disco = sqlite3.connect(caminho_sqlite, check_same_thread=False)
+            self._disco.execute("CREATE TABLE IF NOT EXISTS resposta_gemini (chave TEXT PRIMARY KEY, campo TEXT NOT NULL, "
+                                "valor TEXT NOT NULL, segundos REAL NOT NULL, usado_em REAL NOT NULL)")
+            self._disco.commit()
+
+    @staticmethod
+    def chave(tipo, campo, conteudo):
+        return hashlib.sha256(f"{tipo}\x1f{campo}\x1f{conteudo}".encode('utf-8')).hexdigest()
+
+    def obter(self, tipo, campo, conteudo):
+        """Resposta guardada, ou None. Cada hit soma ao campo o tempo que a chamada original levou."""
+        chave = self.chave(tipo, campo, conteudo)
+        item = self._memoria.get(chave)
+        if item is None and self._disco is not None:
+            with self._lock:
+                try: linha = self._disco.execute("SELECT valor, segundos FROM resposta_gemini WHERE chave = ?", (chave,)).fetchone()
+                except sqlite3.Error as e: linha = None; self._falha_disco('obter', e)
+                if linha:
+                    try: self._disco.execute("UPDATE resposta_gemini SET usado_em = ? WHERE chave = ?", (time.time(), chave)); self._disco.commit()
+                    except sqlite3.Error as e: self._falha_disco('obter', e) # a resposta lida continua valendo
+            if linha: item = (linha[0], linha[1]); self._memoria.set(chave, item)
+        self._contar(tipo, campo, item)
+        return item[0] if item else None
+
+    def guardar(self, tipo, campo, conteudo, valor, segundos):
+        chave = self.chave(tipo, campo, conteudo)
+        self._memoria.set(chave, (valor, segundos))
+        if self._disco is None: return
+        with self._lock:
+            try:
+                self._disco.execute("INSERT OR REPLACE INTO resposta_gemini (chave, campo, valor, segundos, usado_em) VALUES (?, ?, ?, ?, ?)",
+                                    (chave, f"{tipo}:{campo}", valor, segundos, time.time()))
+                self._gravacoes += 1
+                if self._gravacoes % 1000 == 0: # poda os menos usados de vez em quando, não a cada escrita
+                    self._disco.execute("DELETE FROM resposta_gemini WHERE chave NOT IN (SELECT chave FROM resposta_gemini ORDER BY usado_em DESC LIMIT ?)", (self.max_itens_disco,))
+                self._disco.commit()
+            except sqlite3.Error as e: self._falha_disco('guardar', e) # fica só na memória
+
+    def descartar(self, tipo, campo, conteudo):
+        """Remove uma resposta que se mostrou inútil (ex.: JSON inválido no turno combinado)."""
+        chave = self.chave(tipo, campo, conteudo)
+        self._memoria.invalidar(chave)
+        if self._disco is None: return
+        with self._lock:
+            try: self._disco.execute("DELETE FROM resposta_gemini WHERE chave = ?", (chave,)); self._disco.commit()
+            except sqlite3.Error as e: self._falha_disco('descartar', e)
+
+    def _falha_disco(self, operacao, erro):
+        # Chamado com self._lock: desfaz o que ficou pela metade na transação e segue sem o disco nesta operação
+        try: self._disco.rollback()
+        except sqlite3.Error: pass
+        self.erros_disco += 1
+        logger.warning("falha no cache do Gemini em disco", extra={"operacao": operacao, "erro": f"{type(erro).__name__}: {erro}"})
+
+    def _contar(self, tipo, campo, item):
+        with self._lock:
+            c = self._por_campo.setdefault(f"{tipo}:{campo}", {"hits": 0, "misses": 0, "segundos_economizados": 0.0})
+            if item: c["hits"] += 1; c["segundos_economizados"] += item[1]
+            else: c["misses"] += 1
+
+    def estatisticas(self):
+        with self._lock:
+            por_campo = {k: {**c, "hit_rate": round(c["hits"] / (c["hits"] + c["misses"]), 4) if c["hits"] + c["misses"] else 0.0,
+                             "segundos_economizados": round(c["segundos_economizados"], 3)} for k, c in sorted(self._por_campo.items())}
+        return {"memoria": self._memoria.estatisticas(), "persistente": self._disco is not None, "erros_disco": self.erros_disco, "por_campo": por_campo}
@@ -0,0 +1,60 @@
+# backend/cache_lru.py
+# Cache LRU em memória, com TTL opcional e contadores (hits/misses/evictions), seguro entre threads.
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Cada item pode levar um "carimbo" de versão: um get() com carimbo diferente do salvo
+    conta como invalidação e devolve None, sem precisar varrer o cache quando algo muda."""
+
+    def __init__(self, max_itens, ttl_segundos=None, relogio=time.monotonic):
+        self.max_itens = max_itens; self.ttl_segundos = ttl_segundos; self._relogio = relogio
+        self._itens = OrderedDict(); self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expiracoes = self.invalidacoes = 0
+
+    def get(self, chave, carimbo=None):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None: self.misses += 1; return None
+            valor, carimbo_salvo, expira_em = item
+            if expira_em is not None and self._relogio() >= expira_em:
+                del self._itens[chave]; self.expiracoes += 1; self.misses += 1; return None
+            if carimbo is not None and carimbo != carimbo_salvo:
+                del self._itens[chave]; self.invalidacoes += 1; self.misses += 1; return None
+            self._itens.move_to_end(chave); self.hits += 1
+            return valor
+
+    def peek(self, chave):
+        """Valor ainda válido (sem olhar carimbo), sem contar hit/miss nem mexer na ordem do LRU: para consultas
+        internas que não devem distorcer as estatísticas de quem usa o cache."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or (item[2] is not None and self._relogio() >= item[2]): return None
+            return item[0]
+
+    def set(self, chave, valor, carimbo=None):
+        expira_em = self._relogio() + self.ttl_segundos if self.ttl_segundos else None
+        with self._lock:
+            self._itens[chave] = (valor, carimbo, expira_em); self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False); self.evictions += 1
+
+    def invalidar(self, chave):
+        with self._lock:
+            if self._itens.pop(chave, None) is None: return False
+            self.invalidacoes += 1; return True
+
+    def limpar(self):
+        with self._lock: self._itens.clear()
+
+    def __len__(self): return len(self._itens)
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {"itens": len(self._itens), "max_itens": self.max_itens, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0, "evictions": self.evictions,
+                    "expiracoes": self.expiracoes, "invalidacoes": self.invalidacoes}
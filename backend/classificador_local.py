@@ -0,0 +1,128 @@
+# backend/classificador_local.py
+# Classificação local (sem rede) das respostas dos campos com categorias fixas do chatbot.
+# Roda antes do Gemini: "iniciante", "homem", "competitivo"... caem direto na categoria;
+# só respostas ambíguas ou elaboradas seguem para o modelo.
+
+import difflib
+import re
+import threading
+import unicodedata
+
+# Sinônimos e gírias comuns -> categoria (as próprias categorias e as chaves dos mapas do
+# matchmaking já entram automaticamente). Só entram frases que não deixam dúvida: palavras soltas que
+# também são muleta ou uso comum ('cara', 'mina', 'bom' de "bom dia", 'pro' de "para o", 'rir') ficam de fora,
+# porque uma frase contida na resposta basta para classificar.
+SINONIMOS_PADRAO = {
+    'nivel_de_habilidade': {
+        'Iniciante': ['noob', 'novato', 'novata', 'comecando', 'to comecando', 'sou iniciante', 'bem iniciante', 'newbie'],
+        'Intermediário': ['intermediario', 'medio', 'mais ou menos', 'razoavel'],
+        'Avançado': ['avancado', 'avancada', 'experiente', 'manjo'],
+        'Competitivo/Pro': ['sou pro', 'profissional', 'competitivo', 'jogo campeonato', 'lenda'],
+        'Sou tryhard': ['tryhard', 'try hard'],
+        'Casual': ['casualzao', 'so casual'],
+    },
+    'estilo_jogo': {
+        'Focado em Diversão/Casual': ['focado em diversao', 'diversao', 'casual', 'me divertir', 'pra divertir', 'de boa'],
+        'Competitivo/Subir de Ranking': ['competitivo', 'competir', 'ranked', 'rankear', 'subir de rank', 'subir no ranking', 'ranqueada', 'rank'],
+        'Completar Missões/História': ['completar missoes', 'historia', 'missoes', 'campanha', 'zerar', 'zerar o jogo', 'lore'],
+        'Explorar Mundos': ['explorar', 'exploracao', 'mundo aberto'],
+        'Socializar com amigos': ['socializar', 'amigos', 'com os amigos', 'fazer amigos', 'galera'],
+        'Variado/Depende do humor': ['variado', 'depende', 'depende do humor', 'um pouco de tudo'],
+        'Tryhard': ['tryhard', 'try hard'],
+    },
+    'gender': {
+        'Mulher': ['feminino', 'menina', 'garota', 'sou mulher', 'mulher cis', 'mulher trans'],
+        'Homem': ['masculino', 'menino', 'garoto', 'sou homem', 'homem cis', 'homem trans'],
+        'Não-binário': ['nao binario', 'nao binarie', 'nb', 'enby'],
+        'Gênero fluido': ['fluido', 'genero fluido', 'genderfluid'],
+        'Agênero': ['agenero'],
+        'Prefiro não dizer': ['prefiro nao dizer', 'nao quero dizer', 'prefiro nao falar'],
+    },
+    'communication_style': {
+        'No silêncio (foco total)': ['silencio', 'no silencio', 'calado', 'quieto', 'mudo', 'sem call', 'foco total'],
+        'Só o necessário (calls estratégicas)': ['so o necessario', 'necessario', 'calls', 'so calls', 'estrategia', 'so call'],
+        'Conversa casual e social': ['conversa', 'conversar', 'bater papo', 'papo', 'social', 'trocar ideia'],
+        'Vale tudo (cantar, zoar, resenha!)': ['vale tudo', 'cantar zoar resenha', 'resenha', 'cantar', 'zoar', 'caos'],
+        'Depende do momento/jogo': ['depende', 'depende do jogo', 'depende do momento'],
+        'Com música e zoeira': ['musica', 'zoeira', 'com musica'],
+    },
+}
+
+
+def normalizar_resposta(texto):
+    """Minúsculas, sem acentos e sem pontuação: 'Não-binário!' -> 'nao binario'."""
+    sem_acentos = unicodedata.normalize('NFKD', str(texto).lower()).encode('ascii', 'ignore').decode()
+    return " ".join(re.sub(r'[^a-z0-9]+', ' ', sem_acentos).split())
+
+
+class ClassificadorLocal:
+    def __init__(self, categorias_por_campo, mapas_por_campo=None, sinonimos=SINONIMOS_PADRAO, confianca_minima=0.85, max_palavras=8):
+        """mapas_por_campo: {campo: {valor: código}} (ex.: MAPA_NIVEIS); chaves com o mesmo código
+        de uma categoria viram sinônimos dela."""
+        self.confianca_minima = confianca_minima; self.max_palavras = max_palavras
+        self._frases = {} # campo -> {frase normalizada: {categorias}}
+        for campo, categorias in categorias_por_campo.items():
+            frases = self._frases.setdefault(campo, {})
+            for categoria in categorias:
+                self._adicionar(frases, categoria, categoria)
+            for categoria, lista in sinonimos.get(campo, {}).items():
+                if categoria in categorias:
+                    for sinonimo in lista: self._adicionar(frases, sinonimo, categoria)
+            mapa = (mapas_por_campo or {}).get(campo, {})
+            codigo_da_categoria = {}
+            for categoria in categorias: codigo_da_categoria.setdefault(mapa.get(categoria.lower()), categoria)
+            ja_categorias = {categoria.lower() for categoria in categorias}
+            for chave, codigo in mapa.items():
+                if codigo and codigo in codigo_da_categoria and chave not in ja_categorias: self._adicionar(frases, chave, codigo_da_categoria[codigo])
+        self._lock = threading.Lock()
+        self.acertos_locais = {}; self.fallbacks_llm = {}
+
+    @staticmethod
+    def _adicionar(frases, frase, categoria):
+        normalizada = normalizar_resposta(frase)
+        if normalizada: frases.setdefault(normalizada, set()).add(categoria)
+
+    def campos(self):
+        return set(self._frases)
+
+    def classificar(self, texto, campo):
+        """(categoria, confiança) quando a resposta é inequívoca; None para deixar o Gemini decidir."""
+        frases = self._frases.get(campo)
+        if frases is None: return None
+        resultado = self._classificar(normalizar_resposta(texto), frases)
+        with self._lock:
+            contadores = self.acertos_locais if resultado else self.fallbacks_llm
+            contadores[campo] = contadores.get(campo, 0) + 1
+        return resultado
+
+    def _classificar(self, texto, frases):
+        palavras = texto.split()
+        if not palavras or len(palavras) > self.max_palavras: return None
+        if texto in frases: # igual a uma categoria/sinônimo
+            categorias = frases[texto]
+            return (next(iter(categorias)), 1.0) if len(categorias) == 1 else None
+        negacao = 'nao' in palavras or 'nem' in palavras
+        # Frases contidas na resposta como palavras inteiras ('depende' dentro de 'depende do humor' não conta);
+        # todas precisam apontar para a mesma categoria
+        contidas = [f for f in frases if ' ' + f + ' ' in ' ' + texto + ' ' and not (negacao and 'nao' not in f.split())]
+        maximas = [f for f in contidas if not any(f != g and ' ' + f + ' ' in ' ' + g + ' ' for g in contidas)]
+        if maximas:
+            categorias = set().union(*(frases[f] for f in maximas))
+            return (next(iter(categorias)), 0.9) if len(categorias) == 1 else None
+        if negacao: return None
+        # Erro de digitação ("iniciantee", "competitvo"): melhor palavra parecida, se for única
+        melhor, categorias_melhor = 0.0, set()
+        for palavra in palavras:
+            if len(palavra) < 4: continue
+            for frase, categorias in frases.items():
+                if ' ' in frase or len(frase) < 4: continue
+                razao = difflib.SequenceMatcher(None, palavra, frase).ratio()
+                if razao > melhor: melhor, categorias_melhor = razao, set(categorias)
+                elif razao == melhor: categorias_melhor |= categorias
+        if melhor >= self.confianca_minima and len(categorias_melhor) == 1: return next(iter(categorias_melhor)), round(melhor, 3)
+        return None
+
+    def estatisticas(self):
+        with self._lock:
+            campos = set(self.acertos_locais) | set(self.fallbacks_llm)
+            return {campo: {"acertos_locais": self.acertos_locais.get(campo, 0), "fallbacks_llm": self.fallbacks_llm.get(campo, 0)} for campo in sorted(campos)}
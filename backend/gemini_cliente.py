@@ -0,0 +1,134 @@
+# backend/gemini_cliente.py
+# Chamadas ao Gemini num pool de threads limitado, com timeout por chamada e limite de chamadas
+# simultâneas. A thread da requisição continua esperando a resposta, mas só até o timeout
+# (GEMINI_TIMEOUT_SEGUNDOS): estourou, ou todas as vagas estão ocupadas (inclusive por chamadas já
+# abandonadas, que seguem no pool até o upstream responder), quem chama recebe GeminiIndisponivel e
+# usa o fallback (BASE_QUESTION_IDEAS etc.). Um upstream lento limita quanto tempo e quantos workers
+# ficam presos; não os libera.
+
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+
+class GeminiIndisponivel(Exception):
+    """Timeout, limite de concorrência atingido ou erro do upstream."""
+
+
+class ClienteGemini:
+    def __init__(self, modelo=None, max_concorrencia=8, timeout_segundos=8.0, ao_medir=None):
+        self.modelo = modelo; self.timeout_segundos = timeout_segundos
+        self.ao_medir = ao_medir # ao_medir(rotulo, segundos, resultado): duração real de cada chamada ao upstream
+        self._executor = ThreadPoolExecutor(max_workers=max_concorrencia, thread_name_prefix='gemini')
+        # A vaga só é devolvida quando a chamada termina de fato (mesmo após o timeout de quem
+        # esperava), então chamadas presas no upstream continuam contando para o limite.
+        self._vagas = threading.BoundedSemaphore(max_concorrencia)
+        self._lock = threading.Lock()
+        self.chamadas = self.timeouts = self.rejeitadas = self.erros = 0
+
+    def disponivel(self):
+        return self.modelo is not None
+
+    def gerar(self, prompt, timeout=None, rotulo='gerar'):
+        """Texto da resposta do modelo, ou GeminiIndisponivel em até `timeout` segundos."""
+        if not self._vagas.acquire(blocking=False):
+            self._contar('rejeitadas'); raise GeminiIndisponivel("limite de chamadas simultâneas ao Gemini atingido")
+        try: future = self._executor.submit(self._chamar, prompt, rotulo)
+        except Exception: self._vagas.release(); raise
+        self._contar('chamadas')
+        try: return future.result(timeout=timeout if timeout is not None else self.timeout_segundos)
+        except FuturesTimeout: self._contar('timeouts'); raise GeminiIndisponivel("timeout na chamada ao Gemini")
+        except Exception as e: self._contar('erros'); raise GeminiIndisponivel(str(e)) from e
+
+    def _chamar(self, prompt, rotulo):
+        inicio = time.perf_counter(); resultado = 'erro'
+        try: texto = self.modelo.generate_content(prompt).text; resultado = 'ok'; return texto
+        finally: self._vagas.release(); self._medir(rotulo, inicio, resultado)
+
+    def _medir(self, rotulo, inicio, resultado):
+        if self.ao_medir is not None: self.ao_medir(rotulo, time.perf_counter() - inicio, resultado)
+
+    def gerar_em_partes(self, prompt, timeout=None, rotulo='gerar_em_partes'):
+        """Gerador com os pedaços de texto conforme o modelo os produz (generate_content(stream=True)).
+        `timeout` vale para a espera de cada pedaço; estourou, levanta GeminiIndisponivel no meio da iteração."""
+        if not self._vagas.acquire(blocking=False):
+            self._contar('rejeitadas'); raise GeminiIndisponivel("limite de chamadas simultâneas ao Gemini atingido")
+        partes = queue.Queue(); cancelado = threading.Event()
+        try: self._executor.submit(self._chamar_em_partes, prompt, partes, cancelado, rotulo)
+        except Exception: self._vagas.release(); raise
+        self._contar('chamadas')
+        return self._consumir_partes(partes, cancelado, timeout if timeout is not None else self.timeout_segundos)
+
+    def _chamar_em_partes(self, prompt, partes, cancelado, rotulo):
+        inicio = time.perf_counter(); resultado = 'ok'
+        try:
+            for pedaco in self.modelo.generate_content(prompt, stream=True):
+                if cancelado.is_set(): resultado = 'cancelada'; break # quem consumia desistiu (timeout ou cliente desconectou)
+                if pedaco.text: partes.put(('texto', pedaco.text))
+            partes.put(('fim', None))
+        except Exception as e: resultado = 'erro'; partes.put(('erro', e))
+        finally: self._vagas.release(); self._medir(rotulo, inicio, resultado)
+
+    def _consumir_partes(self, partes, cancelado, timeout):
+        try:
+            while True:
+                try: tipo, valor = partes.get(timeout=timeout)
+                except queue.Empty: self._contar('timeouts'); raise GeminiIndisponivel("timeout esperando o próximo pedaço do Gemini")
+                if tipo == 'fim': return
+                if tipo == 'erro': self._contar('erros'); raise GeminiIndisponivel(str(valor)) from valor
+                yield valor
+        finally: cancelado.set()
+
+    def _contar(self, contador):
+        with self._lock: setattr(self, contador, getattr(self, contador) + 1)
+
+    def estatisticas(self):
+        with self._lock:
+            return {"chamadas": self.chamadas, "timeouts": self.timeouts, "rejeitadas": self.rejeitadas, "erros": self.erros}
+
+
+# --- Modelo Falso (testes locais e benchmarks) ---
+class _RespostaFalsa:
+    def __init__(self, text): self.text = text
+
+class ModeloGeminiFalso:
+    """Imita GenerativeModel.generate_content com latência fixa e respostas determinísticas:
+    extração devolve a categoria citada no texto (ou o próprio texto); perguntas devolvem a "Ideia" do prompt."""
+
+    def __init__(self, latencia_segundos=0.0):
+        self.latencia_segundos = latencia_segundos; self.chamadas = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.chamadas += 1
+        if stream: return self._em_partes(self.responder(prompt))
+        if self.latencia_segundos: time.sleep(self.latencia_segundos)
+        return _RespostaFalsa(self.responder(prompt))
+
+    def _em_partes(self, texto):
+        # Mesma latência total, distribuída entre os pedaços (uma palavra por pedaço)
+        pedacos = re.findall(r'\S+\s*', texto) or [texto]
+        for pedaco in pedacos:
+            if self.latencia_segundos: time.sleep(self.latencia_segundos / len(pedacos))
+            yield _RespostaFalsa(pedaco)
+
+    def responder(self, prompt):
+        if '"valor_extraido"' in prompt: # turno combinado: extração + pergunta em JSON
+            return json.dumps({"valor_extraido": self._extrair(prompt) or "Não especificado", "proxima_pergunta": self._pergunta(prompt)}, ensure_ascii=False)
+        extraido = self._extrair(prompt)
+        return extraido if extraido is not None else self._pergunta(prompt)
+
+    def _extrair(self, prompt):
+        texto = re.search(r'Do texto: "(.*?)", extraia', prompt, re.S)
+        if not texto: return None
+        categorias = re.search(r"Categorias: \[(.*?)\]\.", prompt, re.S)
+        if not categorias: return texto.group(1).strip() or "Não especificado"
+        for categoria in re.findall(r"'([^']*)'", categorias.group(1)):
+            if categoria.lower() in texto.group(1).lower(): return categoria
+        return "Não especificado"
+
+    def _pergunta(self, prompt):
+        ideia = re.search(r'Ideia: "(.*?)"', prompt, re.S)
+        return ideia.group(1) if ideia else "Beleza! Me conta mais?"
@@ -0,0 +1,295 @@
+# backend/matchmaking.py
+# Score de compatibilidade entre perfis. Módulo puro (sem Flask/DB): app.py busca os dados
+# e as médias de avaliação; aqui só se calcula.
+
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+# --- Pesos e Mapas ---
+PESO_JOGO_PRINCIPAL_IGUAL = 10; PESO_NIVEL_HABILIDADE_COMPATIVEL = 3; PESO_ESTILO_JOGO_IGUAL = 3
+PESO_DISPONIBILIDADE_SIMILAR = 2; PESO_GENERO_COMPATIVEL = 1; PESO_COMUNICACAO_COMPATIVEL = 2
+PESO_AVALIACAO_MEDIA = 4; MAX_RATING_BOOST = PESO_AVALIACAO_MEDIA
+MAPA_NIVEIS = { "iniciante": 1, "casual": 2, "intermediário": 3, "avançado": 4, "competitivo/pro": 5, "novo": 1, "sou novo": 1, "ainda aprendendo": 1, "jogo por diversão": 2, "mediano":3, "comecei agora":1, "explorar": 0, "focado em diversão/casual": 0, "competitivo/subir de ranking": 0, "completar missões/história": 0, "socializar": 0, "não especificado": 0, "n/a": 0 }
+MAPA_COMUNICACAO = { 'no silêncio (foco total)': 1, 'só o necessário (calls estratégicas)': 2, 'conversa casual e social': 3, 'vale tudo (cantar, zoar, resenha!)': 4, 'depende do momento/jogo': 3, 'com música e zoeira':4, 'não especificado': 0, "n/a": 0 }
+GENEROS_NEUTROS = ["n/e","prefiro não dizer","n/a","não especificado"]
+
+# --- Normalização e Tokens de Disponibilidade ---
+STOPWORDS_DISPONIBILIDADE = frozenset({'de','a','o','e','para','com','em','no','na','durante','só','bem','as','os','todas','todos'})
+
+def _normalizar(valor):
+    return str(valor).lower().strip()
+
+@lru_cache(maxsize=65536)
+def tokenizar_disponibilidade(texto_normalizado):
+    """Palavras-chave da disponibilidade (sem stopwords, sem plural em 's'), internadas.
+    Em cache: o texto do viewer e os valores mais comuns ('à noite', 'fins de semana') são tokenizados uma vez só."""
+    return frozenset(sys.intern(w[:-1]if w.endswith('s')and len(w)>1 else w) for w in set(texto_normalizado.replace(","," ").replace("/"," ").split())-STOPWORDS_DISPONIBILIDADE)
+
+def tokens_disponibilidade_para_coluna(disponibilidade):
+    """Forma persistida em UserProfile.disponibilidade_tokens (tokens não têm espaço)."""
+    if disponibilidade is None: return None
+    return " ".join(sorted(tokenizar_disponibilidade(_normalizar(disponibilidade))))
+
+def tokens_disponibilidade_do_perfil(perfil):
+    """Usa os tokens já persistidos quando vierem no dict; senão tokeniza (com cache)."""
+    salvos = perfil.get('disponibilidade_tokens')
+    if salvos is not None: return frozenset(salvos.split())
+    return tokenizar_disponibilidade(_normalizar(perfil.get('disponibilidade')))
+
+# --- Score Escalar (um par de perfis) ---
+def calcular_score_nivel(n1,n2):n1n=str(n1).lower().strip();n2n=str(n2).lower().strip();v1=MAPA_NIVEIS.get(n1n,0);v2=MAPA_NIVEIS.get(n2n,0);d=abs(v1-v2);return PESO_NIVEL_HABILIDADE_COMPATIVEL if d==0 else(PESO_NIVEL_HABILIDADE_COMPATIVEL*0.6 if d==1 else 0)if v1!=0 and v2!=0 else 0
+def calcular_score_disponibilidade(d1,d2):d1l=_normalizar(d1);d2l=_normalizar(d2);return PESO_DISPONIBILIDADE_SIMILAR if d1l==d2l or not tokenizar_disponibilidade(d1l).isdisjoint(tokenizar_disponibilidade(d2l)) else 0
+def calcular_score_genero(g1_s,g2_s):g1=str(g1_s).lower().strip();g2=str(g2_s).lower().strip();return PESO_GENERO_COMPATIVEL*0.2 if g1 in GENEROS_NEUTROS or g2 in GENEROS_NEUTROS else(PESO_GENERO_COMPATIVEL if g1==g2 else 0)
+def calcular_score_estilo_comunicacao(c1_s,c2_s):c1n=str(c1_s).lower().strip();c2n=str(c2_s).lower().strip();v1=MAPA_COMUNICACAO.get(c1n,0);v2=MAPA_COMUNICACAO.get(c2n,0);d=abs(v1-v2);return PESO_COMUNICACAO_COMPATIVEL if d==0 else(PESO_COMUNICACAO_COMPATIVEL*0.5 if(v1>=3 and v2>=3)or(v1<=2 and v2<=2)else 0)if v1!=0 and v2!=0 else 0
+
+def pontuar_candidatos_referencia(vp_dict, outros_list, medias_avaliacao):
+    """Implementação candidato a candidato (a original). Serve de referência de paridade para o motor vetorizado."""
+    if not vp_dict or not outros_list: return []
+    kn,kg,kl,ke,kd,ki,kgen,kcom = 'nome_display','jogo_principal','nivel_de_habilidade','estilo_jogo','disponibilidade','user_id','gender','communication_style'
+    matches = []; nv = vp_dict.get(kn, "Viewer"); v_jg = str(vp_dict.get(kg, '')).lower().strip()
+    for pmp in outros_list:
+        if vp_dict.get(ki) == pmp.get(ki): continue
+        npm = pmp.get(kn, "Match"); p_uid = pmp.get(ki); st = 0.0; dr = [] # Score como float
+        p_jg = str(pmp.get(kg, '')).lower().strip()
+        if v_jg and p_jg and v_jg == p_jg: st += PESO_JOGO_PRINCIPAL_IGUAL; dr.append(f"Mesmo jogo ({p_jg})")
+        else: continue
+        sn=calcular_score_nivel(vp_dict.get(kl),pmp.get(kl));_=(st:=st+sn,dr.append("Nível compatível"))if sn>0 else 0
+        ev=str(vp_dict.get(ke,'')).lower().strip();ep=str(pmp.get(ke,'')).lower().strip();_=(st:=st+PESO_ESTILO_JOGO_IGUAL,dr.append("Mesmo estilo"))if ev and ep and ev==ep else 0
+        sd=calcular_score_disponibilidade(vp_dict.get(kd),pmp.get(kd));_=(st:=st+sd,dr.append("Disponibilidade similar"))if sd>0 else 0
+        sgen=calcular_score_genero(vp_dict.get(kgen,""),pmp.get(kgen,""));_=(st:=st+sgen,dr.append("Gênero"))if sgen>0 else 0 # Adicionado "" como default
+        scom=calcular_score_estilo_comunicacao(vp_dict.get(kcom,""),pmp.get(kcom,""));_=(st:=st+scom,dr.append("Comunicação compatível"))if scom>0 else 0
+        if p_uid:
+            avg_r = medias_avaliacao.get(p_uid)
+            if avg_r is not None and avg_r > 0: r_b = (float(avg_r)/5.0)*MAX_RATING_BOOST; st+=r_b; dr.append(f"Bem avaliado(⭐{avg_r:.1f},+{r_b:.1f})")
+        if st>0: matches.append({"user_id":p_uid,"nome":npm,"jogo":p_jg,"score":round(st,1),"razoes":", ".join(dr)if dr else "Compatibilidade!","initial":npm[0].upper()if npm and len(npm)>0 else "?"})
+    matches.sort(key=lambda x:x["score"],reverse=True); return matches
+
+# --- Motor Vetorizado ---
+# Os perfis são codificados uma vez em arrays inteiros (nível, comunicação, estilo, gênero,
+# disponibilidade) e um viewer é pontuado contra todos os candidatos com operações NumPy.
+# As somas seguem a mesma ordem do loop de referência, então scores e razões saem idênticos.
+# Com top_k em comunidades grandes, os candidatos são agrupados em baldes (jogo, nível, estilo,
+# comunicação, gênero): dentro de um balde só disponibilidade e avaliação variam, então cada balde tem
+# um teto de score. Os baldes são visitados do maior teto para o menor e a varredura para quando o
+# k-ésimo melhor score já passa o teto de todos os que faltam (branch-and-bound); o resultado é o mesmo.
+# Os baldes são montados uma vez por instância (custa algumas varreduras completas), então a poda compensa
+# quando a mesma instância pontua muitos viewers, como no pré-cálculo (recomendacoes.py).
+PODA_MINIMO_CANDIDATOS = 10_000 # abaixo disso pontuar tudo de uma vez sai mais barato; None desliga a poda
+
+class _Vocabulario:
+    """Interna strings normalizadas em códigos inteiros (0 = string vazia)."""
+    def __init__(self): self.codigos = {'': 0}
+    def codificar(self, valor): return self.codigos.setdefault(valor, len(self.codigos))
+    def buscar(self, valor): return self.codigos.get(valor, -1)
+
+class ColunasPerfis:
+    def __init__(self, perfis, poda_minimo=PODA_MINIMO_CANDIDATOS):
+        self.perfis = perfis; n = len(perfis); self.poda_minimo = poda_minimo
+        self._jogos, self._estilos, self._generos, self._disponibilidades = _Vocabulario(), _Vocabulario(), _Vocabulario(), _Vocabulario()
+        self.user_id = np.zeros(n, dtype=np.int64); self.jogo = np.zeros(n, dtype=np.int32)
+        self.nivel = np.zeros(n, dtype=np.int8); self.comunicacao = np.zeros(n, dtype=np.int8)
+        self.estilo = np.zeros(n, dtype=np.int32); self.genero = np.zeros(n, dtype=np.int32); self.genero_neutro = np.zeros(n, dtype=bool)
+        self.disponibilidade = np.zeros(n, dtype=np.int32); self.grupo_tokens = np.zeros(n, dtype=np.int32)
+        grupos = {}; postings = {} # conjunto de tokens de disponibilidade -> código; token -> grupos que o contêm
+        for i, p in enumerate(perfis):
+            self.user_id[i] = p.get('user_id') or 0
+            self.jogo[i] = self._jogos.codificar(_normalizar(p.get('jogo_principal', '')))
+            self.nivel[i] = MAPA_NIVEIS.get(_normalizar(p.get('nivel_de_habilidade')), 0)
+            self.comunicacao[i] = MAPA_COMUNICACAO.get(_normalizar(p.get('communication_style', "")), 0)
+            self.estilo[i] = self._estilos.codificar(_normalizar(p.get('estilo_jogo', '')))
+            g = _normalizar(p.get('gender', "")); self.genero[i] = self._generos.codificar(g); self.genero_neutro[i] = g in GENEROS_NEUTROS
+            d = _normalizar(p.get('disponibilidade')); self.disponibilidade[i] = self._disponibilidades.codificar(d)
+            tokens = tokens_disponibilidade_do_perfil(p); codigo = grupos.get(tokens)
+            if codigo is None:
+                codigo = grupos[tokens] = len(grupos)
+                for token in tokens: postings.setdefault(token, []).append(codigo)
+            self.grupo_tokens[i] = codigo
+        self.n_grupos_tokens = len(grupos)
+        self.grupos_por_token = {token: np.array(codigos, dtype=np.int64) for token, codigos in postings.items()}
+        self._baldes = None # índice dos baldes, montado no primeiro pontuar com poda
+        self._medias = (None, None) # (dict de médias da última chamada, arrays derivados dele)
+
+    def __len__(self): return len(self.perfis)
+
+    def pontuar(self, vp_dict, medias_avaliacao, top_k=None):
+        """Mesmo resultado de pontuar_candidatos_referencia(vp_dict, self.perfis, medias_avaliacao)[:top_k]."""
+        if not vp_dict or not self.perfis: return []
+        v_jg = _normalizar(vp_dict.get('jogo_principal', ''))
+        codigo_jogo = self._jogos.buscar(v_jg)
+        if not v_jg or codigo_jogo < 0: return []
+        uid_viewer = vp_dict.get('user_id') or 0
+        if top_k is not None and 0 < top_k and self.poda_minimo is not None and len(self.perfis) >= self.poda_minimo:
+            linhas, componentes, scores = self._pontuar_com_poda(vp_dict, codigo_jogo, uid_viewer, medias_avaliacao, top_k)
+        else:
+            linhas = np.flatnonzero((self.jogo == codigo_jogo) & (self.user_id != uid_viewer))
+            componentes, scores = self._pontuar_linhas(vp_dict, linhas, medias_avaliacao)
+        if len(linhas) == 0: return []
+        medias, boosts = componentes[-1]
+        ordem = _ordem_decrescente_estavel(scores, top_k)
+        sn, se, sd, sgen, scom = componentes[:-1]
+        matches = []
+        for j in ordem:
+            perfil = self.perfis[linhas[j]]; dr = [f"Mesmo jogo ({v_jg})"]
+            if sn[j] > 0: dr.append("Nível compatível")
+            if se[j] > 0: dr.append("Mesmo estilo")
+            if sd[j] > 0: dr.append("Disponibilidade similar")
+            if sgen[j] > 0: dr.append("Gênero")
+            if scom[j] > 0: dr.append("Comunicação compatível")
+            if boosts[j] > 0: avg_r = medias[j]; dr.append(f"Bem avaliado(⭐{avg_r:.1f},+{boosts[j]:.1f})")
+            npm = perfil.get('nome_display', "Match")
+            matches.append({"user_id":perfil.get('user_id'),"nome":npm,"jogo":v_jg,"score":float(scores[j]),"razoes":", ".join(dr),"initial":npm[0].upper()if npm and len(npm)>0 else "?"})
+        return matches
+
+    def _pontuar_linhas(self, vp_dict, linhas, medias_avaliacao):
+        componentes = self._componentes(vp_dict, linhas, medias_avaliacao)
+        st = np.full(len(linhas), 0.0) + PESO_JOGO_PRINCIPAL_IGUAL
+        for valores in componentes[:-1]: st = st + valores
+        st = st + componentes[-1][1]
+        return componentes, _arredondar_1_casa(st)
+
+    def _pontuar_com_poda(self, vp_dict, codigo_jogo, uid_viewer, medias_avaliacao, top_k):
+        """(linhas, componentes, scores) de um subconjunto da comunidade que com certeza contém o top_k.
+        As linhas saem em ordem crescente, então o desempate estável é o mesmo da varredura completa."""
+        representantes = self._indice_baldes()
+        sub_da_linha, ordem_linhas, inicios, tamanhos, existentes, teto_boost = self._sub_baldes(medias_avaliacao)
+        subs = existentes[self.jogo[representantes[existentes // 2]] == codigo_jogo]; baldes = subs // 2
+        sn, se, sgen, scom = self._componentes_fixos(vp_dict, representantes[baldes])
+        # Mesma ordem de soma do score, com disponibilidade e avaliação no máximo do sub-balde: round é monótono,
+        # então nenhum score arredondado do sub-balde passa o teto arredondado
+        tetos = _arredondar_1_casa(np.full(len(subs), 0.0) + PESO_JOGO_PRINCIPAL_IGUAL + sn + se + self._disponibilidade_maxima_por_balde(vp_dict)[baldes]
+                                   + sgen + scom + teto_boost[subs])
+        por_teto = np.argsort(-tetos, kind='stable'); subs, tetos = subs[por_teto], tetos[por_teto]
+        posicao_do_sub = np.full(len(tamanhos), len(subs)); posicao_do_sub[subs] = np.arange(len(subs))
+        def pontuar_sub_baldes(visitados):
+            if visitados <= 32: linhas = np.sort(np.concatenate([ordem_linhas[inicios[b]:inicios[b] + tamanhos[b]] for b in subs[:visitados]]))
+            else: linhas = np.flatnonzero(posicao_do_sub[sub_da_linha] < visitados) # muitos sub-baldes: uma passada vetorizada sai mais barato
+            linhas = linhas[self.user_id[linhas] != uid_viewer]
+            return (linhas, *self._pontuar_linhas(vp_dict, linhas, medias_avaliacao))
+        # Começa pelos sub-baldes de maior teto até juntar top_k candidatos (+1: o próprio viewer pode estar entre eles)
+        acumulado = np.cumsum(tamanhos[subs])
+        visitados = min(int(np.searchsorted(acumulado, top_k + 1)) + 1, len(subs))
+        while True:
+            linhas, componentes, scores = pontuar_sub_baldes(visitados)
+            if visitados == len(subs): return linhas, componentes, scores
+            if len(scores) < top_k: necessarios = len(subs)
+            else:
+                # O k-ésimo score só sobe com mais linhas: sub-baldes com teto abaixo dele nunca entram no top_k
+                # (no empate entrariam pelo desempate estável, por isso o teto igual ao k-ésimo ainda é visitado)
+                k_esimo = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+                necessarios = int(np.searchsorted(-tetos, -k_esimo, side='right'))
+                if necessarios <= visitados: return linhas, componentes, scores
+            # No máximo dobra as linhas por rodada: o k-ésimo costuma subir e cortar mais sub-baldes;
+            # como cada rodada repontua tudo, o custo total fica proporcional à última
+            visitados = min(necessarios, max(visitados + 1, int(np.searchsorted(acumulado, 2 * acumulado[visitados - 1])) + 1))
+
+    def _indice_baldes(self):
+        """Linha representante de cada balde; self.balde guarda o balde de cada linha."""
+        if self._baldes is None:
+            self.balde, representantes = _agrupar(self.jogo, self.nivel, self.estilo, self.comunicacao, self.genero); self._baldes = representantes
+            # Pares distintos (grupo de tokens, disponibilidade) de cada balde, para o teto da disponibilidade
+            _, pares = _agrupar(self.balde, self.grupo_tokens, self.disponibilidade)
+            self._pares_disponibilidade = (self.grupo_tokens[pares], self.disponibilidade[pares], np.searchsorted(self.balde[pares], np.arange(len(representantes))))
+        return self._baldes
+
+    def _disponibilidade_maxima_por_balde(self, vp_dict):
+        grupos, disponibilidades, inicios = self._pares_disponibilidade
+        ok = self._grupos_compativeis(vp_dict)[grupos] | (disponibilidades == self._disponibilidades.buscar(_normalizar(vp_dict.get('disponibilidade'))))
+        return np.where(np.maximum.reduceat(ok, inicios), float(PESO_DISPONIBILIDADE_SIMILAR), 0.0)
+
+    def _sub_baldes(self, medias_avaliacao):
+        """Cada balde dividido em linhas sem e com boost de avaliação (sub-balde 2*balde e 2*balde+1): a maioria
+        não tem avaliação, e o teto dela fica sem os pontos do boost. Linhas de cada sub-balde em
+        ordem_linhas[inicios[s]:inicios[s] + tamanhos[s]] (crescentes), sub-baldes não vazios em `existentes`."""
+        preparadas = self._medias_preparadas(medias_avaliacao)
+        if 'sub_baldes' not in preparadas:
+            n_baldes = len(self._indice_baldes())
+            _, boosts = self._boosts(np.arange(len(self.perfis)), medias_avaliacao)
+            sub_da_linha = self.balde.astype(np.int64) * 2 + (boosts > 0); ordem_linhas = np.argsort(sub_da_linha, kind='stable')
+            tamanhos = np.bincount(sub_da_linha, minlength=2 * n_baldes); inicios = np.concatenate(([0], np.cumsum(tamanhos)[:-1]))
+            existentes = np.flatnonzero(tamanhos); teto_boost = np.zeros(2 * n_baldes)
+            teto_boost[existentes] = np.maximum.reduceat(boosts[ordem_linhas], inicios[existentes])
+            preparadas['sub_baldes'] = (sub_da_linha, ordem_linhas, inicios, tamanhos, existentes, teto_boost)
+        return preparadas['sub_baldes']
+
+    def _medias_preparadas(self, medias_avaliacao):
+        """Arrays derivados do dict de médias, guardados enquanto o mesmo dict (sem alterações) for passado:
+        o pré-cálculo pontua todos os viewers de uma comunidade com as mesmas médias."""
+        if self._medias[0] is not medias_avaliacao:
+            preparadas = {}
+            if medias_avaliacao:
+                uids_avaliados = np.fromiter(medias_avaliacao.keys(), dtype=np.int64, count=len(medias_avaliacao))
+                valores = np.fromiter((float(v) for v in medias_avaliacao.values()), dtype=np.float64, count=len(medias_avaliacao))
+                ordem = np.argsort(uids_avaliados); preparadas['uids'], preparadas['valores'] = uids_avaliados[ordem], valores[ordem]
+            self._medias = (medias_avaliacao, preparadas)
+        return self._medias[1]
+
+    def _componentes_fixos(self, vp_dict, linhas):
+        """Nível, estilo, gênero e comunicação: só dependem da chave do balde."""
+        n1 = MAPA_NIVEIS.get(_normalizar(vp_dict.get('nivel_de_habilidade')), 0); n2 = self.nivel[linhas]
+        dn = np.abs(n2.astype(np.int16) - n1)
+        # Como no escalar: d==0 pontua mesmo com os dois níveis desconhecidos (0); só d==1 exige ambos conhecidos
+        sn = np.where(dn == 0, float(PESO_NIVEL_HABILIDADE_COMPATIVEL), np.where((dn == 1) & (n1 != 0) & (n2 != 0), PESO_NIVEL_HABILIDADE_COMPATIVEL*0.6, 0.0))
+        ev = _normalizar(vp_dict.get('estilo_jogo', '')); codigo_estilo = self._estilos.buscar(ev)
+        se = np.where(self.estilo[linhas] == codigo_estilo, float(PESO_ESTILO_JOGO_IGUAL), 0.0) if ev and codigo_estilo > 0 else np.zeros(len(linhas))
+        g1 = _normalizar(vp_dict.get('gender', ""))
+        if g1 in GENEROS_NEUTROS: sgen = np.full(len(linhas), PESO_GENERO_COMPATIVEL*0.2)
+        else: sgen = np.where(self.genero_neutro[linhas], PESO_GENERO_COMPATIVEL*0.2, np.where(self.genero[linhas] == self._generos.buscar(g1), float(PESO_GENERO_COMPATIVEL), 0.0))
+        c1 = MAPA_COMUNICACAO.get(_normalizar(vp_dict.get('communication_style', "")), 0); c2 = self.comunicacao[linhas]
+        dc = np.abs(c2.astype(np.int16) - c1); mesma_faixa = ((c1 >= 3) & (c2 >= 3)) | ((c1 <= 2) & (c2 <= 2))
+        scom = np.where(dc == 0, float(PESO_COMUNICACAO_COMPATIVEL), np.where(mesma_faixa & (c1 != 0) & (c2 != 0), PESO_COMUNICACAO_COMPATIVEL*0.5, 0.0))
+        return sn, se, sgen, scom
+
+    def _componentes(self, vp_dict, linhas, medias_avaliacao):
+        sn, se, sgen, scom = self._componentes_fixos(vp_dict, linhas)
+        d1 = _normalizar(vp_dict.get('disponibilidade'))
+        sd = np.where(self._grupos_compativeis(vp_dict)[self.grupo_tokens[linhas]] | (self.disponibilidade[linhas] == self._disponibilidades.buscar(d1)), float(PESO_DISPONIBILIDADE_SIMILAR), 0.0)
+        medias, boosts = self._boosts(linhas, medias_avaliacao)
+        return [sn, se, sd, sgen, scom, (medias, boosts)]
+
+    def _grupos_compativeis(self, vp_dict):
+        """Grupos de tokens de disponibilidade com algum token em comum com o viewer."""
+        grupo_ok = np.zeros(self.n_grupos_tokens, dtype=bool)
+        for token in tokens_disponibilidade_do_perfil(vp_dict):
+            if token in self.grupos_por_token: grupo_ok[self.grupos_por_token[token]] = True
+        return grupo_ok
+
+    def _boosts(self, linhas, medias_avaliacao):
+        medias = np.full(len(linhas), np.nan)
+        preparadas = self._medias_preparadas(medias_avaliacao)
+        if 'uids' in preparadas:
+            uids_avaliados, valores = preparadas['uids'], preparadas['valores']
+            uids = self.user_id[linhas]
+            pos = np.minimum(np.searchsorted(uids_avaliados, uids), len(uids_avaliados) - 1)
+            achou = (uids_avaliados[pos] == uids) & (uids != 0)
+            medias[achou] = valores[pos[achou]]
+        validas = medias > 0 # NaN (sem avaliação) também fica de fora
+        boosts = np.where(validas, (medias/5.0)*MAX_RATING_BOOST, 0.0)
+        return medias, boosts
+
+def _agrupar(*colunas):
+    """Código do grupo de cada linha (grupos em ordem crescente das colunas) e a primeira linha de cada grupo."""
+    ordem = np.lexsort(colunas[::-1]) # estável: a primeira linha de cada grupo é a de menor índice
+    novo = np.zeros(len(ordem), dtype=bool); novo[:1] = True
+    for coluna in colunas: ordenada = coluna[ordem]; novo[1:] |= ordenada[1:] != ordenada[:-1]
+    grupo = np.empty(len(ordem), dtype=np.int64); grupo[ordem] = np.cumsum(novo) - 1
+    return grupo, ordem[novo]
+
+def _arredondar_1_casa(valores):
+    """round(x, 1) do Python, elemento a elemento. np.round difere só em casos no limite
+    (x*10 a ~meio), que são recalculados com round()."""
+    arredondados = np.round(valores, 1)
+    x10 = valores * 10; limite = np.abs((x10 - np.floor(x10)) - 0.5) < 1e-6
+    for i in np.flatnonzero(limite): arredondados[i] = round(float(valores[i]), 1)
+    return arredondados
+
+def _ordem_decrescente_estavel(scores, top_k=None):
+    """Índices na ordem de sort(key=score, reverse=True) (estável). Com top_k, seleção parcial antes de ordenar."""
+    n = len(scores)
+    if top_k is not None and top_k < n:
+        if top_k <= 0: return np.array([], dtype=np.int64)
+        corte = np.partition(scores, n - top_k)[n - top_k]
+        candidatos = np.flatnonzero(scores >= corte)
+        return candidatos[np.argsort(-scores[candidatos], kind='stable')][:top_k]
+    return np.argsort(-scores, kind='stable')
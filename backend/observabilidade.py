@@ -0,0 +1,212 @@
+# backend/observabilidade.py
+# Métricas no formato texto do Prometheus (latência por rota, consultas SQL por requisição, chamadas
+# ao Gemini, fases do matcher), amostragem opcional com cProfile guardando as requisições mais lentas,
+# e logs estruturados (texto ou JSON, desligáveis) no lugar dos prints.
+
+import bisect
+import cProfile
+import heapq
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+logger = logging.getLogger('gg')
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = tuple(limites); self.contagens = [0] * (len(self.limites) + 1); self.soma = 0.0; self.total = 0
+
+    def observar(self, valor):
+        # bisect_left: valor igual ao limite entra no balde dele (le = "menor ou igual")
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1; self.soma += valor; self.total += 1
+
+
+def _rotulos_texto(rotulos, extra=()):
+    pares = list(rotulos) + list(extra)
+    if not pares: return ''
+    escapar = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escapar(v)}"' for k, v in pares) + '}'
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class RegistroMetricas:
+    """Histogramas e contadores com rótulos, guardados em memória por processo (cada worker expõe os seus)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {} # nome -> (ajuda, limites, {rótulos: Histograma})
+        self._contadores = {} # nome -> (ajuda, {rótulos: valor})
+        self._coletores = [] # funções chamadas na leitura: [(nome, tipo, ajuda, [(rótulos dict, valor)])]
+
+    def histograma(self, nome, ajuda, limites=LIMITES_SEGUNDOS):
+        with self._lock: self._histogramas.setdefault(nome, (ajuda, tuple(limites), {}))
+
+    def contador(self, nome, ajuda):
+        with self._lock: self._contadores.setdefault(nome, (ajuda, {}))
+
+    def registrar_coletor(self, coletor):
+        self._coletores.append(coletor)
+
+    def observar(self, nome, valor, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            _, limites, series = self._histogramas.setdefault(nome, ('', LIMITES_SEGUNDOS, {}))
+            serie = series.get(chave)
+            if serie is None: serie = series[chave] = Histograma(limites)
+            serie.observar(valor)
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            _, series = self._contadores.setdefault(nome, ('', {}))
+            series[chave] = series.get(chave, 0) + valor
+
+    @contextmanager
+    def cronometrar(self, nome, **rotulos):
+        inicio = time.perf_counter()
+        try: yield
+        finally: self.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+    def resumo(self, nome):
+        """{rótulos: (total, soma)} de um histograma; usado em testes manuais e benchmarks."""
+        with self._lock:
+            _, _, series = self._histogramas.get(nome, ('', (), {}))
+            return {chave: (h.total, h.soma) for chave, h in series.items()}
+
+    def texto_prometheus(self):
+        linhas = []
+        with self._lock:
+            for nome, (ajuda, limites, series) in sorted(self._histogramas.items()):
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} histogram"]
+                for chave, h in sorted(series.items()):
+                    acumulado = 0
+                    for limite, contagem in zip(limites + (float('inf'),), h.contagens):
+                        acumulado += contagem; le = '+Inf' if limite == float('inf') else _numero(limite)
+                        linhas.append(f"{nome}_bucket{_rotulos_texto(chave, [('le', le)])} {acumulado}")
+                    linhas += [f"{nome}_sum{_rotulos_texto(chave)} {_numero(h.soma)}", f"{nome}_count{_rotulos_texto(chave)} {h.total}"]
+            for nome, (ajuda, series) in sorted(self._contadores.items()):
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+                linhas += [f"{nome}{_rotulos_texto(chave)} {_numero(valor)}" for chave, valor in sorted(series.items())]
+        for coletor in self._coletores:
+            for nome, tipo, ajuda, amostras in coletor():
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+                linhas += [f"{nome}{_rotulos_texto(sorted(rotulos.items()))} {_numero(valor)}" for rotulos, valor in amostras]
+        return "\n".join(linhas) + "\n"
+
+
+class AmostradorPerfis:
+    """Roda cProfile numa fração (`taxa`) das requisições e guarda em `pasta` os .prof das `manter` mais lentas
+    (python -m pstats <arquivo>). Um perfil por vez no processo: requisições simultâneas não são amostradas."""
+
+    def __init__(self, taxa=0.0, pasta='perfis', manter=20):
+        self.taxa = taxa; self.pasta = pasta; self.manter = manter
+        self._ativo = threading.Lock(); self._lock = threading.Lock()
+        self._mais_lentas = [] # heap (duração, arquivo)
+
+    def iniciar(self):
+        if self.taxa <= 0 or random.random() >= self.taxa or not self._ativo.acquire(blocking=False): return None
+        perfil = cProfile.Profile()
+        try: perfil.enable()
+        except ValueError: self._ativo.release(); return None # outro profiler ativo (ex.: depurador)
+        return perfil
+
+    def finalizar(self, perfil, rota, duracao):
+        perfil.disable(); self._ativo.release()
+        with self._lock:
+            if len(self._mais_lentas) >= self.manter and duracao <= self._mais_lentas[0][0]: return None
+            os.makedirs(self.pasta, exist_ok=True)
+            nome = re.sub(r'[^A-Za-z0-9]+', '_', rota).strip('_') or 'raiz'
+            arquivo = os.path.join(self.pasta, f"{time.strftime('%Y%m%d-%H%M%S')}-{nome}-{duracao * 1000:.0f}ms.prof")
+            perfil.dump_stats(arquivo); heapq.heappush(self._mais_lentas, (duracao, arquivo))
+            if len(self._mais_lentas) > self.manter:
+                _, descartado = heapq.heappop(self._mais_lentas)
+                try: os.remove(descartado)
+                except OSError: pass
+        logger.info("perfil salvo", extra={"rota": rota, "duracao_ms": round(duracao * 1000, 1), "arquivo": arquivo})
+        return arquivo
+
+
+def instalar_instrumentacao(app, engine, metricas, amostrador=None):
+    """Latência por rota (rota do Flask, não o caminho, para não explodir os rótulos), consultas e tempo de SQL
+    por requisição (eventos do engine) e amostragem de perfis. Respostas em streaming (SSE) medem até o
+    começo do stream; o WebSocket mede a conexão inteira."""
+    metricas.histograma('gg_http_duracao_segundos', "Latência das requisições por rota")
+    metricas.histograma('gg_http_consultas_sql', "Consultas SQL por requisição", LIMITES_CONSULTAS)
+    metricas.histograma('gg_http_sql_segundos', "Tempo em SQL por requisição")
+    metricas.histograma('gg_sql_duracao_segundos', "Duração de cada comando SQL")
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('gg_inicio_sql', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get('gg_inicio_sql')
+        if not inicios: return
+        duracao = time.perf_counter() - inicios.pop(); metricas.observar('gg_sql_duracao_segundos', duracao)
+        if has_request_context() and 'gg_inicio' in g: g.gg_consultas += 1; g.gg_sql_segundos += duracao
+
+    @app.before_request
+    def _inicio_requisicao():
+        g.gg_inicio = time.perf_counter(); g.gg_consultas = 0; g.gg_sql_segundos = 0.0
+        g.gg_perfil = amostrador.iniciar() if amostrador is not None else None
+
+    @app.after_request
+    def _status_requisicao(resposta):
+        g.gg_status = resposta.status_code; return resposta
+
+    @app.teardown_request
+    def _fim_requisicao(erro=None):
+        # teardown roda mesmo com exceção: o profiler nunca fica ligado
+        if 'gg_inicio' not in g: return
+        duracao = time.perf_counter() - g.gg_inicio
+        rota = request.url_rule.rule if request.url_rule is not None else 'sem_rota'
+        status = g.get('gg_status', 500 if erro is not None else 200)
+        metricas.observar('gg_http_duracao_segundos', duracao, metodo=request.method, rota=rota, status=status)
+        metricas.observar('gg_http_consultas_sql', g.gg_consultas, rota=rota)
+        metricas.observar('gg_http_sql_segundos', g.gg_sql_segundos, rota=rota)
+        if g.get('gg_perfil') is not None: amostrador.finalizar(g.gg_perfil, rota, duracao)
+        logger.debug("requisição", extra={"metodo": request.method, "rota": rota, "status": status, "duracao_ms": round(duracao * 1000, 2),
+                                          "consultas_sql": g.gg_consultas, "sql_ms": round(g.gg_sql_segundos * 1000, 2)})
+
+
+# --- Logs ---
+_CAMPOS_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+def _extras(registro):
+    return {k: v for k, v in vars(registro).items() if k not in _CAMPOS_PADRAO}
+
+class FormatadorJSON(logging.Formatter):
+    def format(self, registro):
+        dados = {"ts": self.formatTime(registro), "nivel": registro.levelname, "logger": registro.name, "msg": registro.getMessage(), **_extras(registro)}
+        if registro.exc_info: dados["exc"] = self.formatException(registro.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+class FormatadorTexto(logging.Formatter):
+    def __init__(self): super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    def format(self, registro):
+        texto = super().format(registro); extras = _extras(registro)
+        return texto + ''.join(f" {k}={v}" for k, v in extras.items()) if extras else texto
+
+def configurar_logs(nivel='INFO', formato='texto'):
+    """Logger 'gg' com LOG_LEVEL (DEBUG mostra cada requisição; OFF desliga tudo) e LOG_FORMATO (texto ou json)."""
+    logger.handlers.clear(); logger.propagate = False
+    if str(nivel).upper() == 'OFF': logger.disabled = True; return logger
+    logger.disabled = False; logger.setLevel(str(nivel).upper())
+    saida = logging.StreamHandler(); saida.setFormatter(FormatadorJSON() if formato == 'json' else FormatadorTexto())
+    logger.addHandler(saida)
+    return logger
@@ -0,0 +1,187 @@
+# backend/pubsub.py
+# Publica/assina eventos (match novo, mensagem nova) por canal, para empurrar aos WebSockets conectados.
+# PubSubLocal entrega dentro do próprio processo. Com vários workers, PubSubBroker liga cada processo
+# a um broker local (multiprocessing.connection) que repassa cada publicação aos processos assinantes.
+
+import queue
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from observabilidade import logger
+
+
+class Assinatura:
+    """Fila de eventos de um canal para um assinante (ex.: uma aba com WebSocket aberto)."""
+
+    def __init__(self, pubsub, canal, max_pendentes):
+        self.canal = canal; self._pubsub = pubsub; self._fila = queue.Queue(max_pendentes); self.descartados = 0
+
+    def entregar(self, evento):
+        try: self._fila.put_nowait(evento)
+        except queue.Full: self.descartados += 1 # cliente lento: descarta em vez de acumular memória
+
+    def obter(self, timeout=None):
+        """Próximo evento, ou None se nada chegou em `timeout` segundos."""
+        try: return self._fila.get(timeout=timeout)
+        except queue.Empty: return None
+
+    def cancelar(self):
+        self._pubsub.cancelar(self)
+
+
+class PubSubLocal:
+    def __init__(self, max_pendentes=100):
+        self.max_pendentes = max_pendentes
+        self._assinaturas = {} # canal -> {Assinatura}
+        self._lock = threading.Lock(); self.publicados = self.entregues = 0
+
+    def assinar(self, canal):
+        assinatura = Assinatura(self, canal, self.max_pendentes)
+        with self._lock: self._assinaturas.setdefault(canal, set()).add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            assinantes = self._assinaturas.get(assinatura.canal)
+            if assinantes is None: return
+            assinantes.discard(assinatura)
+            if not assinantes: del self._assinaturas[assinatura.canal]
+
+    def publicar(self, canal, evento):
+        self.publicados += 1; self._entregar(canal, evento)
+
+    def _entregar(self, canal, evento):
+        with self._lock: assinantes = list(self._assinaturas.get(canal, ()))
+        for assinatura in assinantes: assinatura.entregar(evento)
+        self.entregues += len(assinantes)
+
+    def estatisticas(self):
+        with self._lock: canais = len(self._assinaturas); assinaturas = sum(len(a) for a in self._assinaturas.values())
+        return {"tipo": "local", "canais": canais, "assinaturas": assinaturas, "publicados": self.publicados, "entregues": self.entregues}
+
+
+# --- Broker entre processos ---
+# Protocolo (objetos via Connection.send/recv): ('sub', canal), ('unsub', canal), ('pub', canal, evento).
+# O broker só envia ('pub', canal, evento) de volta, para as conexões que assinaram o canal.
+# Connection usa pickle: o broker escuta só em endereço local e exige a authkey compartilhada pelos workers.
+
+def servir_broker(endereco, authkey, pronto=None):
+    """Roda o broker até o processo ser encerrado (flask --app app broker-pubsub)."""
+    assinantes = {}; lock = threading.Lock()
+    envio = {} # conn -> Lock: várias threads podem repassar para a mesma conexão
+    def atender(conn):
+        with lock: envio[conn] = threading.Lock()
+        canais = set()
+        try:
+            while True:
+                mensagem = conn.recv()
+                if mensagem[0] == 'sub':
+                    with lock: assinantes.setdefault(mensagem[1], set()).add(conn)
+                    canais.add(mensagem[1])
+                elif mensagem[0] == 'unsub':
+                    with lock: assinantes.get(mensagem[1], set()).discard(conn)
+                    canais.discard(mensagem[1])
+                elif mensagem[0] == 'pub':
+                    with lock: destinos = [(destino, envio[destino]) for destino in assinantes.get(mensagem[1], ())]
+                    for destino, trava in destinos:
+                        try:
+                            with trava: destino.send(mensagem)
+                        except OSError: pass # a thread dessa conexão limpa quando o recv falhar
+        except (EOFError, OSError): pass
+        finally:
+            with lock:
+                for canal in canais:
+                    assinantes.get(canal, set()).discard(conn)
+                    if not assinantes.get(canal): assinantes.pop(canal, None)
+                envio.pop(conn, None)
+            conn.close()
+    with Listener(endereco, authkey=authkey) as listener:
+        if pronto is not None: pronto.set()
+        while True:
+            try: conn = listener.accept()
+            except (AuthenticationError, OSError): continue # cliente sem a authkey certa
+            threading.Thread(target=atender, args=(conn,), daemon=True).start()
+
+
+class PubSubBroker(PubSubLocal):
+    """Mesma interface do PubSubLocal; publicações passam pelo broker e voltam para todos os processos assinantes.
+    Se a conexão cair (broker reiniciado), reconecta com backoff e reassina os canais com assinantes locais;
+    o que for publicado enquanto isso se perde (o cliente vê no próximo GET)."""
+
+    def __init__(self, endereco, authkey, max_pendentes=100, espera_min=0.1, espera_max=30.0):
+        super().__init__(max_pendentes)
+        self._endereco = endereco; self._authkey = authkey; self.espera_min = espera_min; self.espera_max = espera_max
+        self._envio = threading.Lock()
+        self._controle = threading.Lock() # 'sub'/'unsub' na mesma ordem das mudanças locais
+        self._conn = None; self.reconexoes = self.falhas_envio = 0
+        try: self._conn = Client(endereco, authkey=authkey)
+        except (AuthenticationError, OSError) as e: logger.warning("broker pub/sub indisponível; tentando reconectar", extra={"erro": str(e)})
+        threading.Thread(target=self._receber, daemon=True, name='pubsub-broker').start()
+
+    def _enviar(self, mensagem):
+        with self._envio:
+            conn = self._conn
+            if conn is None: raise OSError("sem conexão com o broker pub/sub")
+            try: conn.send(mensagem)
+            except OSError: self.falhas_envio += 1; conn.close(); raise # o recv da thread falha e ela reconecta
+
+    def assinar(self, canal):
+        with self._controle:
+            primeira = canal not in self._assinaturas
+            assinatura = super().assinar(canal)
+            if primeira: # o broker só precisa saber uma vez por processo
+                try: self._enviar(('sub', canal))
+                except OSError: pass # desconectado: a reconexão reassina todos os canais locais
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._controle:
+            super().cancelar(assinatura)
+            if assinatura.canal not in self._assinaturas:
+                try: self._enviar(('unsub', assinatura.canal))
+                except OSError: pass # a conexão nova só assina os canais que ainda têm assinantes
+
+    def publicar(self, canal, evento):
+        self.publicados += 1; self._enviar(('pub', canal, evento))
+
+    def _reconectar(self):
+        espera = self.espera_min
+        while True:
+            time.sleep(espera)
+            try: conn = Client(self._endereco, authkey=self._authkey)
+            except (AuthenticationError, OSError) as e:
+                logger.debug("reconexão ao broker pub/sub falhou", extra={"erro": str(e), "espera_segundos": espera})
+                espera = min(espera * 2, self.espera_max); continue
+            with self._controle:
+                try:
+                    for canal in list(self._assinaturas): conn.send(('sub', canal))
+                except OSError: conn.close(); continue
+                with self._envio: self._conn = conn
+            self.reconexoes += 1; logger.info("reconectado ao broker pub/sub", extra={"canais": len(self._assinaturas)})
+            return conn
+
+    def _receber(self):
+        conn = self._conn
+        while True:
+            if conn is None: conn = self._reconectar()
+            try:
+                while True:
+                    _, canal, evento = conn.recv(); self._entregar(canal, evento)
+            except (EOFError, OSError):
+                with self._envio:
+                    if self._conn is conn: self._conn = None
+                conn.close(); conn = None
+                logger.warning("conexão com o broker pub/sub perdida; reconectando")
+
+    def estatisticas(self):
+        return {**super().estatisticas(), "tipo": "broker", "conectado": self._conn is not None, "reconexoes": self.reconexoes, "falhas_envio": self.falhas_envio}
+
+
+def endereco_broker(texto):
+    host, _, porta = texto.rpartition(':')
+    return (host or '127.0.0.1', int(porta))
+
+def criar_pubsub(endereco=None, authkey=b'', max_pendentes=100):
+    return PubSubBroker(endereco_broker(endereco), authkey, max_pendentes) if endereco else PubSubLocal(max_pendentes)
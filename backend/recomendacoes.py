@@ -0,0 +1,49 @@
+# backend/recomendacoes.py
+# Pré-cálculo dos decks de matches fora da requisição (flask --app app recomendar).
+# Cada comunidade (jogo normalizado) é ranqueada num processo do pool, em fatias de viewers quando é grande,
+# com o mesmo ColunasPerfis.pontuar do /api/get_match; o app grava o top-K de cada viewer na tabela Recommendation.
+# Só comunidades cuja assinatura mudou desde a última rodada são recalculadas.
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from matchmaking import ColunasPerfis
+
+
+def ranquear_comunidade(tarefa):
+    """(jogo, perfis, medias_avaliacao, top_k, inicio, fim) -> (jogo, [(viewer_id, matches)]) para os viewers
+    perfis[inicio:fim]. Só CPU, sem banco: roda em outro processo. As colunas da comunidade são montadas uma
+    vez e servem a todos os viewers da tarefa (pontuar já exclui o próprio viewer)."""
+    jogo, perfis, medias_avaliacao, top_k, inicio, fim = tarefa
+    colunas = ColunasPerfis(perfis)
+    return jogo, [(perfil['user_id'], colunas.pontuar(perfil, medias_avaliacao, top_k=top_k)) for perfil in perfis[inicio:fim]]
+
+def dividir_em_tarefas(comunidades, top_k, viewers_por_tarefa=2000):
+    """comunidades: [(jogo, perfis, medias_avaliacao)]. Comunidades grandes viram várias tarefas (fatias de
+    viewers) para o pool não esperar uma só; as tarefas de um jogo ficam juntas, das maiores comunidades
+    para as menores. Devolve (tarefas, {jogo: quantidade de tarefas})."""
+    tarefas = []; por_jogo = {}
+    for jogo, perfis, medias_avaliacao in sorted(comunidades, key=lambda c: len(c[1]), reverse=True):
+        fatias = range(0, len(perfis), viewers_por_tarefa) if perfis else [0]
+        for inicio in fatias: tarefas.append((jogo, perfis, medias_avaliacao, top_k, inicio, inicio + viewers_por_tarefa))
+        por_jogo[jogo] = len(fatias)
+    return tarefas, por_jogo
+
+
+def assinatura_comunidade(perfis, avaliacoes):
+    """Resumo do que muda o ranking de uma comunidade: perfis completos (quantidade, ids, última edição)
+    e avaliações recebidas no jogo (quantidade, soma, última atualização)."""
+    return "p{}:{}:{}|r{}:{}:{}".format(*(perfis or (0, 0, None)), *(avaliacoes or (0, 0, None)))
+
+
+def ranquear_em_pool(tarefas, processos):
+    """Resultados de ranquear_comunidade, na ordem das tarefas.
+    Com um processo (ou uma tarefa só) roda aqui mesmo, sem o custo de subir o pool."""
+    if processos <= 1 or len(tarefas) <= 1:
+        for tarefa in tarefas: yield ranquear_comunidade(tarefa)
+        return
+    # spawn: processos novos, sem herdar threads nem conexões abertas do app. As tarefas só precisam deste módulo e do
+    # matchmaking; o script de entrada também é importado (__mp_main__), mas pelo flask --app app recomendar é o
+    # launcher do flask, que não carrega o app fora do comando.
+    with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield from pool.map(ranquear_comunidade, tarefas, chunksize=1)
@@ -0,0 +1,102 @@
+# backend/senhas.py
+# Hash e verificação de senhas fora da thread da requisição. O KDF (scrypt/pbkdf2 do werkzeug) é caro de
+# propósito; num pico de logins (ex.: todo mundo reconectando depois de um deploy) ele prenderia os workers.
+# Aqui ele roda num pool de processos limitado, com uma fila máxima: passou dela, quem chama recebe
+# SenhasOcupadas na hora (o login responde 503) em vez de esperar atrás de centenas de hashes.
+# Os parâmetros do hash são configuráveis; um hash antigo é refeito com os atuais no próximo login que acertar a senha.
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+METODO_PADRAO = 'scrypt:32768:8:1' # o padrão do werkzeug, na forma completa
+
+
+class SenhasOcupadas(Exception):
+    """Fila de hashes cheia ou timeout esperando o pool."""
+
+
+def normalizar_metodo(metodo):
+    """Forma completa do método, como o werkzeug grava no começo do hash ('scrypt' -> 'scrypt:32768:8:1'),
+    para comparar com o hash salvo e decidir se ele precisa ser refeito."""
+    nome, *args = metodo.split(':')
+    if nome == 'scrypt':
+        n, r, p = map(int, args) if args else (2**15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if nome == 'pbkdf2':
+        if len(args) > 2: raise ValueError("'pbkdf2' aceita no máximo 2 argumentos.")
+        return f"pbkdf2:{args[0] if args else 'sha256'}:{int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS}"
+    raise ValueError(f"Método de hash inválido: '{metodo}'.")
+
+def metodo_do_hash(hash_senha):
+    return hash_senha.split('$', 1)[0]
+
+
+# Rodam nos processos do pool: só CPU, não usam o app nem o banco
+def gerar_hash(senha, metodo):
+    return generate_password_hash(senha, metodo)
+
+def verificar_e_atualizar(hash_senha, senha, metodo):
+    """(a senha confere?, hash novo se o salvo usa outros parâmetros). O rehash só acontece com a senha certa,
+    que é o único momento em que temos a senha em claro."""
+    if not check_password_hash(hash_senha, senha): return False, None
+    return True, generate_password_hash(senha, metodo) if metodo_do_hash(hash_senha) != metodo else None
+
+
+class ServicoSenhas:
+    """`processos` = 0 calcula na própria thread (sem pool), ainda respeitando o limite de pendentes."""
+
+    def __init__(self, metodo=METODO_PADRAO, processos=1, fila_max=4, timeout_segundos=10.0):
+        self.metodo = normalizar_metodo(metodo); self.processos = processos; self.timeout_segundos = timeout_segundos
+        # Uma vaga por hash em andamento ou na fila; só volta quando o hash termina de fato (mesmo após o
+        # timeout de quem esperava), então a fila real nunca passa do limite.
+        self._vagas = threading.BoundedSemaphore(max(processos, 1) + fila_max)
+        self._executor = None; self._lock = threading.Lock()
+        self.hashes = self.verificacoes = self.rehashes = self.rejeitadas = self.timeouts = 0
+
+    def _pool(self):
+        with self._lock:
+            # spawn: processos novos, sem herdar threads nem conexões abertas do app. Cada processo ainda importa o
+            # script de entrada como __mp_main__: com flask/gunicorn é só o launcher, mas com `python app.py` é o app.py
+            # inteiro (uma vez por processo, quando o pool sobe). As tarefas em si só precisam deste módulo.
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processos, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _executar(self, funcao, *args):
+        if not self._vagas.acquire(blocking=False):
+            self._contar('rejeitadas'); raise SenhasOcupadas("fila de hashes de senha cheia")
+        if self.processos <= 0:
+            try: return funcao(*args)
+            finally: self._vagas.release()
+        try: future = self._pool().submit(funcao, *args)
+        except Exception: self._vagas.release(); raise
+        future.add_done_callback(lambda _: self._vagas.release())
+        try: return future.result(timeout=self.timeout_segundos)
+        except FuturesTimeout: self._contar('timeouts'); raise SenhasOcupadas("timeout esperando o hash da senha")
+        except BrokenProcessPool as e:
+            with self._lock: self._executor = None # um processo morreu: o próximo hash sobe um pool novo
+            raise SenhasOcupadas("pool de hashes reiniciado") from e
+
+    def gerar(self, senha):
+        self._contar('hashes'); return self._executar(gerar_hash, senha, self.metodo)
+
+    def verificar(self, hash_senha, senha):
+        """(ok, hash novo ou None). Levanta SenhasOcupadas se não houver vaga ou o pool demorar demais."""
+        self._contar('verificacoes'); ok, novo = self._executar(verificar_e_atualizar, hash_senha, senha, self.metodo)
+        if novo is not None: self._contar('rehashes')
+        return ok, novo
+
+    def encerrar(self):
+        with self._lock:
+            if self._executor is not None: self._executor.shutdown(wait=False, cancel_futures=True); self._executor = None
+
+    def _contar(self, contador):
+        with self._lock: setattr(self, contador, getattr(self, contador) + 1)
+
+    def estatisticas(self):
+        with self._lock:
+            return {"hashes": self.hashes, "verificacoes": self.verificacoes, "rehashes": self.rehashes, "rejeitadas": self.rejeitadas, "timeouts": self.timeouts}
@@ -0,0 +1,127 @@
+# backend/sessoes_chatbot.py
+# Onde fica o estado da conversa do chatbot entre um turno e outro.
+# ArmazemSessoesMemoria serve para um processo só; ArmazemSessoesSQLite é compartilhado entre
+# workers (gunicorn -w N) e sobrevive a reinícios. Os dois expiram sessões abandonadas (TTL) e
+# usam versão otimista: salvar() com uma versão velha levanta ConflitoSessao em vez de sobrescrever.
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Estado guardado com chaves curtas: {"i": índice da pergunta, "d": dados coletados, "u": última resposta}
+_CHAVES_CURTAS = {'current_question_idx': 'i', 'collected_data': 'd', 'last_user_response': 'u'}
+_CHAVES_LONGAS = {curta: longa for longa, curta in _CHAVES_CURTAS.items()}
+
+
+class ConflitoSessao(Exception):
+    """Outro turno da mesma sessão foi salvo depois que este estado foi lido."""
+
+
+def estado_inicial():
+    return {'current_question_idx': 0, 'collected_data': {}, 'last_user_response': None}
+
+def serializar_estado(estado):
+    return json.dumps({_CHAVES_CURTAS[k]: v for k, v in estado.items()}, ensure_ascii=False, separators=(',', ':'))
+
+def desserializar_estado(texto):
+    return {_CHAVES_LONGAS[k]: v for k, v in json.loads(texto).items()}
+
+
+class ArmazemSessoesMemoria:
+    def __init__(self, ttl_segundos=3600, max_sessoes=50000, relogio=time.monotonic):
+        self.ttl_segundos = ttl_segundos; self.max_sessoes = max_sessoes; self._relogio = relogio
+        self._sessoes = OrderedDict() # user_id -> (estado serializado, versão, expira_em)
+        self._lock = threading.Lock(); self.expiradas = self.conflitos = 0
+
+    def obter(self, user_id):
+        """(estado, versão); sessão inexistente ou expirada vira (None, 0)."""
+        with self._lock:
+            item = self._sessoes.get(user_id)
+            if item is None: return None, 0
+            if self._relogio() >= item[2]: del self._sessoes[user_id]; self.expiradas += 1; return None, 0
+            return desserializar_estado(item[0]), item[1]
+
+    def salvar(self, user_id, estado, versao_esperada):
+        """Grava se a versão atual ainda for `versao_esperada` (0 = sessão nova). Devolve a nova versão."""
+        agora = self._relogio()
+        with self._lock:
+            item = self._sessoes.get(user_id)
+            versao_atual = item[1] if item is not None and agora < item[2] else 0
+            if versao_atual != versao_esperada: self.conflitos += 1; raise ConflitoSessao(f"sessão U{user_id} mudou (v{versao_atual})")
+            self._sessoes[user_id] = (serializar_estado(estado), versao_atual + 1, agora + self.ttl_segundos)
+            self._sessoes.move_to_end(user_id)
+            if versao_atual == 0: self._varrer(agora)
+            while len(self._sessoes) > self.max_sessoes: self._sessoes.popitem(last=False)
+            return versao_atual + 1
+
+    def remover(self, user_id):
+        with self._lock: self._sessoes.pop(user_id, None)
+
+    def _varrer(self, agora):
+        # TTL fixo + move_to_end: a ordem do OrderedDict já é a de expiração, basta olhar o começo
+        while self._sessoes:
+            uid, item = next(iter(self._sessoes.items()))
+            if agora < item[2]: break
+            del self._sessoes[uid]; self.expiradas += 1
+
+    def limpar_expiradas(self):
+        with self._lock: antes = len(self._sessoes); self._varrer(self._relogio()); return antes - len(self._sessoes)
+
+    def estatisticas(self):
+        with self._lock: return {"tipo": "memoria", "sessoes": len(self._sessoes), "expiradas": self.expiradas, "conflitos": self.conflitos}
+
+
+class ArmazemSessoesSQLite:
+    def __init__(self, caminho, ttl_segundos=3600, relogio=time.time):
+        self.caminho = caminho; self.ttl_segundos = ttl_segundos; self._relogio = relogio
+        self._local = threading.local(); self._lock = threading.Lock(); self.conflitos = 0
+        with self._conexao() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessao_chatbot (user_id INTEGER PRIMARY KEY, estado TEXT NOT NULL, "
+                         "versao INTEGER NOT NULL, expira_em REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sessao_chatbot_expira_em ON sessao_chatbot (expira_em)")
+
+    def _conexao(self):
+        # Uma conexão por thread; WAL deixa os outros workers lerem enquanto um grava
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL"); conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def obter(self, user_id):
+        linha = self._conexao().execute("SELECT estado, versao FROM sessao_chatbot WHERE user_id = ? AND expira_em > ?",
+                                        (user_id, self._relogio())).fetchone()
+        return (desserializar_estado(linha[0]), linha[1]) if linha else (None, 0)
+
+    def salvar(self, user_id, estado, versao_esperada):
+        agora = self._relogio(); dados = (serializar_estado(estado), agora + self.ttl_segundos)
+        with self._conexao() as conn:
+            if versao_esperada == 0: # sessão nova: só entra se não houver outra viva (uma expirada é sobrescrita)
+                cursor = conn.execute("INSERT INTO sessao_chatbot (user_id, estado, versao, expira_em) VALUES (?, ?, 1, ?) "
+                                      "ON CONFLICT(user_id) DO UPDATE SET estado = excluded.estado, versao = 1, expira_em = excluded.expira_em "
+                                      "WHERE sessao_chatbot.expira_em <= ?", (user_id, *dados, agora))
+                conn.execute("DELETE FROM sessao_chatbot WHERE expira_em <= ?", (agora,)) # varre as abandonadas (índice em expira_em)
+            else:
+                cursor = conn.execute("UPDATE sessao_chatbot SET estado = ?, versao = versao + 1, expira_em = ? "
+                                      "WHERE user_id = ? AND versao = ? AND expira_em > ?", (*dados, user_id, versao_esperada, agora))
+        if cursor.rowcount != 1:
+            with self._lock: self.conflitos += 1
+            raise ConflitoSessao(f"sessão U{user_id} mudou (esperada v{versao_esperada})")
+        return versao_esperada + 1
+
+    def remover(self, user_id):
+        with self._conexao() as conn: conn.execute("DELETE FROM sessao_chatbot WHERE user_id = ?", (user_id,))
+
+    def limpar_expiradas(self):
+        with self._conexao() as conn: return conn.execute("DELETE FROM sessao_chatbot WHERE expira_em <= ?", (self._relogio(),)).rowcount
+
+    def estatisticas(self):
+        sessoes = self._conexao().execute("SELECT COUNT(*) FROM sessao_chatbot WHERE expira_em > ?", (self._relogio(),)).fetchone()[0]
+        return {"tipo": "sqlite", "sessoes": sessoes, "conflitos": self.conflitos}
+
+
+def criar_armazem_sessoes(caminho_sqlite=None, ttl_segundos=3600):
+    return ArmazemSessoesSQLite(caminho_sqlite, ttl_segundos) if caminho_sqlite else ArmazemSessoesMemoria(ttl_segundos)
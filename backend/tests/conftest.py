@@ -0,0 +1,30 @@
+# backend/tests/conftest.py
+# Testes rodam a partir da pasta backend: python -m pytest tests
+# O app lê DATABASE_URL na importação, então o banco temporário é definido aqui, antes de qualquer teste importar o app.
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='gg_testes_'), 'testes.db')}"
+os.environ['LOG_LEVEL'] = 'OFF'; os.environ['SENHAS_PROCESSOS'] = '0' # hashes na própria thread: sem pool de processos nos testes
+for variavel in ('GEMINI_API_KEY', 'PUBSUB_BROKER', 'GEMINI_CACHE_SQLITE', 'CHATBOT_SESSOES_SQLITE'): os.environ.pop(variavel, None)
+
+
+@pytest.fixture(scope='session')
+def gg():
+    import app
+    return app
+
+@pytest.fixture
+def banco(gg):
+    """Banco SQLite temporário vazio, com todas as migrações aplicadas, dentro de um contexto de app."""
+    with gg.app.app_context():
+        gg.db.session.remove(); gg.db.drop_all()
+        with gg.db.engine.begin() as conn: conn.execute(gg.text("DROP TABLE IF EXISTS schema_migracao"))
+        gg.aplicar_migracoes()
+        yield gg.db
+        gg.db.session.remove()
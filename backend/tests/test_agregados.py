@@ -0,0 +1,41 @@
+# backend/tests/test_agregados.py
+# O boost do agregado (RatingAgregado) tem de ser igual ao da média direto de MatchRating, inclusive
+# com jogos fora do ASCII e grafias diferentes do mesmo jogo.
+
+# (avaliador, avaliado, nota, jogo)
+AVALIACOES = [(1, 2, 5, 'POKÉMON'), (3, 2, 2, 'Pokémon'), (4, 2, 4, 'pokÉmon'), (1, 3, 4, 'Valorant '), (2, 3, 1, 'valorant'),
+              (4, 3, 3, None), (1, 4, 5, 'ÉLDEN RING'), (2, 4, 4, 'elden ring'), (3, 4, 1, 'Counter-Strike 2')]
+
+def semear(gg):
+    for uid in range(1, 5): gg.db.session.add(gg.User(id=uid, username=f"u{uid}", email=f"u{uid}@gg.com", password_hash='x'))
+    for rater, rated, nota, jogo in AVALIACOES:
+        gg.db.session.add(gg.MatchRating(rater_user_id=rater, rated_user_id=rated, rating=nota, game_played=jogo))
+        gg.registrar_avaliacao_no_agregado(rated, jogo, nota, 1) # como o /api/rate_player
+    gg.db.session.commit()
+
+def conferir_caminhos(gg):
+    jogos = {gg.chave_jogo_avaliacao(jogo) for *_, jogo in AVALIACOES} | {''}
+    for jogo in jogos:
+        medias = gg.carregar_medias_avaliacao(jogo)
+        for uid in range(1, 5): assert medias.get(uid) == gg.media_avaliacao_por_consulta(uid, jogo), (uid, jogo)
+
+def test_agregado_igual_a_media_por_consulta(banco, gg):
+    semear(gg)
+    conferir_caminhos(gg)
+    assert gg.carregar_medias_avaliacao('pokémon') == {2: 11 / 3} # as três grafias caem na mesma chave
+    assert gg.carregar_medias_avaliacao('valorant') == {3: 2.5}
+
+def test_migracao_reconstroi_o_mesmo_agregado(banco, gg):
+    semear(gg)
+    with gg.db.engine.begin() as conn: gg.migracao_rating_agregado(conn)
+    conferir_caminhos(gg)
+
+def test_verificar_agregados_sem_divergencias(banco, gg):
+    semear(gg)
+    resultado = gg.app.test_cli_runner().invoke(args=['verificar-agregados'])
+    assert resultado.exit_code == 0, resultado.output
+    assert "0 divergências" in resultado.output
+
+def test_chave_e_normalizacao_seguem_a_mesma_regra(gg):
+    for jogo in ('POKÉMON', ' Valorant ', 'ÉLDEN RING', 'cs2'): assert gg.chave_jogo_avaliacao(jogo) == gg.normalizar_jogo(jogo)
+    assert gg.chave_jogo_avaliacao(None) == ''
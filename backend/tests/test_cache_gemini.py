@@ -0,0 +1,26 @@
+# backend/tests/test_cache_gemini.py
+# Cache das respostas do Gemini com SQLite: erro no disco vira miss ou cache só em memória, nunca exceção.
+
+from cache_gemini import CacheRespostasGemini
+
+def test_persiste_entre_instancias(tmp_path):
+    caminho = str(tmp_path / 'cache.db')
+    CacheRespostasGemini(caminho_sqlite=caminho).guardar('extracao', 'jogo', 'valorant', 'Valorant', 0.8)
+    cache = CacheRespostasGemini(caminho_sqlite=caminho)
+    assert cache.obter('extracao', 'jogo', 'valorant') == 'Valorant'
+    assert cache.estatisticas()["por_campo"]["extracao:jogo"]["segundos_economizados"] == 0.8
+
+def test_erro_no_disco_cai_para_a_memoria(tmp_path):
+    cache = CacheRespostasGemini(caminho_sqlite=str(tmp_path / 'cache.db'))
+    cache.guardar('extracao', 'jogo', 'lol', 'League of Legends', 0.5)
+    cache._memoria.limpar(); cache._disco.close() # qualquer operação no SQLite passa a levantar sqlite3.Error
+    assert cache.obter('extracao', 'jogo', 'lol') is None # só estava no disco: miss
+    cache.guardar('extracao', 'jogo', 'cs', 'Counter-Strike 2', 0.5)
+    assert cache.obter('extracao', 'jogo', 'cs') == 'Counter-Strike 2' # guardado só na memória
+    cache.descartar('extracao', 'jogo', 'cs')
+    assert cache.obter('extracao', 'jogo', 'cs') is None
+    assert cache.erros_disco == 4 and cache.estatisticas()["erros_disco"] == 4 # obter (2), guardar, descartar
+
+def test_erros_do_disco_nas_metricas(gg, monkeypatch):
+    monkeypatch.setattr(gg.cache_gemini, 'erros_disco', 2)
+    assert "gg_cache_gemini_erros_disco_total 2" in gg.metricas.texto_prometheus()
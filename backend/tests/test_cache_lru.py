@@ -0,0 +1,24 @@
+# backend/tests/test_cache_lru.py
+
+from cache_lru import CacheLRU
+
+class Relogio:
+    def __init__(self): self.agora = 0.0
+    def __call__(self): return self.agora
+
+def test_peek_nao_conta_nem_reordena():
+    cache = CacheLRU(2)
+    cache.set('a', 1); cache.set('b', 2)
+    assert cache.peek('a') == 1 and cache.peek('x') is None
+    assert (cache.hits, cache.misses) == (0, 0)
+    cache.set('c', 3) # 'a' continua o mais antigo: peek não conta como uso
+    assert cache.peek('a') is None and cache.get('b') == 2 and cache.hits == 1
+
+def test_peek_respeita_ttl():
+    relogio = Relogio(); cache = CacheLRU(10, ttl_segundos=5, relogio=relogio)
+    cache.set('a', 1); relogio.agora = 5
+    assert cache.peek('a') is None and cache.expiracoes == 0 and cache.misses == 0
+
+def test_get_com_carimbo_diferente_invalida():
+    cache = CacheLRU(10); cache.set('a', 1, carimbo=1)
+    assert cache.get('a', carimbo=2) is None and cache.invalidacoes == 1 and cache.misses == 1
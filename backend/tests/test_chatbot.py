@@ -0,0 +1,27 @@
+# backend/tests/test_chatbot.py
+# Turno do chatbot: o log em DEBUG não pode levar as respostas do usuário (dados do perfil).
+
+import logging
+
+from observabilidade import FormatadorJSON
+
+RESPOSTA = "Meu nick é Zé das Couves e jogo só de madrugada"
+
+class Coletor(logging.Handler):
+    def __init__(self): super().__init__(); self.registros = []
+    def emit(self, registro): self.registros.append(registro)
+
+def test_log_do_turno_sem_a_resposta(gg, monkeypatch):
+    coletor = Coletor(); monkeypatch.setattr(gg.logger, 'disabled', False); monkeypatch.setattr(gg.logger, 'level', logging.DEBUG)
+    gg.logger.addHandler(coletor)
+    try:
+        for idx in range(1, len(gg.PROFILE_QUESTIONS_ORDER) + 1): # um turno para cada campo, com a resposta indo para o perfil
+            state = {'current_question_idx': idx, 'collected_data': {}, 'last_user_response': None}
+            gg.avancar_conversa(1, state, RESPOSTA, combinado=False, gerar_pergunta=lambda *args: "próxima?")
+    finally: gg.logger.removeHandler(coletor)
+    extraidos = [r for r in coletor.registros if r.getMessage() == "campo do perfil extraído"]
+    assert len(extraidos) == len(gg.PROFILE_QUESTIONS_ORDER)
+    for registro in extraidos:
+        linha = FormatadorJSON().format(registro)
+        assert "Couves" not in linha and "madrugada" not in linha, linha
+        assert registro.tamanho_resposta == len(RESPOSTA) and registro.campo in gg.PROFILE_QUESTIONS_ORDER
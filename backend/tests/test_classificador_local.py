@@ -0,0 +1,60 @@
+# backend/tests/test_classificador_local.py
+# Classificação local das respostas do chatbot: só respostas inequívocas ficam aqui, o resto vai para o Gemini.
+
+import pytest
+
+from classificador_local import ClassificadorLocal, normalizar_resposta
+
+@pytest.fixture
+def classificador(gg):
+    return ClassificadorLocal(gg.PROFILE_GEMINI_CATEGORIES, {'nivel_de_habilidade': gg.MAPA_NIVEIS, 'communication_style': gg.MAPA_COMUNICACAO})
+
+def categoria(classificador, texto, campo):
+    resultado = classificador.classificar(texto, campo)
+    return resultado and resultado[0]
+
+@pytest.mark.parametrize('texto, campo, esperado', [
+    ('Iniciante', 'nivel_de_habilidade', 'Iniciante'), ('sou noob', 'nivel_de_habilidade', 'Iniciante'),
+    ('sou pro', 'nivel_de_habilidade', 'Competitivo/Pro'), ('Não-binário!', 'gender', 'Não-binário'), ('sou homem', 'gender', 'Homem'),
+    ('gosto de subir de rank', 'estilo_jogo', 'Competitivo/Subir de Ranking'), ('depende do humor', 'estilo_jogo', 'Variado/Depende do humor'),
+    ('no silêncio', 'communication_style', 'No silêncio (foco total)'), ('médio', 'nivel_de_habilidade', 'Intermediário'),
+])
+def test_respostas_inequivocas(classificador, texto, campo, esperado):
+    assert categoria(classificador, texto, campo) == esperado
+
+@pytest.mark.parametrize('texto, campo, esperado', [
+    ('iniciantee', 'nivel_de_habilidade', 'Iniciante'), ('competitvo', 'estilo_jogo', 'Competitivo/Subir de Ranking'),
+    ('masculno', 'gender', 'Homem'),
+])
+def test_erros_de_digitacao(classificador, texto, campo, esperado):
+    resultado = classificador.classificar(texto, campo)
+    assert resultado[0] == esperado and classificador.confianca_minima <= resultado[1] < 1.0
+
+@pytest.mark.parametrize('texto, campo', [
+    ('não sou iniciante', 'nivel_de_habilidade'), ('não sou competitivo', 'estilo_jogo'), ('nem homem nem mulher', 'gender'),
+    ('não curto resenha', 'communication_style'),
+])
+def test_negacao_vai_para_o_gemini(classificador, texto, campo):
+    assert classificador.classificar(texto, campo) is None
+
+@pytest.mark.parametrize('texto, campo', [
+    ('homem e mulher', 'gender'), ('competitivo mas também com os amigos', 'estilo_jogo'),
+    ('tenho um pouco de experiência em vários jogos, não sei dizer direito', 'nivel_de_habilidade'), ('', 'gender'), ('???', 'gender'),
+])
+def test_ambiguas_ou_longas_vao_para_o_gemini(classificador, texto, campo):
+    assert classificador.classificar(texto, campo) is None
+
+@pytest.mark.parametrize('texto, campo', [
+    ('cara, sei lá', 'gender'), ('sei lá cara', 'gender'), ('bom dia', 'nivel_de_habilidade'), ('a mina do lado', 'gender'),
+    ('quero rir', 'estilo_jogo'), ('jogo pro meu irmão', 'nivel_de_habilidade'), ('carai', 'gender'),
+])
+def test_girias_ambiguas_nao_classificam(classificador, texto, campo):
+    assert classificador.classificar(texto, campo) is None
+
+def test_campo_sem_categorias_e_contadores(classificador):
+    assert classificador.classificar('Valorant', 'jogo_principal') is None
+    classificador.classificar('iniciante', 'nivel_de_habilidade'); classificador.classificar('bom dia', 'nivel_de_habilidade')
+    assert classificador.estatisticas() == {'nivel_de_habilidade': {'acertos_locais': 1, 'fallbacks_llm': 1}}
+
+def test_normalizar_resposta():
+    assert normalizar_resposta('  Não-Binário!! ') == 'nao binario'
@@ -0,0 +1,67 @@
+# backend/tests/test_deck.py
+# O carimbo do deck em cache usa a versão da comunidade gravada no banco: uma mudança feita por outro
+# worker (outro processo, outro cache) tem de invalidar o deck deste.
+
+from flask_jwt_extended import create_access_token
+
+JOGO = 'Pokémon'
+
+def semear(gg, n=4):
+    for uid in range(1, n + 1):
+        gg.db.session.add(gg.User(id=uid, username=f"u{uid}", email=f"u{uid}@gg.com", password_hash='x'))
+        gg.db.session.add(gg.UserProfile(user_id=uid, nome_display=f"J{uid}", jogo_principal=JOGO, nivel_de_habilidade='Intermediário',
+                                         estilo_jogo='Casual', disponibilidade='noites', profile_complete=True))
+    gg.db.session.commit()
+
+def test_versao_fica_no_banco_e_segue_a_transacao(banco, gg):
+    jogo = gg.normalizar_jogo(JOGO)
+    assert gg.versao_comunidade(jogo) == 0
+    gg.sinalizar_mudanca_comunidade(jogo); gg.sinalizar_mudanca_comunidade(jogo); gg.db.session.commit()
+    assert gg.versao_comunidade(jogo) == 2
+    gg.sinalizar_mudanca_comunidade(jogo); gg.db.session.rollback()
+    assert gg.versao_comunidade(jogo) == 2 # o rollback de quem sinalizou desfaz o incremento
+
+def test_mudanca_de_outro_worker_invalida_o_deck(banco, gg):
+    semear(gg); gg.cache_matches.limpar()
+    cabecalho = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+    cliente = gg.app.test_client()
+    assert cliente.get('/api/get_match', headers=cabecalho).status_code == 200 # monta e guarda o deck
+    vp_db = gg.UserProfile.query.filter_by(user_id=1).one(); antes = gg.carimbo_deck(vp_db)
+    deck = gg.cache_matches.get(1, carimbo=antes); assert deck is not None
+    # Outro worker salva um perfil no jogo: só o banco é compartilhado, o cache deste processo não é tocado
+    with gg.db.engine.begin() as conn:
+        conn.execute(gg.text("INSERT INTO versao_comunidade (jogo_normalizado, versao) VALUES (:j, 1) "
+                             "ON CONFLICT (jogo_normalizado) DO UPDATE SET versao = versao + 1"), {"j": gg.normalizar_jogo(JOGO)})
+    gg.db.session.expire_all()
+    assert gg.carimbo_deck(vp_db) != antes
+    assert gg.cache_matches.get(1, carimbo=gg.carimbo_deck(vp_db)) is None
+
+def test_avaliacao_sinaliza_a_comunidade_do_deck(banco, gg):
+    semear(gg)
+    cabecalho = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+    r = gg.app.test_client().post('/api/rate_player', headers=cabecalho, json={"rated_user_id": 2, "rating": 5, "game_played": ' POKÉMON '})
+    assert r.status_code == 200, r.get_json()
+    gg.db.session.expire_all()
+    assert gg.versao_comunidade(gg.normalizar_jogo(JOGO)) == 1 # mesma chave do carimbo (jogo_normalizado do perfil)
+
+def test_like_e_paginas_do_cursor_nao_contam_no_cache(banco, gg):
+    semear(gg, n=8); gg.cache_matches.limpar()
+    cabecalho = {'Authorization': 'Bearer ' + create_access_token(identity='1')}; cliente = gg.app.test_client()
+    pagina = cliente.get('/api/get_match?limit=2', headers=cabecalho).get_json()
+    antes = gg.cache_matches.estatisticas()
+    cliente.post('/api/action/match', json={"liked_user_id": pagina["matches"][0]["user_id"]}, headers=cabecalho)
+    assert cliente.get(f'/api/get_match?limit=2&cursor={pagina["next_cursor"]}', headers=cabecalho).status_code == 200
+    depois = gg.cache_matches.estatisticas()
+    assert (depois["hits"], depois["misses"]) == (antes["hits"], antes["misses"])
+
+def test_deck_expirado_entre_paginas_nao_repete_cartas(banco, gg):
+    semear(gg, n=9); gg.cache_matches.limpar(); gg.sessoes_deck.limpar()
+    cabecalho = {'Authorization': 'Bearer ' + create_access_token(identity='1')}; cliente = gg.app.test_client()
+    pagina = cliente.get('/api/get_match?limit=2', headers=cabecalho).get_json(); vistos = [m["user_id"] for m in pagina["matches"]]
+    cliente.post('/api/action/match', json={"liked_user_id": 9}, headers=cabecalho) # curtido fora do deck: também não pode aparecer
+    while pagina["next_cursor"]:
+        gg.cache_matches.limpar() # o deck do cursor expira (TTL) ou sai do LRU antes da próxima página
+        pagina = cliente.get(f'/api/get_match?limit=2&cursor={pagina["next_cursor"]}', headers=cabecalho).get_json()
+        vistos += [m["user_id"] for m in pagina["matches"]]
+    assert len(vistos) == len(set(vistos)), vistos
+    assert set(vistos) | {9} == set(range(2, 10))
@@ -0,0 +1,41 @@
+# backend/tests/test_gemini_cliente.py
+# Upstream mais lento que o timeout (ModeloGeminiFalso com latência): GeminiIndisponivel, contadores e fallback.
+
+import time
+
+import pytest
+
+from gemini_cliente import ClienteGemini, GeminiIndisponivel, ModeloGeminiFalso
+
+LATENCIA = 0.3; TIMEOUT = 0.02
+
+def esperar_vagas(cliente, n=1):
+    for _ in range(n): cliente._vagas.acquire(timeout=5)
+    for _ in range(n): cliente._vagas.release()
+
+def test_timeout_e_rejeicao():
+    cliente = ClienteGemini(ModeloGeminiFalso(LATENCIA), max_concorrencia=1, timeout_segundos=TIMEOUT)
+    inicio = time.perf_counter()
+    with pytest.raises(GeminiIndisponivel, match='timeout'): cliente.gerar('Ideia: "oi"')
+    assert time.perf_counter() - inicio < LATENCIA # a espera é limitada pelo timeout, não pela latência
+    # A chamada abandonada ainda ocupa a única vaga: a próxima é recusada na hora
+    with pytest.raises(GeminiIndisponivel, match='limite'): cliente.gerar('Ideia: "oi"')
+    assert cliente.estatisticas() == {"chamadas": 1, "timeouts": 1, "rejeitadas": 1, "erros": 0}
+    esperar_vagas(cliente) # o upstream respondeu: a vaga volta
+    assert cliente.gerar('Ideia: "oi"', timeout=5) == "oi"
+
+def test_em_partes_com_timeout():
+    cliente = ClienteGemini(ModeloGeminiFalso(LATENCIA), max_concorrencia=1, timeout_segundos=TIMEOUT)
+    with pytest.raises(GeminiIndisponivel): list(cliente.gerar_em_partes('Ideia: "uma pergunta só"'))
+    assert cliente.timeouts == 1
+    esperar_vagas(cliente)
+
+def test_pergunta_cai_no_fallback(gg, monkeypatch):
+    cliente = ClienteGemini(ModeloGeminiFalso(LATENCIA), max_concorrencia=1, timeout_segundos=TIMEOUT)
+    monkeypatch.setattr(gg, 'cliente_gemini', cliente); gg.cache_gemini._memoria.limpar()
+    dados = {"nome_display": "Zé"}
+    assert gg.generate_bot_question('jogo_principal', "Zé", dados, False) == gg.pergunta_base('jogo_principal', dados, False)
+    assert gg.generate_bot_question('jogo_principal', "Zé", dados, False) == gg.BASE_QUESTION_IDEAS['jogo_principal'].format(**dados) # vaga ainda presa: rejeitada
+    assert gg.extrair_info_chatbot_com_gemini("Valorant", 'jogo_principal') == "Valorant" # extração devolve o texto do usuário
+    assert cliente.timeouts == 1 and cliente.rejeitadas == 2
+    esperar_vagas(cliente)
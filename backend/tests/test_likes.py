@@ -0,0 +1,50 @@
+# backend/tests/test_likes.py
+# Like e match mútuo idempotentes: repetição e corrida entre os dois lados não viram erro nem registro duplicado.
+
+from flask_jwt_extended import create_access_token
+
+def semear(gg):
+    for uid in (1, 2): gg.db.session.add(gg.User(id=uid, username=f"u{uid}", email=f"u{uid}@gg.com", password_hash='x'))
+    gg.db.session.commit()
+
+def curtir(gg, uid, curtido):
+    return gg.app.test_client().post('/api/action/match', json={"liked_user_id": curtido}, headers={'Authorization': 'Bearer ' + create_access_token(identity=str(uid))})
+
+def test_like_repetido_e_idempotente(banco, gg):
+    semear(gg)
+    for _ in range(2):
+        r = curtir(gg, 1, 2); assert r.status_code == 200 and r.get_json()["mutual_match"] is False
+    assert gg.Like.query.filter_by(liker_user_id=1, liked_user_id=2).count() == 1
+
+def test_match_criado_uma_vez(banco, gg):
+    semear(gg); curtir(gg, 1, 2)
+    r = curtir(gg, 2, 1); assert r.status_code == 200 and r.get_json()["mutual_match"] is True
+    r = curtir(gg, 2, 1); assert r.status_code == 200 and r.get_json()["mutual_match"] is True
+    assert gg.MutualMatch.query.count() == 1
+
+def test_match_ja_gravado_por_outra_requisicao(banco, gg, monkeypatch):
+    # Os dois lados curtem ao mesmo tempo e o outro já gravou o match: este like não falha nem notifica de novo
+    semear(gg)
+    gg.db.session.add_all([gg.Like(liker_user_id=1, liked_user_id=2), gg.MutualMatch(user_min_id=1, user_max_id=2)]); gg.db.session.commit()
+    notificados = []; monkeypatch.setattr(gg, 'notificar_match', notificados.append)
+    r = curtir(gg, 2, 1)
+    assert r.status_code == 200 and r.get_json()["mutual_match"] is True and notificados == []
+    assert gg.MutualMatch.query.count() == 1
+
+def test_erro_ao_registrar_desfaz_a_transacao(banco, gg, monkeypatch):
+    semear(gg)
+    def falhar(*args): raise RuntimeError("banco fora do ar")
+    monkeypatch.setattr(gg, 'registrar_like', falhar)
+    assert curtir(gg, 1, 2).status_code == 500
+    assert gg.Like.query.count() == 0
+
+def test_travar_pares_no_postgres(banco, gg, monkeypatch):
+    executados = []
+    monkeypatch.setattr(gg.db.engine.dialect, 'name', 'postgresql')
+    monkeypatch.setattr(gg.db.session, 'execute', lambda sql, params=None: executados.append((str(sql), params)))
+    gg.travar_pares(5, [9, 2, 9, 7])
+    assert [p for _, p in executados] == [{"a": 2, "b": 5}, {"a": 5, "b": 7}, {"a": 5, "b": 9}] # par canônico, sem repetir, em ordem
+    assert all("pg_advisory_xact_lock" in sql for sql, _ in executados)
+
+def test_travar_pares_nao_faz_nada_no_sqlite(banco, gg):
+    gg.travar_pares(1, [2, 3]) # sem erro e sem SQL específico do Postgres
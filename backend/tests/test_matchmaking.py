@@ -0,0 +1,29 @@
+# backend/tests/test_matchmaking.py
+# Paridade do motor vetorizado (ColunasPerfis) com o loop de referência em comunidades aleatórias com semente,
+# inclusive empates de score e campos None, e da poda por baldes com a varredura completa (poda_minimo=0 força
+# os baldes em qualquer tamanho). As conferências ficam em benchmarks/paridade_matchmaking.py, que o
+# benchmarks/bench_score_vetorizado também roda antes de medir.
+
+import random
+
+from benchmarks.paridade_matchmaking import (conferir, gerar_perfis, verificar_paridade, verificar_paridade_empates, verificar_paridade_poda,
+                                             verificar_poda_em_empates)
+from matchmaking import ColunasPerfis, pontuar_candidatos_referencia
+
+
+def test_paridade_com_referencia():
+    verificar_paridade()
+
+def test_paridade_com_empates_e_campos_none():
+    verificar_paridade_empates()
+
+def test_viewer_sem_campos():
+    perfis = gerar_perfis(50, random.Random(5)); viewer = {"user_id": 0, "jogo_principal": 'Valorant'}
+    conferir(perfis, {}, viewer, (1, 5, 60))
+    assert ColunasPerfis(perfis).pontuar(None, {}) == pontuar_candidatos_referencia(None, perfis, {}) == []
+
+def test_poda_igual_a_varredura_completa():
+    verificar_paridade_poda(rodadas=6, tamanho=(2_000, 6_000))
+
+def test_poda_com_corte_no_meio_de_empates():
+    assert verificar_poda_em_empates() > 0 # os dados têm de produzir cortes dentro de empates
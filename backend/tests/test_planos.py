@@ -0,0 +1,33 @@
+# backend/tests/test_planos.py
+# Depois das migrações, cada consulta quente usa o índice esperado no EXPLAIN QUERY PLAN do SQLite
+# (a mesma conferência do flask --app app verificar-planos).
+
+import pytest
+
+NOMES = ["candidatos do mesmo jogo", "login por nome de usuário", "login por email", "like recíproco", "likes recebidos", "avaliações recebidas",
+         "avaliação existente", "agregado do jogo", "perfis completos", "recomendações do viewer", "mensagens não lidas"]
+
+def test_todas_as_consultas_quentes_cobertas(banco, gg):
+    assert [nome for nome, *_ in gg.consultas_quentes()] == NOMES
+
+@pytest.mark.parametrize('nome', NOMES)
+def test_consulta_usa_o_indice_esperado(banco, gg, nome):
+    _, consulta, indice = next(c for c in gg.consultas_quentes() if c[0] == nome)
+    plano = gg.plano_da_consulta(consulta)
+    assert any(indice in passo for passo in plano), plano
+
+def test_comando_verificar_planos(banco, gg):
+    resultado = gg.app.test_cli_runner().invoke(args=['verificar-planos'])
+    assert resultado.exit_code == 0, resultado.output
+    assert "0 sem o índice esperado" in resultado.output
+
+def test_migracao_troca_o_indice_de_expressao(banco, gg):
+    # Banco criado antes da 008: ix_match_rating_avaliado_jogo ainda em (rated_user_id, lower(game_played))
+    with gg.db.engine.begin() as conn:
+        conn.execute(gg.text("DROP INDEX ix_match_rating_avaliado_jogo"))
+        conn.execute(gg.text("CREATE INDEX ix_match_rating_avaliado_jogo ON match_rating (rated_user_id, lower(game_played))"))
+        conn.execute(gg.text("DELETE FROM schema_migracao WHERE nome = '008_indice_avaliacoes_sem_expressao'"))
+    gg.aplicar_migracoes()
+    with gg.db.engine.connect() as conn:
+        sql = conn.execute(gg.text("SELECT sql FROM sqlite_master WHERE name = 'ix_match_rating_avaliado_jogo'")).scalar()
+    assert 'lower' not in sql and 'game_played' in sql, sql
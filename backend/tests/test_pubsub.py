@@ -0,0 +1,51 @@
+# backend/tests/test_pubsub.py
+# Broker de eventos entre workers: authkey obrigatória, reconexão, e falha de publicação que não derruba a requisição.
+
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def importar_app(**env):
+    ambiente = {chave: valor for chave, valor in os.environ.items() if chave != 'PUBSUB_AUTHKEY'}; ambiente.update(env)
+    return subprocess.run([sys.executable, '-c', 'import app'], cwd=BACKEND, env=ambiente, capture_output=True, text=True, timeout=60)
+
+def test_broker_sem_authkey_nao_sobe():
+    r = importar_app(PUBSUB_BROKER='127.0.0.1:6390')
+    assert r.returncode != 0 and "PUBSUB_AUTHKEY" in r.stderr
+    assert importar_app(PUBSUB_BROKER='127.0.0.1:6390', PUBSUB_AUTHKEY='segredo-dos-workers').returncode == 0
+
+def test_comando_broker_exige_authkey(gg, monkeypatch):
+    monkeypatch.setattr(gg, 'PUBSUB_AUTHKEY', b'')
+    resultado = gg.app.test_cli_runner().invoke(args=['broker-pubsub'])
+    assert resultado.exit_code != 0 and "PUBSUB_AUTHKEY" in resultado.output
+
+def test_cliente_reconecta_e_reassina():
+    from concurrent.futures import ThreadPoolExecutor
+    from multiprocessing.connection import Listener
+    from pubsub import PubSubBroker
+    with Listener(('127.0.0.1', 0), authkey=b'k') as listener, ThreadPoolExecutor(1) as aceitar:
+        primeira = aceitar.submit(listener.accept) # o handshake da authkey precisa do accept do outro lado
+        pubsub = PubSubBroker(listener.address, b'k', espera_min=0.01); primeira = primeira.result(timeout=5)
+        assinatura = pubsub.assinar('usuario:1')
+        assert primeira.recv() == ('sub', 'usuario:1')
+        primeira.close() # broker reiniciado
+        segunda = listener.accept()
+        assert segunda.recv() == ('sub', 'usuario:1') # os canais locais voltam a ser assinados
+        segunda.send(('pub', 'usuario:1', {"tipo": "match"}))
+        assert assinatura.obter(timeout=5) == {"tipo": "match"}
+        pubsub.publicar('usuario:2', {"tipo": "mensagem"})
+        assert segunda.recv() == ('pub', 'usuario:2', {"tipo": "mensagem"})
+        assert pubsub.estatisticas()["reconexoes"] == 1
+        segunda.close()
+
+def test_match_confirmado_mesmo_com_broker_fora(banco, gg, monkeypatch):
+    from flask_jwt_extended import create_access_token
+    for uid in (1, 2): gg.db.session.add(gg.User(id=uid, username=f"u{uid}", email=f"u{uid}@gg.com", password_hash='x'))
+    gg.db.session.add(gg.Like(liker_user_id=2, liked_user_id=1)); gg.db.session.commit()
+    from multiprocessing import AuthenticationError
+    def broker_recusa(): raise AuthenticationError("digest received was wrong") # authkey diferente da do broker
+    monkeypatch.setattr(gg, 'obter_pubsub', broker_recusa)
+    r = gg.app.test_client().post('/api/action/match', json={"liked_user_id": 2}, headers={'Authorization': 'Bearer ' + create_access_token(identity='1')})
+    assert r.status_code == 200 and r.get_json()["mutual_match"] is True
@@ -0,0 +1,83 @@
+# backend/tests/test_sessoes_chatbot.py
+# Os dois armazéns de sessão do chatbot: versão otimista, TTL, limpeza e serialização.
+
+import threading
+
+import pytest
+
+from sessoes_chatbot import (ArmazemSessoesMemoria, ArmazemSessoesSQLite, ConflitoSessao, desserializar_estado, estado_inicial,
+                             serializar_estado)
+
+TTL = 60
+
+class Relogio:
+    def __init__(self): self.agora = 1000.0
+    def __call__(self): return self.agora
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def armazem(request, tmp_path):
+    relogio = Relogio()
+    armazem = ArmazemSessoesMemoria(TTL, relogio=relogio) if request.param == 'memoria' else ArmazemSessoesSQLite(str(tmp_path / 'sessoes.db'), TTL, relogio=relogio)
+    armazem.relogio = relogio
+    return armazem
+
+def estado(idx, **dados):
+    return {'current_question_idx': idx, 'collected_data': dados, 'last_user_response': None}
+
+def test_serializacao_ida_e_volta():
+    original = {'current_question_idx': 3, 'collected_data': {'nome_display': 'Zé', 'jogo_principal': 'Pokémon', 'vazio': None}, 'last_user_response': 'à noite'}
+    texto = serializar_estado(original)
+    assert desserializar_estado(texto) == original and 'Pokémon' in texto # sem escapar o Unicode
+    assert desserializar_estado(serializar_estado(estado_inicial())) == estado_inicial()
+
+def test_obter_salvar_e_versoes(armazem):
+    assert armazem.obter(1) == (None, 0)
+    assert armazem.salvar(1, estado(1, nome_display='Zé'), 0) == 1
+    assert armazem.salvar(1, estado(2, nome_display='Zé', jogo_principal='LoL'), 1) == 2
+    assert armazem.obter(1) == (estado(2, nome_display='Zé', jogo_principal='LoL'), 2)
+
+def test_versao_velha_levanta_conflito(armazem):
+    armazem.salvar(1, estado(1), 0); armazem.salvar(1, estado(2), 1)
+    with pytest.raises(ConflitoSessao): armazem.salvar(1, estado(9), 1) # outro turno já salvou a v2
+    with pytest.raises(ConflitoSessao): armazem.salvar(1, estado(9), 0) # "sessão nova" sobre uma viva
+    assert armazem.obter(1) == (estado(2), 2) and armazem.estatisticas()["conflitos"] == 2
+
+def test_sessao_expirada_pode_ser_sobrescrita_com_versao_0(armazem):
+    armazem.salvar(1, estado(4), 0); armazem.salvar(1, estado(5), 1)
+    armazem.relogio.agora += TTL
+    assert armazem.obter(1) == (None, 0)
+    with pytest.raises(ConflitoSessao): armazem.salvar(1, estado(6), 2) # a versão que havia expirou junto
+    assert armazem.salvar(1, estado(0), 0) == 1
+    assert armazem.obter(1) == (estado(0), 1)
+
+def test_salvar_renova_o_ttl(armazem):
+    armazem.salvar(1, estado(1), 0); armazem.relogio.agora += TTL - 1
+    armazem.salvar(1, estado(2), 1); armazem.relogio.agora += TTL - 1
+    assert armazem.obter(1) == (estado(2), 2)
+
+def test_limpar_expiradas(armazem):
+    armazem.salvar(1, estado(1), 0); armazem.salvar(2, estado(1), 0)
+    armazem.relogio.agora += TTL / 2; armazem.salvar(3, estado(1), 0)
+    armazem.relogio.agora += TTL / 2 # 1 e 2 expiraram, 3 não
+    assert armazem.limpar_expiradas() == 2
+    assert armazem.limpar_expiradas() == 0
+    assert armazem.obter(3) == (estado(1), 1) and armazem.estatisticas()["sessoes"] == 1
+
+def test_remover(armazem):
+    armazem.salvar(1, estado(1), 0); armazem.remover(1)
+    assert armazem.obter(1) == (None, 0) and armazem.salvar(1, estado(1), 0) == 1
+
+def test_turnos_concorrentes_nao_se_perdem(armazem):
+    # Cada thread soma 1 ao índice da mesma sessão, relendo e tentando de novo quando perde a corrida
+    armazem.salvar(1, estado(0), 0); threads, incrementos = 4, 25
+    def turnos():
+        for _ in range(incrementos):
+            while True:
+                atual, versao = armazem.obter(1)
+                try: armazem.salvar(1, estado(atual['current_question_idx'] + 1), versao); break
+                except ConflitoSessao: continue
+    trabalhadores = [threading.Thread(target=turnos) for _ in range(threads)]
+    for t in trabalhadores: t.start()
+    for t in trabalhadores: t.join()
+    atual, versao = armazem.obter(1)
+    assert atual['current_question_idx'] == threads * incrementos and versao == threads * incrementos + 1